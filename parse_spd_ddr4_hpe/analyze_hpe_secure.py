@@ -1,19 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Анализ HPE Secure Code и SMART данных в SPD"""
+"""Анализ HPE Secure Code и SMART данных в SPD
 
+Области Secure Code / SMART (384-511) - раскладка HPE DDR4. У DDR5 (байт 2 =
+0x12) по этим смещениям лежат базовые параметры, поэтому DDR5 образы
+выводятся с пометкой и в анализ и сравнение Secure Code не попадают.
+"""
+
+import math
 import os
-import sys
-from pathlib import Path
-
-def hex_dump(data, offset, length, line_prefix="", bytes_per_line=16):
-    """Форматированный hex dump"""
-    lines = []
-    for i in range(offset, min(offset + length, len(data)), bytes_per_line):
-        hex_bytes = " ".join(f"{b:02X}" for b in data[i:i+bytes_per_line])
-        ascii_repr = "".join(chr(b) if 32 <= b < 127 else "." for b in data[i:i+bytes_per_line])
-        lines.append(f"{line_prefix}{i:03X}: {hex_bytes:<48} {ascii_repr}")
-    return "\n".join(lines)
+from collections import Counter
+
+from spd_ddr5 import DDR5_TYPE, is_ddr5
+from spd_hexdump import ascii_strings, hex_dump
+from spd_layout import AREAS, DDR4_TYPE, IMAGE_SPAN, read_field
+
+def _padded(data, span):
+    """Усечённый образ дополняется нулями до span (как срезы в исходной версии)"""
+    return data if len(data) >= span else bytes(data) + bytes(span - len(data))
+
+def module_identity(data):
+    """Part number и S/N по карте полей поколения (байт 2)
+
+    Усечённый дамп не ошибка: отсутствующие байты считаются нулями (S/N 0).
+    """
+    if is_ddr5(data):
+        from spd_ddr5 import BASE_SPAN, decode_base
+        fields = decode_base(_padded(data, BASE_SPAN))
+        return fields['part_number'], fields['serial_number']
+    data = _padded(data, IMAGE_SPAN)
+    return read_field(data, 'part_number'), read_field(data, 'serial_number')
 
 def analyze_hpe_secure(data, filename):
     """Анализ HPE Secure Code и SMART данных"""
@@ -23,12 +39,16 @@ def analyze_hpe_secure(data, filename):
     print(f"{'='*80}\n")
     
     # Основная информация
-    part_num = data[329:349].decode('ascii', errors='ignore').strip()
-    serial = int.from_bytes(data[325:329], 'big')
+    part_num, serial = module_identity(data)
     
     print(f"📝 Part Number: {part_num}")
     print(f"🔢 Serial: 0x{serial:08X}")
     
+    if is_ddr5(data):
+        print(f"\n⚠️  DDR5 (байт 2 = 0x{DDR5_TYPE:02X}): области HPE Secure Code / SMART DDR4 "
+              f"к DDR5 не применимы - анализ пропущен")
+        return
+    
     # DDR4 SPD Layout:
     # 0-127: Page 0 Lower
     # 128-255: Page 0 Upper
@@ -41,9 +61,10 @@ def analyze_hpe_secure(data, filename):
     print(f"{'='*80}")
     
     # Обычно HPE размещает secure code в районе байтов 384-415
-    secure_area = data[384:416]
-    print("\nБайты 384-415 (возможная область Secure Code):")
-    print(hex_dump(data, 384, 32, "  "))
+    start, end = AREAS['hpe_secure']
+    secure_area = data[start:end]
+    print(f"\nБайты {start}-{end - 1} (возможная область Secure Code):")
+    print(hex_dump(data, start, end - start, "  "))
     
     # Проверка на наличие данных (не все нули/FF)
     if not all(b == 0 for b in secure_area) and not all(b == 0xFF for b in secure_area):
@@ -61,9 +82,10 @@ def analyze_hpe_secure(data, filename):
     print(f"{'='*80}")
     
     # SMART данные обычно после secure code, в районе 416-480
-    smart_area = data[416:480]
-    print("\nБайты 416-479 (возможная область SMART данных):")
-    print(hex_dump(data, 416, 64, "  "))
+    start, end = AREAS['hpe_smart']
+    smart_area = data[start:end]
+    print(f"\nБайты {start}-{end - 1} (возможная область SMART данных):")
+    print(hex_dump(data, start, end - start, "  "))
     
     if not all(b == 0 for b in smart_area) and not all(b == 0xFF for b in smart_area):
         print("\n✅ Обнаружены данные")
@@ -90,100 +112,218 @@ def analyze_hpe_secure(data, filename):
     print(f"\n{'='*80}")
     print("🔍 ПОЛНЫЙ HEX DUMP VENDOR ОБЛАСТИ (384-511)")
     print(f"{'='*80}\n")
-    print(hex_dump(data, 384, 128, "  "))
+    start, end = AREAS['vendor']
+    print(hex_dump(data, start, end - start, "  "))
     
     print(f"\n{'='*80}")
     print("📋 ПОИСК ПАТТЕРНОВ")
     print(f"{'='*80}\n")
     
-    # Поиск ASCII строк
-    vendor_data = data[384:512]
-    ascii_strings = []
-    current_string = []
-    
-    for i, b in enumerate(vendor_data):
-        if 32 <= b < 127:  # Печатаемый ASCII
-            current_string.append(chr(b))
-        else:
-            if len(current_string) >= 4:  # Строка минимум 4 символа
-                ascii_strings.append(''.join(current_string))
-            current_string = []
+    # Поиск ASCII строк (минимум 4 печатаемых символа); по всей партии - spd_patterns.py
+    vendor_data = data[start:end]
+    strings = ascii_strings(vendor_data)
     
-    if current_string and len(current_string) >= 4:
-        ascii_strings.append(''.join(current_string))
-    
-    if ascii_strings:
+    if strings:
         print("Найдены ASCII строки:")
-        for s in ascii_strings:
+        for _, s in strings:
             print(f"  '{s}'")
     else:
         print("ASCII строки не найдены")
     
     # Поиск повторяющихся паттернов
     print("\nПоиск повторяющихся байт:")
-    byte_counts = {}
-    for b in vendor_data:
-        byte_counts[b] = byte_counts.get(b, 0) + 1
-    
-    most_common = sorted(byte_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    for byte_val, count in most_common:
+    byte_counts = Counter(vendor_data)
+    for byte_val, count in byte_counts.most_common(5):
         percentage = (count / len(vendor_data)) * 100
         print(f"  0x{byte_val:02X}: {count} раз ({percentage:.1f}%)")
     
-    # Энтропия (простая оценка)
-    unique_bytes = len(set(vendor_data))
-    entropy = (unique_bytes / 256) * 100
-    print(f"\nУникальных байт: {unique_bytes}/256 ({entropy:.1f}% энтропия)")
+    # Энтропия Шеннона (максимум 8 бит на байт)
+    unique_bytes = len(byte_counts)
+    entropy = shannon_entropy(byte_counts.values())
+    print(f"\nУникальных байт: {unique_bytes}/256, энтропия {entropy:.2f} бит/байт")
     
-    if entropy > 50:
+    if entropy > 6:
         print("  ✅ Высокая энтропия - вероятно содержит зашифрованные/хэшированные данные")
-    elif entropy > 20:
+    elif entropy > 3:
         print("  ⚠️  Средняя энтропия - содержит смешанные данные")
     else:
         print("  ❌ Низкая энтропия - вероятно пустая или заполненная область")
 
-def compare_secure_codes(files):
-    """Сравнение Secure Code между модулями"""
-    
-    print(f"\n{'='*80}")
-    print("🔐 СРАВНЕНИЕ SECURE CODES")
-    print(f"{'='*80}\n")
-    
-    secure_codes = {}
-    
-    for f in files:
-        data = open(f, 'rb').read(512)
-        serial = int.from_bytes(data[325:329], 'big')
-        secure_code = data[384:416]
+def shannon_entropy(counts):
+    """Энтропия Шеннона (бит) по счётчикам значений"""
+    counts = list(counts)
+    total = sum(counts)
+    return -sum(c / total * math.log2(c / total) for c in counts if c) if total else 0.0
+
+def secure_summary(data):
+    """Краткая сводка vendor области модуля (сохраняется в кэше)
+
+    Для DDR5 области DDR4 не читаются: code_id и признаки областей - None.
+    """
+    part_number, serial = module_identity(data)
+    if is_ddr5(data):
+        return {'part_number': part_number, 'serial': serial, 'code_id': None,
+                'secure_empty': None, 'smart_empty': None, 'unique_bytes': None}
+    secure_area = bytes(data[slice(*AREAS['hpe_secure'])])
+    smart_area = bytes(data[slice(*AREAS['hpe_smart'])])
+    vendor_data = bytes(data[slice(*AREAS['vendor'])])
+    return {
+        'part_number': part_number,
+        'serial': serial,
+        # Первые 16 байт secure области - идентификатор кода
+        'code_id': secure_area[:16].hex(),
+        'secure_empty': secure_area in (bytes(len(secure_area)), b'\xFF' * len(secure_area)),
+        'smart_empty': smart_area in (bytes(len(smart_area)), b'\xFF' * len(smart_area)),
+        'unique_bytes': len(set(vendor_data)),
+    }
+
+class SecureCodeStats:
+    """Группы модулей по идентификатору Secure Code
+
+    Для каждого кода - число модулей и первые samples примеров (имя, S/N)
+    в порядке поступления. DDR5 модули (code_id None) только считаются.
+    Части партии объединяются merge().
+    """
+
+    def __init__(self, samples=3):
+        self.samples = samples
+        # code_id -> [число модулей, [(имя, serial), ...]]
+        self.groups = {}
+        # Модули без Secure Code DDR4 (DDR5)
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self.groups)
+
+    def add(self, name, summary):
+        """Учёт модуля по сводке secure_summary"""
+        if summary['code_id'] is None:
+            self.skipped += 1
+            return
+        group = self.groups.setdefault(summary['code_id'], [0, []])
+        group[0] += 1
+        if len(group[1]) < self.samples:
+            group[1].append((name, summary['serial']))
+
+    def merge(self, other):
+        """Добавление групп другой части партии (ассоциативно)"""
+        for code_id, (count, modules) in other.groups.items():
+            group = self.groups.setdefault(code_id, [0, []])
+            group[0] += count
+            group[1].extend(modules[:self.samples - len(group[1])])
+        self.skipped += other.skipped
+        return self
+
+    __iadd__ = merge
+
+    def to_dict(self):
+        return {'samples': self.samples, 'skipped': self.skipped,
+                'groups': [[code_id, count, [list(m) for m in modules]]
+                           for code_id, (count, modules) in self.groups.items()]}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d['samples'])
+        for code_id, count, modules in d['groups']:
+            stats.groups[code_id] = [count, [tuple(m) for m in modules]]
+        stats.skipped = d.get('skipped', 0)
+        return stats
+
+    def print_report(self):
+        """Отчёт сравнения Secure Codes (вывод compare_secure_codes)"""
+        print(f"\n{'='*80}")
+        print("🔐 СРАВНЕНИЕ SECURE CODES")
+        print(f"{'='*80}\n")
         
-        # Используем первые 16 байт как идентификатор
-        code_id = secure_code[:16].hex()
+        print(f"Найдено уникальных Secure Codes: {len(self.groups)}\n")
         
-        if code_id not in secure_codes:
-            secure_codes[code_id] = []
-        secure_codes[code_id].append((f, serial))
-    
-    print(f"Найдено уникальных Secure Codes: {len(secure_codes)}\n")
+        if self.skipped:
+            print(f"⚠️  DDR5 модулей пропущено: {self.skipped} "
+                  f"(области Secure Code DDR4 к ним не применимы)\n")
+        if not self.groups:
+            return
+        if len(self.groups) == 1:
+            print("✅ Все модули имеют ОДИНАКОВЫЙ Secure Code")
+            print("   (Возможно, это партийный код или пусто)")
+        else:
+            print("⚠️  Модули имеют РАЗНЫЕ Secure Codes")
+            for i, (code_id, (count, modules)) in enumerate(self.groups.items(), 1):
+                print(f"\n  Код #{i}: {code_id[:32]}...")
+                print(f"  Модулей: {count}")
+                for fname, serial in modules:
+                    print(f"    - {os.path.basename(fname)} (S/N: 0x{serial:08X})")
+                if count > len(modules):
+                    print(f"    ... и еще {count - len(modules)}")
+
+def cached_secure_summary(src, cache=None):
+    """secure_summary источника, через кэш результатов, если он задан"""
+    from spd_batch import read_source
+    
+    summary = cache.get(src, 'secure', read_source) if cache is not None else None
+    if summary is None:
+        data = read_source(src)
+        summary = secure_summary(data)
+        if cache is not None:
+            cache.put(src, 'secure', data, summary)
+    return summary
+
+def compare_secure_codes(files, cache=None):
+    """Сравнение Secure Code между модулями
+
+    Ошибка чтения файла выводится для него и не прерывает сравнение партии.
+    """
+    from spd_batch import source_name
     
-    if len(secure_codes) == 1:
-        print("✅ Все модули имеют ОДИНАКОВЫЙ Secure Code")
-        print("   (Возможно, это партийный код или пусто)")
-    else:
-        print("⚠️  Модули имеют РАЗНЫЕ Secure Codes")
-        for i, (code_id, modules) in enumerate(secure_codes.items(), 1):
-            print(f"\n  Код #{i}: {code_id[:32]}...")
-            print(f"  Модулей: {len(modules)}")
-            for fname, serial in modules[:3]:  # Показываем первые 3
-                print(f"    - {os.path.basename(fname)} (S/N: 0x{serial:08X})")
-            if len(modules) > 3:
-                print(f"    ... и еще {len(modules) - 3}")
-
-def main():
+    stats = SecureCodeStats()
+    for src in files:
+        name = source_name(src)
+        try:
+            summary = cached_secure_summary(src, cache)
+        except Exception as e:
+            print(f"❌ Ошибка при обработке {name}: {e}")
+            continue
+        stats.add(name, summary)
+    stats.print_report()
+    return stats
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    import argparse
+    from spd_cache import add_cache_args
+    from spd_profile import add_profile_args
+
+    parser = argparse.ArgumentParser(description="Анализатор HPE Secure Code и SMART данных")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack и/или директории "
+                             "(по умолчанию текущая)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="рекурсивный поиск .bin в директориях")
+    parser.add_argument('--stats', action='store_true',
+                        help="статистика vendor области по всей партии (требует numpy)")
+    add_cache_args(parser)
+    add_profile_args(parser)
+    return parser.parse_args(argv)
+
+# Стадии для --profile: модуль -> (функции, функции чтения)
+PROFILE_STAGES = {
+    'analyze_hpe_secure': (('analyze_hpe_secure', 'hex_dump', 'secure_summary',
+                            'compare_secure_codes'), ()),
+    'analyze_hpe_spd': ((), ('read_spd',)),
+    'spd_batch': ((), ('read_source',)),
+}
+
+def main(argv=None):
     """Главная функция"""
+    from spd_profile import start_profiling
+    
+    args = parse_args(argv)
+    start_profiling(args, PROFILE_STAGES)
+    # Импорт после start_profiling - чтобы получить подменённые стадии
+    from spd_batch import collect_inputs, read_source, source_name
     print("🔍 Анализатор HPE Secure Code и SMART данных\n")
     
-    # Ищем все .bin файлы
-    bin_files = sorted(list(Path('.').glob('*.bin')))
+    # Ищем все .bin файлы (или берём файлы/директории/.spdpack из аргументов)
+    bin_files = collect_inputs(args.paths, args.recursive)
     
     if not bin_files:
         print("❌ Не найдено .bin файлов")
@@ -194,8 +334,8 @@ def main():
     # Детальный анализ первых 3 файлов
     for bin_file in bin_files[:3]:
         try:
-            data = open(str(bin_file), 'rb').read(512)
-            analyze_hpe_secure(data, str(bin_file))
+            data = read_source(bin_file)
+            analyze_hpe_secure(data, source_name(bin_file))
         except Exception as e:
             print(f"❌ Ошибка: {e}")
     
@@ -203,11 +343,25 @@ def main():
         print(f"\n... (остальные {len(bin_files) - 3} файлов пропущены для краткости)")
     
     # Сравнительный анализ всех файлов
+    cache = None
+    if args.cache:
+        from spd_cache import AnalysisCache
+        cache = AnalysisCache(args.cache)
     try:
-        compare_secure_codes([str(f) for f in bin_files])
+        compare_secure_codes(bin_files, cache)
     except Exception as e:
         print(f"❌ Ошибка сравнения: {e}")
     
+    if args.stats:
+        from spd_stats import collect, print_report
+        print()
+        print_report(collect(bin_files, *AREAS['vendor'], dram_type=DDR4_TYPE))
+    
+    if cache is not None:
+        removed = cache.evict(args.cache_max_age, args.cache_max_entries)
+        print(f"\n💾 Кэш: попаданий {cache.hits}, промахов {cache.misses}, удалено {removed}")
+        cache.close()
+    
     print(f"\n{'='*80}")
     print("✅ Анализ завершен")
     print(f"{'='*80}\n")
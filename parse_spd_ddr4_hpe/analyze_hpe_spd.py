@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Анализ HPE DDR4 SPD дампов"""
+"""Анализ HPE DDR4 SPD дампов (DDR5 - spd_ddr5, выбор по байту 2)"""
 
 import os
 import sys
-from pathlib import Path
+from collections import Counter
 
-# JEDEC Manufacturer IDs (байты 320-321)
+from spd_crc import crc16
+from spd_db import get_db, manufacturer_name
+from spd_ddr5 import DDR5_SIZE, analyze_ddr5, is_ddr5, print_ddr5_details
+from spd_hexdump import hex_dump
+from spd_layout import decode_image
+from spd_record import SpdRecord
+
+# JEDEC Manufacturer IDs (байты 320-321); полный список - Database/manufacturers.json
+# (spd_db), эти значения - запасные, если базы нет
 MANUFACTURERS = {
     0x80CE: "Samsung",
     0x802C: "Micron",
@@ -22,156 +30,116 @@ MODULE_TYPES = {
     0x04: "LRDIMM",
 }
 
+# SDRAM Density (байт 4, биты 3-0)
+DENSITIES = {0: "256Mb", 1: "512Mb", 2: "1Gb", 3: "2Gb", 4: "4Gb", 5: "8Gb", 6: "16Gb", 7: "32Gb"}
+
+# Bank Address bits (байт 4, биты 5-4)
+BANKS_COUNT = {0: "4", 1: "8"}
+
+# Device Width (байт 12, биты 2-0)
+DEVICE_WIDTHS = {0: "x4", 1: "x8", 2: "x16", 3: "x32"}
+
+# Register Manufacturer IDs (байты 133-134); запасные значения, как и MANUFACTURERS
+REGISTER_MANUFACTURERS = {0x8632: "Montage", 0x80B3: "IDT", 0x80CE: "Samsung"}
+
+def register_info(reg_mfg_id):
+    """(производитель, модель или None) регистра по байтам 133-134"""
+    model = get_db().register_model(reg_mfg_id)
+    return manufacturer_name(reg_mfg_id, REGISTER_MANUFACTURERS), model[1] if model else None
+
 def read_spd(filename):
-    """Чтение SPD дампа"""
+    """Чтение SPD дампа (до 1024 байт - полный образ DDR5)"""
     with open(filename, 'rb') as f:
-        return f.read(512)
-
-def hex_dump(data, offset, length, line_prefix=""):
-    """Форматированный hex dump"""
-    lines = []
-    for i in range(offset, min(offset + length, len(data)), 16):
-        hex_bytes = " ".join(f"{b:02X}" for b in data[i:i+16])
-        ascii_repr = "".join(chr(b) if 32 <= b < 127 else "." for b in data[i:i+16])
-        lines.append(f"{line_prefix}{i:03X}: {hex_bytes:<48} {ascii_repr}")
-    return "\n".join(lines)
+        return f.read(DDR5_SIZE)
 
 def analyze_spd(data, filename):
-    """Детальный анализ SPD"""
-    results = {}
-    results['filename'] = os.path.basename(filename)
-    
-    # Основные параметры SPD
-    results['spd_bytes_used'] = data[0]
-    results['spd_revision'] = f"{data[1] >> 4}.{data[1] & 0x0F}"
-    results['dram_type'] = data[2]
-    results['module_type_code'] = data[3]
-    results['module_type'] = MODULE_TYPES.get(data[3] & 0x0F, "Unknown")
-    
-    # SDRAM параметры
-    density = data[4] & 0x0F
-    densities = {0: "256Mb", 1: "512Mb", 2: "1Gb", 3: "2Gb", 4: "4Gb", 5: "8Gb", 6: "16Gb", 7: "32Gb"}
-    results['sdram_density'] = densities.get(density, "Unknown")
-    
-    banks = (data[4] >> 4) & 0x03
-    banks_count = {0: "4", 1: "8"}
-    results['sdram_banks'] = banks_count.get(banks, "Unknown")
-    
-    # Адресация
-    rows = data[5] & 0x07
-    cols = (data[5] >> 3) & 0x07
-    results['row_addr'] = 12 + rows
-    results['col_addr'] = 9 + cols
-    
-    # Module organization
-    device_width = data[12] & 0x07
-    widths = {0: "x4", 1: "x8", 2: "x16", 3: "x32"}
-    results['device_width'] = widths.get(device_width, "Unknown")
-    
-    ranks = ((data[12] >> 3) & 0x07) + 1
-    results['ranks'] = ranks
-    
-    # Timing parameters
-    results['mtb'] = 0.125  # Medium Timebase = 125ps для DDR4
-    results['tck_min'] = data[18] * results['mtb']
-    results['tck_max'] = data[19] * results['mtb']
-    results['freq_mhz'] = int(2000 / results['tck_min'])
-    
-    # CAS Latencies
-    cl_low = data[20] | (data[21] << 8) | (data[22] << 16) | (data[23] << 24)
-    cl_supported = [i for i in range(32) if cl_low & (1 << i)]
-    results['cas_latencies'] = cl_supported
-    
-    # Timings
-    results['taa_min'] = data[24] * results['mtb']  # ns
-    results['trcd_min'] = data[25] * results['mtb']
-    results['trp_min'] = data[26] * results['mtb']
-    results['tras_min'] = ((data[27] & 0x0F) << 8 | data[28]) * results['mtb']
-    results['trc_min'] = (((data[27] & 0xF0) << 4) | data[29]) * results['mtb']
-    
-    # Module Manufacturer (байты 320-321)
-    mfg_id = (data[320] << 8) | data[321]
-    results['module_mfg_id'] = mfg_id
-    results['module_mfg'] = MANUFACTURERS.get(mfg_id, f"Unknown (0x{mfg_id:04X})")
-    
-    # Module Part Number (байты 329-348)
-    part_num = data[329:349].decode('ascii', errors='ignore').strip()
-    results['part_number'] = part_num
-    
-    # Module Serial Number (байты 325-328)
-    serial = int.from_bytes(data[325:329], 'big')
-    results['serial_number'] = f"0x{serial:08X}"
-    
-    # Manufacturing Date (байты 323-324)
-    mfg_year = 2000 + data[323]
-    mfg_week = data[324]
-    results['mfg_date'] = f"Week {mfg_week}, {mfg_year}"
-    
-    # Manufacturing Location (байт 322)
-    results['mfg_location'] = data[322]
-    
-    # DRAM Manufacturer (байты 350-351)
-    dram_mfg_id = (data[350] << 8) | data[351]
-    results['dram_mfg_id'] = dram_mfg_id
-    results['dram_mfg'] = MANUFACTURERS.get(dram_mfg_id, f"Unknown (0x{dram_mfg_id:04X})")
-    
-    # Register Manufacturer (RDIMM only, байты 133-134)
-    if results['module_type'] == "RDIMM":
-        reg_mfg_id = (data[133] << 8) | data[134]
-        reg_mfgs = {0x8083: "Montage", 0x80B3: "IDT", 0x80CE: "Samsung"}
-        results['register_mfg_id'] = reg_mfg_id
-        results['register_mfg'] = reg_mfgs.get(reg_mfg_id, f"Unknown (0x{reg_mfg_id:04X})")
-        
-        # Register Revision (байт 135)
-        results['register_rev'] = data[135]
-    
-    # Checksum (байт 127 для первых 128 байт, байт 255 для вторых 128 байт)
-    crc_page0 = data[126] | (data[127] << 8)
-    crc_page1 = data[254] | (data[255] << 8)
-    results['crc_page0'] = f"0x{crc_page0:04X}"
-    results['crc_page1'] = f"0x{crc_page1:04X}"
-    
-    return results
+    """Детальный анализ SPD; образы DDR5 разбирает spd_ddr5.analyze_ddr5
+
+    Для DDR4 возвращает spd_record.SpdRecord: сырые поля, строки для вывода
+    формируются при обращении к ключам словаря.
+    """
+    if is_ddr5(data):
+        return analyze_ddr5(data, filename)
+    f = decode_image(data)
+    # Checksum (байты 126-127 для 0-125, байты 254-255 для 128-253)
+    crc_ok = (crc16(data[0:126]) == f['crc_page0'], crc16(data[128:254]) == f['crc_page1'])
+    return SpdRecord.from_fields(f, os.path.basename(filename), crc_ok)
+
+def crc_status(results, key):
+    """Отметка результата проверки CRC"""
+    ok = results.get(key)
+    if ok is None:
+        return ""
+    return "✅" if ok else "❌ не совпадает"
+
+def crc_flags(results):
+    """Результаты проверок CRC модуля: DDR5 - один блок, DDR4 - две страницы"""
+    if 'crc_base_ok' in results:
+        return [results['crc_base_ok']]
+    return [results.get('crc_page0_ok'), results.get('crc_page1_ok')]
+
+def speed_label(results):
+    """Скорость с поколением памяти, например DDR4-3200"""
+    return f"{results.get('memory_type', 'DDR4')}-{results['freq_mhz']}"
 
 def print_detailed_analysis(results):
     """Красивый вывод результатов анализа"""
+    generation = results.get('memory_type', 'DDR4')
     print(f"\n{'='*80}")
     print(f"  {results['filename']}")
     print(f"{'='*80}\n")
     
     print("📋 ОСНОВНАЯ ИНФОРМАЦИЯ:")
     print(f"  SPD Revision:          {results['spd_revision']}")
-    print(f"  DRAM Type:             DDR4 (0x{results['dram_type']:02X})")
+    print(f"  DRAM Type:             {generation} (0x{results['dram_type']:02X})")
     print(f"  Module Type:           {results['module_type']} (0x{results['module_type_code']:02X})")
     
     print("\n💾 ПАРАМЕТРЫ ПАМЯТИ:")
     print(f"  SDRAM Density:         {results['sdram_density']}")
-    print(f"  SDRAM Banks:           {results['sdram_banks']} banks")
+    if 'bank_groups' in results:
+        print(f"  Bank Groups:           {results['bank_groups']} x {results['sdram_banks']} banks")
+    else:
+        print(f"  SDRAM Banks:           {results['sdram_banks']} banks")
     print(f"  Device Width:          {results['device_width']}")
     print(f"  Ranks:                 {results['ranks']}")
     print(f"  Row Address:           {results['row_addr']} bits")
     print(f"  Column Address:        {results['col_addr']} bits")
+    if results.get('capacity_gb'):
+        print(f"  Capacity:              {results['capacity_gb']:g} GB")
     
     print(f"\n⚡ ЧАСТОТА И ТАЙМИНГИ:")
-    print(f"  Frequency:             DDR4-{results['freq_mhz']} ({results['tck_min']:.3f} ns)")
+    print(f"  Frequency:             {speed_label(results)} ({results['tck_min']:.3f} ns)")
     print(f"  tAA (CAS Latency):     {results['taa_min']:.3f} ns")
     print(f"  tRCD:                  {results['trcd_min']:.3f} ns")
     print(f"  tRP:                   {results['trp_min']:.3f} ns")
     print(f"  tRAS:                  {results['tras_min']:.3f} ns")
     print(f"  tRC:                   {results['trc_min']:.3f} ns")
     
-    # Рассчитываем CL в тактах для основной частоты
-    cl_cycles = int(results['taa_min'] / results['tck_min'])
-    trcd_cycles = int(results['trcd_min'] / results['tck_min'])
-    trp_cycles = int(results['trp_min'] / results['tck_min'])
-    tras_cycles = int(results['tras_min'] / results['tck_min'])
-    print(f"  Timings (cycles):      {cl_cycles}-{trcd_cycles}-{trp_cycles}-{tras_cycles}")
+    ps = results.get('timings_ps', {})
+    if ps and generation == 'DDR4':
+        print(f"  tRFC1/2/4:             {ps['trfc1_min'] / 1000:g} / {ps['trfc2_min'] / 1000:g} / "
+              f"{ps['trfc4_min'] / 1000:g} ns")
+        print(f"  tFAW / tWR:            {ps['tfaw_min'] / 1000:.3f} / {ps['twr_min'] / 1000:.3f} ns")
+        print(f"  tRRD_S/L, tCCD_L:      {ps['trrd_s_min'] / 1000:.3f} / {ps['trrd_l_min'] / 1000:.3f}, "
+              f"{ps['tccd_l_min'] / 1000:.3f} ns")
+        print(f"  tWTR_S/L:              {ps['twtr_s_min'] / 1000:.3f} / {ps['twtr_l_min'] / 1000:.3f} ns")
     
+    print(f"  Timings (cycles):      {'-'.join(map(str, timing_cycles(results)))}")
     print(f"  Supported CAS:         {', '.join(map(str, results['cas_latencies'][-8:]))}")
+    if results.get('cycle_table'):
+        print(f"  CL-tRCD-tRP-tRAS-tRC по скоростям:")
+        for rate, *cycles in results['cycle_table']:
+            print(f"    {f'{generation}-{rate}:':<21}{'-'.join(map(str, cycles))}")
+    if generation == 'DDR5':
+        print_ddr5_details(results)
     
     print(f"\n🏭 ПРОИЗВОДИТЕЛЬ:")
     print(f"  Module Mfg:            {results['module_mfg']} (ID: 0x{results['module_mfg_id']:04X})")
     print(f"  Part Number:           {results['part_number']}")
+    decoded = get_db().decode_part_number(results['part_number'])
+    if decoded:
+        print(f"  PN Format:             {decoded['vendor']}: {decoded['format']}")
+        print(f"                         {' '.join(f'{k}={v}' for k, v in decoded['fields'].items())}")
     print(f"  Serial Number:         {results['serial_number']}")
     print(f"  Manufacturing Date:    {results['mfg_date']}")
     print(f"  Manufacturing Loc:     0x{results['mfg_location']:02X}")
@@ -182,100 +150,268 @@ def print_detailed_analysis(results):
     if 'register_mfg' in results:
         print(f"\n🔌 РЕГИСТР (RDIMM):")
         print(f"  Register Mfg:          {results['register_mfg']} (ID: 0x{results['register_mfg_id']:04X})")
+        if 'register_model' in results:
+            print(f"  Register Model:        {results['register_model']}")
         print(f"  Register Revision:     0x{results['register_rev']:02X}")
     
     print(f"\n✅ КОНТРОЛЬНЫЕ СУММЫ:")
-    print(f"  CRC Page 0 (0-127):    {results['crc_page0']}")
-    print(f"  CRC Page 1 (128-255):  {results['crc_page1']}")
+    if 'crc_base' in results:
+        print(f"  CRC Base (0-509):      {results['crc_base']} {crc_status(results, 'crc_base_ok')}")
+        return
+    print(f"  CRC Page 0 (0-127):    {results['crc_page0']} {crc_status(results, 'crc_page0_ok')}")
+    print(f"  CRC Page 1 (128-255):  {results['crc_page1']} {crc_status(results, 'crc_page1_ok')}")
+
+def timing_cycles(results):
+    """Тайминги CL-tRCD-tRP-tRAS в тактах (предрасчитаны в analyze_spd)"""
+    return tuple(results['timing_cycles'])
+
+class ModuleStats:
+    """Накопительная статистика для сравнения модулей
+
+    Модули добавляются и удаляются по одному без пересчёта всей партии
+    (используется и в пакетном режиме, и в режиме наблюдения за директорией).
+    """
+
+    def __init__(self, results_list=()):
+        self.part_numbers = Counter()
+        self.frequencies = Counter()
+        self.timings = Counter()
+        # Серийные номера в порядке поступления: ключ модуля -> serial
+        self.serials = {}
+        self._next_key = 0
+        for results in results_list:
+            self.add(results)
+
+    def __len__(self):
+        return len(self.serials)
+
+    def add(self, results, key=None):
+        """Учёт модуля; key - идентификатор для remove() (например, путь к файлу)"""
+        if key is None:
+            key = self._next_key
+            self._next_key += 1
+        self.part_numbers[results['part_number']] += 1
+        self.frequencies[speed_label(results)] += 1
+        self.timings[timing_cycles(results)] += 1
+        self.serials[key] = results['serial_number']
+
+    def remove(self, results, key):
+        """Исключение ранее добавленного модуля (например, файл перезаписан)"""
+        for counter, value in ((self.part_numbers, results['part_number']),
+                               (self.frequencies, speed_label(results)),
+                               (self.timings, timing_cycles(results))):
+            counter[value] -= 1
+            if counter[value] <= 0:
+                del counter[value]
+        self.serials.pop(key, None)
+
+    def merge(self, other):
+        """Добавление статистики другой части партии (ассоциативно)
+
+        Счётчики складываются с сохранением порядка первого появления,
+        серийные номера other идут после своих и получают новые ключи.
+        """
+        self.part_numbers.update(other.part_numbers)
+        self.frequencies.update(other.frequencies)
+        self.timings.update(other.timings)
+        for serial in other.serials.values():
+            self.serials[self._next_key] = serial
+            self._next_key += 1
+        return self
+
+    __iadd__ = merge
+
+    def to_dict(self):
+        """JSON-совместимая форма (порядок ключей счётчиков сохраняется)"""
+        return {
+            'part_numbers': list(self.part_numbers.items()),
+            'frequencies': list(self.frequencies.items()),
+            'timings': [[list(t), n] for t, n in self.timings.items()],
+            'serials': list(self.serials.values()),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.part_numbers.update(dict(d['part_numbers']))
+        stats.frequencies.update(dict(d['frequencies']))
+        stats.timings.update({tuple(t): n for t, n in d['timings']})
+        stats.serials = dict(enumerate(d['serials']))
+        stats._next_key = len(stats.serials)
+        return stats
+
+    def print_report(self):
+        """Отчёт сравнения модулей (вывод compare_modules)"""
+        print(f"\n{'='*80}")
+        print(f"  СРАВНЕНИЕ МОДУЛЕЙ")
+        print(f"{'='*80}\n")
+        
+        print(f"📊 СТАТИСТИКА:")
+        print(f"  Всего модулей:         {len(self)}")
+        print(f"  Уникальных PN:         {len(self.part_numbers)}")
+        print(f"  Частоты:               {', '.join(sorted(self.frequencies))}")
+        
+        if len(self.part_numbers) == 1:
+            print(f"\n✅ Все модули одной модели: {next(iter(self.part_numbers))}")
+        else:
+            print(f"\n⚠️  Найдено несколько моделей:")
+            for pn, count in self.part_numbers.items():
+                print(f"    - {pn}: {count} шт.")
+        
+        print(f"\n🔢 СЕРИЙНЫЕ НОМЕРА:")
+        for i, serial in enumerate(self.serials.values(), 1):
+            print(f"  {i:2d}. {serial}")
+        
+        # Проверяем различия в таймингах
+        if len(self.timings) == 1:
+            print(f"\n✅ Тайминги одинаковые у всех модулей")
+        else:
+            print(f"\n⚠️  Найдены различия в таймингах:")
+            for timing, count in self.timings.items():
+                print(f"    {timing[0]}-{timing[1]}-{timing[2]}-{timing[3]}: {count} модулей")
 
 def compare_modules(results_list):
     """Сравнение нескольких модулей"""
     if len(results_list) < 2:
         return
-    
-    print(f"\n{'='*80}")
-    print(f"  СРАВНЕНИЕ МОДУЛЕЙ")
-    print(f"{'='*80}\n")
-    
-    # Группируем по параметрам
-    part_numbers = set(r['part_number'] for r in results_list)
-    frequencies = set(r['freq_mhz'] for r in results_list)
-    serials = [r['serial_number'] for r in results_list]
-    
-    print(f"📊 СТАТИСТИКА:")
-    print(f"  Всего модулей:         {len(results_list)}")
-    print(f"  Уникальных PN:         {len(part_numbers)}")
-    print(f"  Частоты:               {', '.join(f'DDR4-{f}' for f in sorted(frequencies))}")
-    
-    if len(part_numbers) == 1:
-        print(f"\n✅ Все модули одной модели: {part_numbers.pop()}")
-    else:
-        print(f"\n⚠️  Найдено несколько моделей:")
-        for pn in part_numbers:
-            count = sum(1 for r in results_list if r['part_number'] == pn)
-            print(f"    - {pn}: {count} шт.")
-    
-    print(f"\n🔢 СЕРИЙНЫЕ НОМЕРА:")
-    for i, serial in enumerate(serials, 1):
-        print(f"  {i:2d}. {serial}")
-    
-    # Проверяем различия в таймингах
-    timings_set = set()
-    for r in results_list:
-        cl = int(r['taa_min'] / r['tck_min'])
-        trcd = int(r['trcd_min'] / r['tck_min'])
-        trp = int(r['trp_min'] / r['tck_min'])
-        tras = int(r['tras_min'] / r['tck_min'])
-        timings_set.add((cl, trcd, trp, tras))
-    
-    if len(timings_set) == 1:
-        print(f"\n✅ Тайминги одинаковые у всех модулей")
-    else:
-        print(f"\n⚠️  Найдены различия в таймингах:")
-        for timing in timings_set:
-            count = sum(1 for r in results_list 
-                       if (int(r['taa_min']/r['tck_min']), int(r['trcd_min']/r['tck_min']), 
-                           int(r['trp_min']/r['tck_min']), int(r['tras_min']/r['tck_min'])) == timing)
-            print(f"    {timing[0]}-{timing[1]}-{timing[2]}-{timing[3]}: {count} модулей")
-
-def main():
+    ModuleStats(results_list).print_report()
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    import argparse
+    from spd_batch import DEFAULT_CHUNK_SIZE
+    from spd_cache import add_cache_args
+    from spd_filter import add_filter_args
+    from spd_output import FORMATS
+    from spd_profile import add_profile_args
+
+    parser = argparse.ArgumentParser(description="Анализатор HPE DDR4 SPD дампов (и DDR5)")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack и/или директории "
+                             "(по умолчанию текущая)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="рекурсивный поиск .bin в директориях")
+    parser.add_argument('-l', '--file-list', action='append', default=[], metavar='FILE',
+                        help="файл со списком дампов, по одному на строку ('-' = stdin)")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="число рабочих процессов/потоков (0 = все ядра)")
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process',
+                        help="тип пула (по умолчанию process)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="файлов в одной порции работы")
+    parser.add_argument('--hex', action='store_true', help="вывод hex dump первых 256 байт")
+    parser.add_argument('-f', '--format', choices=FORMATS, default='text',
+                        help="формат вывода: text (отчёт, по умолчанию), jsonl, csv, columnar")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="файл для машиночитаемого вывода (по умолчанию stdout)")
+    add_filter_args(parser)
+    add_cache_args(parser)
+    add_profile_args(parser)
+    return parser.parse_args(argv)
+
+# Стадии для --profile: модуль -> (функции, функции чтения)
+PROFILE_STAGES = {
+    'analyze_hpe_spd': (('analyze_spd', 'print_detailed_analysis', 'hex_dump', 'compare_modules'),
+                        ('read_spd',)),
+    'spd_batch': ((), ('read_source',)),
+    'spd_output': (('write_records',), ()),
+}
+
+def main(argv=None):
     """Главная функция"""
-    print("🔍 Анализатор HPE DDR4 SPD дампов\n")
+    from spd_profile import start_profiling
+
+    args = parse_args(argv)
+    start_profiling(args, PROFILE_STAGES)
+    # Импорт после start_profiling - чтобы получить подменённые стадии
+    from spd_batch import collect_inputs, read_source, run_batch
+    text = args.format == 'text'
+    # В машиночитаемых режимах stdout занят данными - сообщения идут в stderr
+    log = sys.stdout if text else sys.stderr
+    print("🔍 Анализатор HPE DDR4 SPD дампов\n", file=log)
     
     # Ищем все .bin файлы
-    bin_files = list(Path('.').glob('*.bin'))
+    bin_files = collect_inputs(args.paths, args.recursive, args.file_list)
     
     if not bin_files:
-        print("❌ Не найдено .bin файлов в текущей директории")
+        print("❌ Не найдено .bin файлов в текущей директории", file=log)
         return
     
-    print(f"📁 Найдено файлов: {len(bin_files)}\n")
+    print(f"📁 Найдено файлов: {len(bin_files)}\n", file=log)
+    
+    if args.filter:
+        # Отбор по сырым байтам до анализа: полный разбор только у подошедших
+        from spd_filter import Predicate, select
+        try:
+            predicate = Predicate(args.filter)
+        except ValueError as e:
+            print(f"❌ Фильтр: {e}", file=log)
+            return
+        bin_files = list(select(bin_files, predicate))
+        print(f"🔎 Под фильтр подходит: {len(bin_files)}\n", file=log)
+        if not bin_files:
+            return
+    
+    def run(sources, keep_data=args.hex):
+        return run_batch(sources, args.workers, args.executor, args.chunk_size, keep_data)
+    
+    cache = None
+    if args.cache:
+        from spd_cache import AnalysisCache, run_cached
+        cache = AnalysisCache(args.cache)
+        stream = run_cached(bin_files, cache, 'spd', lambda misses: run(misses, True), read_source)
+    else:
+        stream = run(bin_files)
+    
+    if text:
+        print_report(zip(bin_files, stream), args.hex)
+    else:
+        from spd_output import write_records
+        
+        def records():
+            for bin_file, results, data, error in stream:
+                if error is not None:
+                    print(f"❌ Ошибка при обработке {bin_file}: {error}", file=log)
+                    continue
+                yield results
+        
+        count = write_records(records(), args.format, args.output)
+        print(f"✅ Записано модулей: {count}", file=log)
+    
+    if cache is not None:
+        removed = cache.evict(args.cache_max_age, args.cache_max_entries)
+        print(f"\n💾 Кэш: попаданий {cache.hits}, промахов {cache.misses}, удалено {removed}", file=log)
+        cache.close()
+    
+    if text:
+        print(f"\n{'='*80}")
+        print("✅ Анализ завершен")
+        print(f"{'='*80}\n")
+
+def print_report(stream, show_hex=False):
+    """Человекочитаемый отчёт по потоку (источник, результат) и сравнение модулей"""
+    from spd_batch import read_source
     
     results_list = []
     
-    for bin_file in sorted(bin_files):
-        try:
-            data = read_spd(str(bin_file))
-            results = analyze_spd(data, str(bin_file))
-            results_list.append(results)
-            print_detailed_analysis(results)
-            
-            # Опционально: вывод hex dump
-            if '--hex' in sys.argv:
-                print(f"\n📝 HEX DUMP (первые 256 байт):")
-                print(hex_dump(data, 0, 256, "  "))
-            
-        except Exception as e:
-            print(f"❌ Ошибка при обработке {bin_file}: {e}")
+    for src, (bin_file, results, data, error) in stream:
+        if error is not None:
+            print(f"❌ Ошибка при обработке {bin_file}: {error}")
+            continue
+        
+        results_list.append(results)
+        print_detailed_analysis(results)
+        
+        # Опционально: вывод hex dump
+        if show_hex:
+            if data is None:
+                data = read_source(src)
+            print(f"\n📝 HEX DUMP (первые 256 байт):")
+            print(hex_dump(data, 0, 256, "  "))
     
     # Сравнительный анализ
     if results_list:
         compare_modules(results_list)
-    
-    print(f"\n{'='*80}")
-    print("✅ Анализ завершен")
-    print(f"{'='*80}\n")
 
 if __name__ == '__main__':
     main()
-
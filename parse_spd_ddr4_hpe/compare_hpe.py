@@ -1,163 +1,275 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""Сравнение HPE SPD дампов с эталоном: пара файлов или целая партия"""
 
 import sys
 
+import numpy as np
+
+from spd_batch import collect_inputs, read_source, source_name
+from spd_hexdump import hex_bytes
+from spd_layout import AREAS, BLOCKS, FIELD_BY_NAME, REGIONS, SPD_SIZE, read_field, region_name
+
 file1 = "64Gb_Samsung_2Rx4_M393A8G40CB4-CWE_M88DR4RCD02P_HPE_4448ECFB.bin"
 file2 = "64Gb_Samsung_2Rx4_M393A8G40CB4-CWE_M88DR4RCD02P_HPE_4448ED07.bin"
 
-print("🔍 HPE SPD Comparator - Быстрое сравнение")
-print("=" * 60)
-print(f"\nФайл 1: {file1}")
-print(f"Файл 2: {file2}\n")
+# Начала регионов для np.add.reduceat (REGIONS - непрерывное разбиение 0..511)
+REGION_STARTS = np.array([start for _, start, _ in REGIONS])
+REGION_NAMES = [name for name, _, _ in REGIONS] + ["Out of range"]
+BLOCK_STARTS = np.array([start for _, start, _ in BLOCKS])
 
-try:
-    with open(file1, 'rb') as f:
-        data1 = f.read()
-    with open(file2, 'rb') as f:
-        data2 = f.read()
-except Exception as e:
-    print(f"❌ Ошибка чтения: {e}")
-    sys.exit(1)
+def load_images(sources):
+    """Загрузка образов в массив (N, L), L - наибольший размер; возвращает и размеры"""
+    images = [read_source(src) for src in sources]
+    sizes = np.array([len(img) for img in images])
+    arr = np.zeros((len(images), max(sizes.max(), SPD_SIZE)), dtype=np.uint8)
+    for i, img in enumerate(images):
+        arr[i, :len(img)] = np.frombuffer(img, dtype=np.uint8)
+    return arr, sizes
 
-print(f"Размер 1: {len(data1)} bytes")
-print(f"Размер 2: {len(data2)} bytes\n")
+def diff_masks(ref, arr):
+    """Маски различий (N, L) через XOR с эталоном"""
+    return np.bitwise_xor(arr, ref) != 0
 
-# Находим различия
-diffs = []
-min_len = min(len(data1), len(data2))
+def region_counts(mask, starts):
+    """Число различающихся байт в каждом регионе для каждого модуля (N, R)
 
-for i in range(min_len):
-    if data1[i] != data2[i]:
-        diffs.append(i)
+    Хвост образа за пределами 512 байт (DDR5) попадает в отдельный столбец.
+    """
+    if mask.shape[1] > SPD_SIZE:
+        starts = np.append(starts, SPD_SIZE)
+    return np.add.reduceat(mask.astype(np.uint32), starts, axis=1)
 
-print(f"Различий: {len(diffs)} из {min_len} ({100.0*len(diffs)/min_len:.1f}%)\n")
+def field_mask(mask, name):
+    """Модули, у которых различается поле из spd_layout"""
+    f = FIELD_BY_NAME[name]
+    return mask[:, f.offset:f.offset + f.width].any(axis=1)
 
-if len(diffs) == 0:
-    print("✅ Файлы идентичны!")
-else:
+def print_pair_report(ref, arr, mask):
+    """Подробный вывод для сравнения двух файлов"""
+    diffs = np.flatnonzero(mask[0])
     print("=" * 60)
     print("📋 ВСЕ РАЗЛИЧАЮЩИЕСЯ БАЙТЫ")
     print("=" * 60)
     print()
-    
-    def get_block_name(offset):
-        if offset < 128: return "Base Config"
-        if offset < 256: return "Module Params"
-        if offset < 320: return "Reserved"
-        if offset < 325: return "Manufacturer ID"
-        if offset == 324: return "Location"
-        if offset < 329: return "Serial Number"
-        if offset < 349: return "Part Number"
-        if offset < 384: return "Manuf Data"
-        if offset < 388: return "HPE Header"
-        if offset < 392: return "HPE Secure ID"
-        if offset < 400: return "HPE Reserved"
-        if offset < 416: return "HPE Product Code"
-        return "Extended"
-    
     for pos in diffs:
-        block = get_block_name(pos)
-        print(f"  Offset {pos:3d} (0x{pos:03X}) [{block}]:")
-        print(f"    Файл 1: 0x{data1[pos]:02X}")
-        print(f"    Файл 2: 0x{data2[pos]:02X}")
+        print(f"  Offset {pos:3d} (0x{pos:03X}) [{region_name(pos)}]:")
+        print(f"    Файл 1: 0x{ref[pos]:02X}")
+        print(f"    Файл 2: 0x{arr[0, pos]:02X}")
         print()
 
-# Анализ по блокам
-print("=" * 60)
-print("📊 АНАЛИЗ ПО БЛОКАМ")
-print("=" * 60)
-print()
-
-blocks = [
-    ("Base Config (0-127)", 0, 128),
-    ("Module Params (128-255)", 128, 128),
-    ("Reserved (256-319)", 256, 64),
-    ("Manufacturing (320-383)", 320, 64),
-    ("HPE Secure Code (384-415)", 384, 32),
-    ("Extended (416-511)", 416, 96)
-]
-
-for name, start, size in blocks:
-    block_diffs = sum(1 for d in diffs if start <= d < start + size)
-    percent = 100.0 * block_diffs / size if size > 0 else 0
-    status = "✅ Идентичны" if block_diffs == 0 else \
-             "⚠️  Мало различий" if percent < 10 else "❌ Много различий"
-    print(f"  {name:<30} {block_diffs:3d}/{size:3d} ({percent:5.1f}%) {status}")
-
-# Детальный анализ critical блока
-print()
-print("=" * 60)
-print("🔬 КРИТИЧНЫЙ БЛОК: MANUFACTURING + SECURE (320-415)")
-print("=" * 60)
-print()
-
-fields = [
-    ("Manufacturer ID", 320, 4),
-    ("Location", 324, 1),
-    ("Serial Number", 325, 4),
-    ("Part Number", 329, 20),
-    ("Manuf Data", 349, 34),
-    ("CRC", 382, 2),
-    ("HPE Header", 384, 4),
-    ("HPE Secure ID", 388, 4),
-    ("HPE Reserved", 392, 8),
-    ("HPE Product", 400, 16),
-]
-
-for name, offset, size in fields:
-    same = all(data1[offset+i] == data2[offset+i] for i in range(size) if offset+i < min_len)
-    status = "✅" if same else "❌"
-    
-    print(f"  {status} {name:<20}", end="")
-    
-    if not same:
-        print()
-        print(f"    Файл 1: {' '.join(f'{data1[offset+i]:02X}' for i in range(size) if offset+i < len(data1))}")
-        print(f"    Файл 2: {' '.join(f'{data2[offset+i]:02X}' for i in range(size) if offset+i < len(data2))}")
-    else:
-        preview = ' '.join(f'{data1[offset+i]:02X}' for i in range(min(4, size)) if offset+i < len(data1))
-        if size > 4:
-            preview += " ..."
-        print(f" = {preview}")
-
-# Выводы
-print()
-print("=" * 60)
-print("💡 ВЫВОДЫ")
-print("=" * 60)
-print()
-
-serial_diff = any(325 <= d < 329 for d in diffs)
-secure_diff = any(388 <= d < 392 for d in diffs)
-manuf_diff = any(349 <= d < 384 for d in diffs)
-base_diff = any(d < 320 for d in diffs)
-
-if serial_diff and secure_diff and not base_diff and not manuf_diff:
-    print("  ✅ Различаются ТОЛЬКО Serial Number и Secure ID")
-    print("     → Это нормально для разных модулей одной серии")
-    print("     → HPE Secure ID пересчитывается для каждого S/N")
-
-if manuf_diff:
-    print("\n  ⚠️  Различается Manufacturing Data (349-382)")
-    print("     → Это могут быть версии, даты, счетчики")
-    print("     → HPE может проверять эти поля!")
-
-if base_diff:
-    print("\n  ❌ Различается Base Configuration (0-319)")
-    print("     → Это КРИТИЧНО - параметры памяти отличаются")
-
-# Показываем Secure ID
-if len(data1) > 391 and len(data2) > 391:
-    import struct
-    serial1 = struct.unpack('<I', data1[325:329])[0]
-    hash1 = struct.unpack('<I', data1[388:392])[0]
-    serial2 = struct.unpack('<I', data2[325:329])[0]
-    hash2 = struct.unpack('<I', data2[388:392])[0]
-    
+def print_lot_offsets(ref, arr, mask, limit):
+    """Список смещений, различающихся хотя бы у одного модуля партии"""
+    per_offset = mask.sum(axis=0)
+    offsets = np.flatnonzero(per_offset)
+    print("=" * 60)
+    print("📋 РАЗЛИЧАЮЩИЕСЯ СМЕЩЕНИЯ ПО ПАРТИИ")
+    print("=" * 60)
+    print()
+    print(f"  {'Offset':<14} {'Регион':<18} {'Эталон':>6} {'Модулей':>8} {'Значений':>9}")
+    for pos in offsets[:limit]:
+        values = np.unique(arr[:, pos])
+        print(f"  {pos:3d} (0x{pos:03X})    {region_name(pos):<18}   0x{ref[pos]:02X} "
+              f"{per_offset[pos]:8d} {len(values):9d}")
+    if len(offsets) > limit:
+        print(f"  ... и еще {len(offsets) - limit} смещений")
+    print()
+
+def print_block_report(mask):
+    """Анализ по крупным блокам SPD"""
+    print("=" * 60)
+    print("📊 АНАЛИЗ ПО БЛОКАМ")
+    print("=" * 60)
+    print()
+
+    any_diff = mask.any(axis=0, keepdims=True)
+    offsets_per_block = region_counts(any_diff, BLOCK_STARTS)[0]
+    modules_per_block = (region_counts(mask, BLOCK_STARTS) > 0).sum(axis=0)
+    lot = len(mask) > 1
+
+    for (name, start, size), block_diffs, modules in zip(BLOCKS, offsets_per_block,
+                                                         modules_per_block):
+        percent = 100.0 * block_diffs / size if size > 0 else 0
+        status = "✅ Идентичны" if block_diffs == 0 else \
+                 "⚠️  Мало различий" if percent < 10 else "❌ Много различий"
+        line = f"  {name:<30} {block_diffs:3d}/{size:3d} ({percent:5.1f}%) {status}"
+        if lot and modules:
+            line += f" [модулей: {modules}]"
+        print(line)
+
+def print_field_report(ref, arr, mask):
+    """Детальный анализ производственного блока и HPE Secure Code"""
+    crit_start, _ = AREAS['manufacturing']
+    _, crit_end = AREAS['hpe_secure']
+    print()
+    print("=" * 60)
+    print(f"🔬 КРИТИЧНЫЙ БЛОК: MANUFACTURING + SECURE ({crit_start}-{crit_end - 1})")
+    print("=" * 60)
+    print()
+
+    modules_per_region = (region_counts(mask, REGION_STARTS) > 0).sum(axis=0)
+    lot = len(arr) > 1
+
+    for i, (name, offset, size) in enumerate(REGIONS):
+        if not crit_start <= offset < crit_end:
+            continue
+        ref_bytes = ref[offset:offset + size]
+        differing = modules_per_region[i]
+        status = "✅" if not differing else "❌"
+        print(f"  {status} {name:<20}", end="")
+
+        if differing and not lot:
+            print()
+            print(f"    Файл 1: {hex_bytes(ref_bytes)}")
+            print(f"    Файл 2: {hex_bytes(arr[0, offset:offset + size])}")
+        elif differing:
+            variants = len(np.unique(arr[:, offset:offset + size], axis=0))
+            print(f" модулей: {differing}, вариантов: {variants}")
+            print(f"    Эталон: {hex_bytes(ref_bytes)}")
+        else:
+            preview = hex_bytes(ref_bytes[:4])
+            if size > 4:
+                preview += " ..."
+            print(f" = {preview}")
+
+def print_conclusions(mask):
+    """Выводы по характеру различий"""
+    crit_start, manuf_end = AREAS['manufacturing']
+    manuf_start = FIELD_BY_NAME['module_revision'].offset
+
+    serial_diff = field_mask(mask, 'serial_number')
+    secure_diff = field_mask(mask, 'hpe_secure_id')
+    manuf_diff = mask[:, manuf_start:manuf_end].any(axis=1)
+    base_diff = mask[:, :crit_start].any(axis=1)
+    lot = len(mask) > 1
+
+    def count(m):
+        return f" (модулей: {int(m.sum())})" if lot else ""
+
+    print()
+    print("=" * 60)
+    print("💡 ВЫВОДЫ")
+    print("=" * 60)
+    print()
+
+    only_serial = serial_diff & secure_diff & ~base_diff & ~manuf_diff
+    if only_serial.any():
+        print(f"  ✅ Различаются ТОЛЬКО Serial Number и Secure ID{count(only_serial)}")
+        print("     → Это нормально для разных модулей одной серии")
+        print("     → HPE Secure ID пересчитывается для каждого S/N")
+
+    if manuf_diff.any():
+        print(f"\n  ⚠️  Различается Manufacturing Data ({manuf_start}-{manuf_end - 1}){count(manuf_diff)}")
+        print("     → Это могут быть версии, даты, счетчики")
+        print("     → HPE может проверять эти поля!")
+
+    if base_diff.any():
+        print(f"\n  ❌ Различается Base Configuration (0-{crit_start - 1}){count(base_diff)}")
+        print("     → Это КРИТИЧНО - параметры памяти отличаются")
+
+def print_control_values(names, images, limit):
+    """Serial Number и HPE Secure ID модулей"""
+    _, crit_end = AREAS['hpe_secure']
     print(f"\n  🔑 Контрольные значения:")
-    print(f"     Файл 1: S/N=0x{serial1:08X} → Hash=0x{hash1:08X}")
-    print(f"     Файл 2: S/N=0x{serial2:08X} → Hash=0x{hash2:08X}")
+    for i, (name, data) in enumerate(zip(names[:limit], images[:limit]), 1):
+        if len(data) < crit_end:
+            continue
+        serial = read_field(data, 'serial_number')
+        secure_id = read_field(data, 'hpe_secure_id')
+        label = f"Файл {i}" if len(names) == 2 else name
+        print(f"     {label}: S/N=0x{serial:08X} → Hash=0x{secure_id:08X}")
+    if len(names) > limit:
+        print(f"     ... и еще {len(names) - limit}")
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сравнение HPE SPD дампов с эталоном")
+    parser.add_argument('inputs', nargs='*',
+                        help="дампы .bin, директории или .spdpack; первый - эталон, "
+                             "если не задан --ref")
+    parser.add_argument('--ref', help="эталонный дамп для сравнения с партией")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="рекурсивный поиск .bin в директориях")
+    parser.add_argument('--limit', type=int, default=50,
+                        help="максимум строк в списках смещений и модулей")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Главная функция"""
+    args = parse_args(argv)
+
+    sources = collect_inputs(args.inputs or [file1, file2], args.recursive)
+    if args.ref:
+        ref_src = collect_inputs([args.ref])[0]
+        sources = [s for s in sources if source_name(s) != source_name(ref_src)]
+    elif sources:
+        ref_src, sources = sources[0], sources[1:]
+    if not sources:
+        print("❌ Нужно минимум два дампа для сравнения")
+        sys.exit(1)
+
+    names = [source_name(s) for s in sources]
+    pair = len(sources) == 1
+
+    print("🔍 HPE SPD Comparator - Быстрое сравнение")
+    print("=" * 60)
+    if pair:
+        print(f"\nФайл 1: {source_name(ref_src)}")
+        print(f"Файл 2: {names[0]}\n")
+    else:
+        print(f"\nЭталон: {source_name(ref_src)}")
+        print(f"Модулей в партии: {len(sources)}\n")
+
+    try:
+        ref_data = read_source(ref_src)
+        arr, sizes = load_images(sources)
+    except Exception as e:
+        print(f"❌ Ошибка чтения: {e}")
+        sys.exit(1)
+
+    # Выравниваем эталон и партию по общей длине
+    length = max(arr.shape[1], len(ref_data))
+    ref = np.zeros(length, dtype=np.uint8)
+    ref[:len(ref_data)] = np.frombuffer(ref_data, dtype=np.uint8)
+    if arr.shape[1] < length:
+        arr = np.pad(arr, ((0, 0), (0, length - arr.shape[1])))
+
+    if pair:
+        print(f"Размер 1: {len(ref_data)} bytes")
+        print(f"Размер 2: {sizes[0]} bytes\n")
+
+    # Сравниваем только общую часть эталона и каждого образа
+    mask = diff_masks(ref, arr)
+    common = np.minimum(sizes, len(ref_data))
+    mask &= np.arange(length) < common[:, None]
+
+    per_module = mask.sum(axis=1)
+    if pair:
+        min_len = int(common[0])
+        print(f"Различий: {per_module[0]} из {min_len} ({100.0*per_module[0]/min_len:.1f}%)\n")
+    else:
+        identical = int((per_module == 0).sum())
+        print(f"Идентичны эталону: {identical} из {len(sources)}")
+        print(f"Различий на модуль: мин {per_module.min()}, макс {per_module.max()}, "
+              f"среднее {per_module.mean():.1f}\n")
+
+    if not mask.any():
+        print("✅ Файлы идентичны!" if pair else "✅ Все модули идентичны эталону!")
+    elif pair:
+        print_pair_report(ref, arr, mask)
+    else:
+        print_lot_offsets(ref, arr, mask, args.limit)
+
+    print_block_report(mask)
+    print_field_report(ref, arr, mask)
+    print_conclusions(mask)
+
+    images = [read_source(s) for s in sources[:args.limit]]
+    print_control_values([source_name(ref_src)] + names, [ref_data] + images, args.limit)
 
-print("\n✅ Анализ завершён.")
+    print("\n✅ Анализ завершён.")
 
+if __name__ == '__main__':
+    main()
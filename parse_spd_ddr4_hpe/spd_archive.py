@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Чтение SPD дампов прямо из архивов zip / tar / tar.gz / tar.bz2 / tar.xz / tar.zst
+
+Архив читается потоково: tar - в режиме 'r|*' без перемотки (сжатие
+определяется автоматически), zip - по центральному каталогу. Члены,
+подходящие под шаблон (по умолчанию *.bin), читаются без временных файлов:
+
+- iter_images() - один переиспользуемый буфер на stride байт, memoryview
+  действителен до следующего шага (однопроходная обработка, упаковка);
+- SpdArchive - оглавление архива (имена, размеры, поколения) без образов;
+  для остального кода архив выглядит как контейнер .spdpack (names, sizes,
+  record(i), array()), поэтому collect_inputs, пакетный режим, кэш и
+  load_batch работают с ним через PackRecord. record(i) читает члены
+  последовательным потоком с окном недавних образов, память не зависит
+  от размера архива.
+
+tar.zst требует пакет zstandard (tarfile в Python < 3.14 zstd не поддерживает).
+"""
+
+import fnmatch
+import os
+import tarfile
+import threading
+import zipfile
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz',
+                    '.tar.zst', '.tzst')
+MEMBER_PATTERN = '*.bin'
+# Наибольший образ SPD (DDR5); более длинные члены читаются до stride, как в read_spd
+STRIDE = 1024
+# Сколько последних прочитанных образов SpdArchive держит для повторного record(i)
+WINDOW = 4096
+
+def is_archive(path):
+    """Проверка, является ли файл поддерживаемым архивом (по расширению)"""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+def _open_zstd_tar(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(f"{path}: для .tar.zst нужен пакет zstandard (pip install zstandard)")
+    raw = open(path, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return tarfile.open(fileobj=reader, mode='r|')
+
+def iter_members(path, pattern=MEMBER_PATTERN):
+    """Потоковый обход архива: (имя, размер, файловый объект) подходящих членов
+
+    Файловый объект действителен только до следующего шага генератора.
+    """
+    path = str(path)
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not fnmatch.fnmatch(os.path.basename(info.filename), pattern):
+                    continue
+                with zf.open(info) as f:
+                    yield info.filename, info.file_size, f
+        return
+
+    if path.lower().endswith(('.zst', '.tzst')):
+        tf = _open_zstd_tar(path)
+    else:
+        tf = tarfile.open(path, mode='r|*')
+    with tf:
+        for member in tf:
+            if not member.isfile() or not fnmatch.fnmatch(os.path.basename(member.name), pattern):
+                continue
+            f = tf.extractfile(member)
+            yield member.name, member.size, f
+
+def _read_into(f, view):
+    """readinto до заполнения view или конца члена; число прочитанных байт"""
+    pos = 0
+    while pos < len(view):
+        n = f.readinto(view[pos:])
+        if not n:
+            break
+        pos += n
+    return pos
+
+def iter_images(path, pattern=MEMBER_PATTERN, stride=STRIDE):
+    """Однопроходное чтение образов: (имя, memoryview) в переиспользуемом буфере
+
+    memoryview указывает на общий буфер и перезаписывается следующим членом;
+    чтобы сохранить образ, его нужно скопировать (bytes(view)).
+    """
+    buf = bytearray(stride)
+    view = memoryview(buf)
+    for name, size, f in iter_members(path, pattern):
+        n = _read_into(f, view[:min(size, stride)])
+        yield name, view[:n]
+
+class SpdArchive:
+    """Архив с интерфейсом SpdPack без загрузки образов в память
+
+    При открытии - один проход за оглавлением (имя, размер, байт 2 члена).
+    record(i) читает члены тем же последовательным потоком: обращения по
+    возрастанию i (пакетный режим, load_batch, кэш) - один проход
+    распаковки; последние window образов хранятся, обращение к более
+    раннему члену начинает поток заново.
+    """
+
+    def __init__(self, path, pattern=MEMBER_PATTERN, stride=STRIDE, window=WINDOW):
+        self.path = str(path)
+        self.pattern = pattern
+        self.stride = stride
+        self.window = window
+        self.names = []
+        self.sizes = []
+        self.generations = []
+        for name, size, f in iter_members(self.path, pattern):
+            head = f.read(3)
+            self.names.append(name)
+            self.sizes.append(min(size, stride))
+            self.generations.append(head[2] if len(head) > 2 else 0)
+        self._lock = threading.Lock()
+        self._stream = None
+        self._next = 0
+        self._recent = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return zip(self.names, self._read_members())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_members(self):
+        for name, size, f in iter_members(self.path, self.pattern):
+            yield f.read(min(size, self.stride))
+
+    def record(self, i):
+        """Член i как bytes (последовательный поток по архиву)"""
+        if not 0 <= i < len(self):
+            raise IndexError(f"{self.path}: нет члена {i}")
+        with self._lock:
+            data = self._recent.get(i)
+            if data is not None:
+                return data
+            if self._stream is None or i < self._next:
+                self.close()
+                self._stream = self._read_members()
+            while self._next <= i:
+                data = next(self._stream, None)
+                if data is None:
+                    raise ValueError(f"{self.path}: архив изменился после открытия")
+                self._recent[self._next] = data
+                self._recent.pop(self._next - self.window, None)
+                self._next += 1
+            return data
+
+    def array(self):
+        """Все члены как массив numpy (N, stride), один проход по архиву"""
+        import numpy as np
+        arr = np.zeros((len(self), self.stride), dtype=np.uint8)
+        for i, (_, data) in enumerate(self):
+            arr[i, :len(data)] = np.frombuffer(data, dtype=np.uint8)
+        return arr
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._next = 0
+        self._recent.clear()
+
+def main():
+    """Главная функция: список SPD образов в архиве"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="SPD дампы в архивах zip/tar")
+    parser.add_argument('archives', nargs='+')
+    parser.add_argument('--pattern', default=MEMBER_PATTERN, help="шаблон имён членов")
+    args = parser.parse_args()
+
+    for path in args.archives:
+        t0 = time.perf_counter()
+        with SpdArchive(path, args.pattern) as archive:
+            elapsed = time.perf_counter() - t0
+            print(f"📦 {path}: {len(archive)} образов ({1000 * elapsed:.1f} мс)")
+            for i, name in enumerate(archive.names):
+                print(f"  {i:6d}  0x{archive.generations[i]:02X}  {archive.sizes[i]:5d}  {name}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Пакетная обработка SPD дампов пулом процессов/потоков"""
+
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+DEFAULT_CHUNK_SIZE = 64
+
+class PackRecord(NamedTuple):
+    """Ссылка на запись в контейнере .spdpack или архиве (сериализуема для пула процессов)"""
+    pack_path: str
+    index: int
+    name: str
+
+class LoadedRecord(NamedTuple):
+    """Образ члена архива, прочитанный родителем и переданный в пул
+
+    error - ошибка чтения в родителе (передаётся рабочему как результат записи).
+    """
+    name: str
+    data: bytes
+    error: str = None
+
+# Открытые контейнеры текущего процесса: путь -> SpdPack / SpdArchive
+_open_packs = {}
+
+def open_pack(path):
+    """Открытие контейнера или архива с кэшированием на время жизни процесса
+
+    Для архива (zip/tar) при открытии читается только оглавление, образы -
+    последовательным потоком по record(i). Рабочие пула архивы не открывают:
+    run_batch передаёт им прочитанные родителем байты (LoadedRecord).
+    """
+    pack = _open_packs.get(path)
+    if pack is None:
+        from spd_archive import SpdArchive, is_archive
+        from spd_pack import SpdPack
+        pack = _open_packs[path] = SpdArchive(path) if is_archive(path) else SpdPack(path)
+    return pack
+
+def read_source(src):
+    """Чтение образа: путь к .bin, PackRecord (для .spdpack - memoryview без
+    копирования) или LoadedRecord"""
+    if isinstance(src, LoadedRecord):
+        if src.error is not None:
+            raise ValueError(src.error)
+        return src.data
+    if isinstance(src, PackRecord):
+        return open_pack(src.pack_path).record(src.index)
+    from analyze_hpe_spd import read_spd
+    return read_spd(src)
+
+def source_name(src):
+    """Отображаемое имя источника"""
+    return src.name if isinstance(src, (PackRecord, LoadedRecord)) else str(src)
+
+def load_archive_members(sources):
+    """Члены архивов в sources -> LoadedRecord с байтами, прочитанными здесь
+
+    Остальные источники (файлы, записи .spdpack) не меняются. Архив читается
+    одним последовательным потоком в текущем процессе, поэтому рабочим пула
+    не нужно распаковывать его заново.
+    """
+    from spd_archive import is_archive
+
+    out = []
+    for src in sources:
+        if isinstance(src, PackRecord) and is_archive(src.pack_path):
+            try:
+                src = LoadedRecord(src.name, bytes(read_source(src)))
+            except Exception as e:
+                src = LoadedRecord(src.name, b'', str(e))
+        out.append(src)
+    return out
+
+def collect_inputs(paths, recursive=False, file_lists=(), pattern='*.bin'):
+    """Сбор списка дампов из директорий, файлов и списков файлов
+
+    Порядок стабилен: аргументы обрабатываются по очереди, содержимое
+    каждой директории сортируется. Повторы отбрасываются. Контейнеры
+    .spdpack и архивы zip/tar (заданные явно) разворачиваются в PackRecord
+    для каждой записи; имя записи - путь члена внутри архива.
+
+    Контейнеры и архивы распознаются по расширению; сигнатура .spdpack
+    читается только у файлов, не подходящих под pattern, поэтому дамп
+    .bin при сборе не открывается и не stat-ится.
+    """
+    from fnmatch import fnmatch
+    from spd_archive import is_archive
+    from spd_pack import PACK_SUFFIX, is_pack
+
+    found = []
+    seen = set()
+
+    def add(path):
+        key = os.path.abspath(path)
+        if key in seen:
+            return
+        seen.add(key)
+        path = str(path)
+        if path.lower().endswith(PACK_SUFFIX) or is_archive(path):
+            container = os.path.isfile(path)
+        else:
+            # Контейнер без расширения - по сигнатуре, но не для дампов по шаблону
+            container = not fnmatch(os.path.basename(path), pattern) and \
+                os.path.isfile(path) and is_pack(path)
+        if container:
+            for i, name in enumerate(open_pack(path).names):
+                found.append(PackRecord(path, i, name))
+        else:
+            found.append(path)
+
+    for list_file in file_lists:
+        stream = sys.stdin if list_file == '-' else open(list_file, encoding='utf-8')
+        try:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    add(line)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            for f in sorted(scan_dir(p, pattern, recursive), key=lambda f: f.parts):
+                add(f)
+        else:
+            add(p)
+
+    return found
+
+def scan_dir(root, pattern='*.bin', recursive=False):
+    """Файлы директории по шаблону (Path) без stat каждого файла (тип из scandir)"""
+    from fnmatch import fnmatch
+
+    out = []
+    dirs = [root]
+    while dirs:
+        directory = dirs.pop()
+        with os.scandir(directory) as it:
+            for e in it:
+                # Символьные ссылки на директории не обходятся (как Path.rglob)
+                if recursive and e.is_dir(follow_symlinks=False):
+                    dirs.append(directory / e.name)
+                elif fnmatch(e.name, pattern) and e.is_file():
+                    out.append(directory / e.name)
+    return out
+
+def chunked(items, size):
+    """Разбиение последовательности на порции по size элементов"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _analyze_chunk(paths, keep_data):
+    """Рабочая функция: чтение и декодирование порции файлов
+
+    Возвращает список (name, results, data, error) в порядке входа.
+    Исключения не пробрасываются, чтобы одна битая запись не роняла порцию.
+    """
+    from analyze_hpe_spd import analyze_spd
+
+    out = []
+    for src in paths:
+        name = source_name(src)
+        try:
+            data = read_source(src)
+            results = analyze_spd(data, name)
+            out.append((name, results, bytes(data) if keep_data else None, None))
+        except Exception as e:
+            out.append((name, None, None, str(e)))
+    return out
+
+def run_batch(paths, workers=1, executor='process', chunk_size=DEFAULT_CHUNK_SIZE,
+              keep_data=False):
+    """Потоковая обработка списка файлов с сохранением порядка
+
+    Генератор выдаёт (name, results, data, error) строго в порядке paths.
+    В полёте держится не более 2*workers порций, поэтому память не зависит
+    от размера партии. workers=1 - обработка в текущем процессе без пула.
+    Члены архивов читаются потоком в текущем процессе, в пул уходят байты
+    порции (load_archive_members).
+    """
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+
+    chunks = chunked(paths, max(1, chunk_size))
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _analyze_chunk(chunk, keep_data)
+        return
+
+    pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_analyze_chunk, load_archive_members(chunk), keep_data))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Бенчмарк анализаторов SPD и генератор синтетических партий
+
+Генератор берёт реальные DDR4 и DDR5 дампы из репозитория и мутирует их:
+серийный номер, дату производства (BCD), суффикс part number, тайминги и
+HPE Secure ID (DDR4), после чего пересчитывает CRC. Партия - смесь
+поколений в заданной доле - пишется в .spdpack.
+
+Каждая стадия (read_spd, analyze_spd, compare_modules, secure-область,
+diff) замеряется отдельно; результат - JSON с файлами/с и пиковым RSS.
+"""
+
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from spd_profile import peak_rss_kb
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_SEED_DIRS = (SCRIPT_DIR, SCRIPT_DIR.parent / 'parse_spd_ddr4',
+                     SCRIPT_DIR.parent / 'parse_spd_ddr5')
+DDR4_TYPE = 0x0C
+DDR5_TYPE = 0x12
+# Размер образа по типу DRAM
+IMAGE_SIZES = {DDR4_TYPE: 512, DDR5_TYPE: 1024}
+GENERATE_CHUNK = 65536
+DDR5_SHARE = 0.25
+
+def load_seeds(dirs=DEFAULT_SEED_DIRS):
+    """Реальные образы для мутации: {тип DRAM: массив (K, размер образа)}
+
+    DDR4 обязательны, DDR5 - если найдены.
+    """
+    from spd_batch import collect_inputs
+    from spd_numpy import load_batch
+
+    arr = load_batch(collect_inputs([str(d) for d in dirs if Path(d).is_dir()]),
+                     size=IMAGE_SIZES[DDR5_TYPE])
+    seeds = {}
+    for dram_type, size in IMAGE_SIZES.items():
+        rows = arr[arr[:, 2] == dram_type, :size]
+        if len(rows):
+            seeds[dram_type] = rows
+    if DDR4_TYPE not in seeds:
+        raise ValueError("не найдено исходных DDR4 дампов")
+    return seeds
+
+def to_bcd(values):
+    """Десятичные значения 0-99 в BCD (23 -> 0x23), как хранятся год и неделя"""
+    return (values // 10) << 4 | values % 10
+
+def mutate(seeds, count, rng):
+    """Порция из count синтетических образов на основе seeds одного типа DRAM"""
+    from spd_crc import fix_batch
+    from spd_ddr5 import FIELD_BY_NAME as DDR5_FIELDS
+    from spd_layout import FIELD_BY_NAME as DDR4_FIELDS
+
+    ddr5 = seeds[0, 2] == DDR5_TYPE
+    fields = DDR5_FIELDS if ddr5 else DDR4_FIELDS
+    arr = seeds[rng.integers(0, len(seeds), count)].copy()
+
+    serial = fields['serial_number'].offset
+    arr[:, serial:serial + 4] = rng.integers(0, 256, (count, 4), dtype=np.uint8)
+
+    arr[:, fields['mfg_year'].offset] = to_bcd(rng.integers(15, 26, count))
+    arr[:, fields['mfg_week'].offset] = to_bcd(rng.integers(1, 53, count))
+
+    # ~5% модулей: другой символ в конце part number
+    pn = fields['part_number']
+    alphabet = np.frombuffer(b'ABCDEFGHJKLMNPRSTUVWXYZ0123456789', dtype=np.uint8)
+    rows = np.flatnonzero(rng.random(count) < 0.05)
+    last = pn.offset + 15
+    arr[rows, last] = alphabet[rng.integers(0, len(alphabet), len(rows))]
+
+    # ~10% модулей: tAA/tRCD/tRP сдвинуты на ±1 нс (DDR4 - 8 MTB в байте,
+    # DDR5 - 1000 пс в двух байтах little-endian)
+    rows = np.flatnonzero(rng.random(count) < 0.10)
+    delta = rng.choice(np.array([-8, 8]), len(rows))
+    for name in ('taa_min', 'trcd_min', 'trp_min'):
+        off = fields[name].offset
+        if ddr5:
+            ps = arr[rows, off].astype(int) | (arr[rows, off + 1].astype(int) << 8)
+            ps = np.clip(ps + delta * 125, 1, 0xFFFF)
+            arr[rows, off] = ps & 0xFF
+            arr[rows, off + 1] = ps >> 8
+        else:
+            arr[rows, off] = np.clip(arr[rows, off].astype(int) + delta, 1, 255)
+
+    # HPE Secure ID - только у DDR4 образов с заголовком "HPT\0"
+    if not ddr5:
+        header = fields['hpe_header'].offset
+        secure = fields['hpe_secure_id'].offset
+        rows = np.flatnonzero((arr[:, header:header + 4] == np.frombuffer(b'HPT\x00', np.uint8)).all(axis=1))
+        arr[rows, secure:secure + 4] = rng.integers(0, 256, (len(rows), 4), dtype=np.uint8)
+
+    return fix_batch(arr)
+
+def generate_fleet(out_path, count, seeds=None, seed=0, bin_dir=None, ddr5_share=DDR5_SHARE):
+    """Генерация партии из count модулей в .spdpack (и, опционально, в .bin файлы)
+
+    Доля ddr5_share модулей - DDR5 (если есть исходные DDR5 образы),
+    поколения перемешаны по партии.
+    """
+    from spd_pack import pack_images
+
+    if seeds is None:
+        seeds = load_seeds()
+    if DDR5_TYPE not in seeds:
+        ddr5_share = 0
+    rng = np.random.default_rng(seed)
+    if bin_dir is not None:
+        os.makedirs(bin_dir, exist_ok=True)
+
+    def rows(n):
+        is_ddr5 = rng.random(n) < ddr5_share
+        ddr4 = iter(mutate(seeds[DDR4_TYPE], n - int(is_ddr5.sum()), rng))
+        ddr5 = iter(mutate(seeds[DDR5_TYPE], int(is_ddr5.sum()), rng)) if ddr5_share else None
+        for flag in is_ddr5:
+            yield next(ddr5) if flag else next(ddr4)
+
+    def images():
+        done = 0
+        while done < count:
+            n = min(GENERATE_CHUNK, count - done)
+            for i, row in enumerate(rows(n)):
+                data = row.tobytes()
+                name = f"synthetic_{done + i:07d}.bin"
+                if bin_dir is not None:
+                    with open(os.path.join(bin_dir, name), 'wb') as f:
+                        f.write(data)
+                yield name, data
+            done += n
+
+    stride = IMAGE_SIZES[DDR5_TYPE] if ddr5_share else IMAGE_SIZES[DDR4_TYPE]
+    return pack_images(images(), out_path, stride)
+
+@contextlib.contextmanager
+def stage(report, name, items):
+    """Замер стадии: время, файлов/с и пиковый RSS"""
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    yield
+    wall = time.perf_counter() - t0
+    report[name] = {
+        'items': items,
+        'wall_s': round(wall, 4),
+        'cpu_s': round(time.process_time() - c0, 4),
+        'files_per_s': round(items / wall, 1) if wall > 0 else None,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+def run_benchmark(pack_path, bin_dir=None):
+    """Замер всех стадий по партии; возвращает словарь отчёта"""
+    from analyze_hpe_secure import compare_secure_codes, secure_summary
+    from analyze_hpe_spd import analyze_spd, compare_modules, read_spd
+    from compare_hpe import BLOCK_STARTS, REGION_STARTS, diff_masks, region_counts
+    from spd_batch import collect_inputs, read_source, source_name
+    from spd_pack import SpdPack
+
+    sources = collect_inputs([pack_path])
+    n = len(sources)
+    report = {}
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+
+    if bin_dir is not None:
+        files = sorted(str(p) for p in Path(bin_dir).glob('*.bin'))
+        with stage(report, 'read_spd', len(files)):
+            for f in files:
+                read_spd(f)
+
+    with stage(report, 'read_pack', n):
+        images = [read_source(src) for src in sources]
+
+    with stage(report, 'analyze_spd', n):
+        results_list = [analyze_spd(data, source_name(src)) for src, data in zip(sources, images)]
+
+    with stage(report, 'compare_modules', n), contextlib.redirect_stdout(devnull):
+        compare_modules(results_list)
+    del results_list
+
+    with stage(report, 'secure_summary', n):
+        for data in images:
+            secure_summary(data)
+
+    with stage(report, 'compare_secure_codes', n), contextlib.redirect_stdout(devnull):
+        compare_secure_codes(sources)
+
+    devnull.close()
+    del images
+
+    # Путь compare_hpe: XOR с эталоном и счётчики по регионам, порциями
+    with SpdPack(pack_path) as pack:
+        arr = pack.array()
+        with stage(report, 'diff', n):
+            ref = arr[0]
+            for start in range(0, n, GENERATE_CHUNK):
+                mask = diff_masks(ref, arr[start:start + GENERATE_CHUNK])
+                region_counts(mask, REGION_STARTS)
+                region_counts(mask, BLOCK_STARTS)
+        # Представления mmap нужно освободить до закрытия контейнера
+        del arr, ref
+    return report
+
+def main():
+    """Главная функция"""
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Бенчмарк анализаторов SPD")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000],
+                        help="размеры синтетических партий (например 10000 100000 1000000)")
+    parser.add_argument('--seed', type=int, default=0, help="seed генератора")
+    parser.add_argument('--seed-dir', action='append', metavar='DIR',
+                        help="директории с исходными дампами (по умолчанию из репозитория)")
+    parser.add_argument('--ddr5-share', type=float, default=DDR5_SHARE,
+                        help=f"доля DDR5 модулей в партии (по умолчанию {DDR5_SHARE})")
+    parser.add_argument('--work-dir', help="директория для сгенерированных партий")
+    parser.add_argument('--bin-files', action='store_true',
+                        help="также писать отдельные .bin файлы и замерять read_spd")
+    parser.add_argument('--generate-only', action='store_true',
+                        help="только сгенерировать партии без замеров")
+    parser.add_argument('-o', '--output', help="файл JSON отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    seeds = load_seeds(args.seed_dir or DEFAULT_SEED_DIRS)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='spd_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed_images': {f"0x{t:02X}": len(arr) for t, arr in seeds.items()},
+        'ddr5_share': args.ddr5_share if DDR5_TYPE in seeds else 0,
+        'runs': [],
+    }
+
+    for size in args.sizes:
+        pack_path = os.path.join(work_dir, f"fleet_{size}.spdpack")
+        bin_dir = os.path.join(work_dir, f"fleet_{size}") if args.bin_files else None
+        t0 = time.perf_counter()
+        generate_fleet(pack_path, size, seeds, args.seed, bin_dir, args.ddr5_share)
+        print(f"📦 Сгенерировано {size} модулей за {time.perf_counter() - t0:.1f} с → {pack_path}",
+              file=sys.stderr)
+        if args.generate_only:
+            continue
+        stages = run_benchmark(pack_path, bin_dir)
+        report['runs'].append({'size': size, 'stages': stages})
+        for name, st in stages.items():
+            print(f"  {name:<22} {st['wall_s']:9.3f} с  {st['files_per_s'] or 0:12.0f} файлов/с",
+                  file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
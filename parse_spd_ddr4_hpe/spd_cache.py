@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Постоянный кэш результатов анализа SPD (SQLite)
+
+Запись ищется по (путь, вид анализа). Если размер и mtime файла совпадают -
+результат берётся из кэша без чтения файла (стоимость одного stat). Если
+метаданные изменились, файл читается и сверяется по хэшу содержимого.
+Записи с другой версией декодера считаются устаревшими.
+
+Результат DDR4 (spd_record.SpdRecord) хранится сырыми полями и из кэша
+возвращается тем же типом, что и из analyze_spd; остальные результаты
+(DDR5, secure_summary) - словари.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from spd_batch import PackRecord
+
+DEFAULT_CACHE = 'spd_cache.sqlite'
+
+# Увеличивать при изменении логики analyze_spd / analyze_ddr5 / secure_summary
+DECODER_VERSION = 9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path     TEXT NOT NULL,
+    kind     TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest   TEXT NOT NULL,
+    version  TEXT NOT NULL,
+    payload  TEXT NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (path, kind)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+def decoder_version():
+    """Версия декодера: номер + отпечаток карт полей spd_layout, spd_ddr5 и записи spd_record"""
+    from spd_ddr5 import FIELDS as DDR5_FIELDS
+    from spd_layout import FIELDS
+    from spd_record import RAW_FIELDS
+    fingerprint = hashlib.blake2b(repr((FIELDS, DDR5_FIELDS, RAW_FIELDS)).encode(),
+                                  digest_size=8).hexdigest()
+    return f"{DECODER_VERSION}:{fingerprint}"
+
+def content_digest(data):
+    """Хэш содержимого образа"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def encode_payload(results):
+    """Результат анализа -> JSON-совместимое значение для кэша"""
+    from spd_record import SpdRecord
+    if isinstance(results, SpdRecord):
+        return results.to_payload()
+    return dict(results)
+
+def decode_payload(payload):
+    """Значение из кэша -> результат того же типа, что при анализе"""
+    from spd_record import PAYLOAD_KEY, SpdRecord
+    if PAYLOAD_KEY in payload:
+        return SpdRecord.from_payload(payload)
+    return payload
+
+def source_key(src):
+    """Ключ кэша и файл, чьи stat-метаданные его защищают"""
+    if isinstance(src, PackRecord):
+        return f"{os.path.abspath(src.pack_path)}#{src.index}", src.pack_path
+    return os.path.abspath(src), src
+
+class AnalysisCache:
+    """Кэш результатов: get()/put() по источнику, evict() по возрасту и размеру"""
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        self.version = decoder_version()
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+        # Очередь на запись: коммитим порциями, а не на каждый файл
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _stat(self, src):
+        key, stat_path = source_key(src)
+        st = os.stat(stat_path)
+        return key, st.st_size, st.st_mtime_ns
+
+    def get(self, src, kind, read=None):
+        """Результат из кэша или None
+
+        read - функция чтения образа для сверки хэша, если метаданные
+        изменились (None - без сверки, только по stat).
+        """
+        try:
+            key, size, mtime_ns = self._stat(src)
+        except OSError:
+            return None
+        row = self._db.execute(
+            "SELECT size, mtime_ns, digest, version, payload FROM entries "
+            "WHERE path = ? AND kind = ?", (key, kind)).fetchone()
+        if row is None or row[3] != self.version:
+            self.misses += 1
+            return None
+
+        if (row[0], row[1]) != (size, mtime_ns):
+            if read is None or content_digest(read(src)) != row[2]:
+                self.misses += 1
+                return None
+            # Содержимое то же (например, файл скопирован заново) - обновляем метаданные
+            self._db.execute("UPDATE entries SET size = ?, mtime_ns = ? WHERE path = ? AND kind = ?",
+                             (size, mtime_ns, key, kind))
+
+        self._db.execute("UPDATE entries SET accessed = ? WHERE path = ? AND kind = ?",
+                         (time.time(), key, kind))
+        self._touch()
+        self.hits += 1
+        return decode_payload(json.loads(row[4]))
+
+    def put(self, src, kind, data, payload):
+        """Сохранение результата анализа образа data"""
+        try:
+            key, size, mtime_ns = self._stat(src)
+        except OSError:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, size, mtime_ns, content_digest(data), self.version,
+             json.dumps(encode_payload(payload), ensure_ascii=False), time.time()))
+        self._touch()
+
+    def _touch(self):
+        self._pending += 1
+        if self._pending >= 1000:
+            self.flush()
+
+    def flush(self):
+        self._db.commit()
+        self._pending = 0
+
+    def evict(self, max_age_days=None, max_entries=None):
+        """Удаление записей старше max_age_days, устаревших версий и сверх max_entries
+
+        Возвращает число удалённых записей.
+        """
+        removed = self._db.execute("DELETE FROM entries WHERE version != ?",
+                                   (self.version,)).rowcount
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            removed += self._db.execute("DELETE FROM entries WHERE accessed < ?",
+                                        (cutoff,)).rowcount
+        if max_entries is not None:
+            removed += self._db.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (max_entries,)).rowcount
+        self.flush()
+        return removed
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+_CONTENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    key      TEXT PRIMARY KEY,
+    payload  BLOB NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS content_accessed ON content (accessed);
+"""
+
+class ContentCache:
+    """Кэш по ключу из хэшей содержимого (без путей и stat): значения - bytes
+
+    Для сводок по группам образов: ключ строится вызывающим из content_digest
+    образов и параметров расчёта, поэтому переименование или перенос файлов
+    не сбрасывает кэш. Хранится в том же файле, что AnalysisCache.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_CONTENT_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key):
+        row = self._db.execute("SELECT payload FROM content WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._db.execute("UPDATE content SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return bytes(row[0])
+
+    def put(self, key, payload):
+        self._db.execute("INSERT OR REPLACE INTO content VALUES (?, ?, ?)",
+                         (key, sqlite3.Binary(payload), time.time()))
+
+    def evict(self, max_age_days=None, max_entries=None):
+        """Удаление записей старше max_age_days и сверх max_entries"""
+        removed = 0
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            removed += self._db.execute("DELETE FROM content WHERE accessed < ?",
+                                        (cutoff,)).rowcount
+        if max_entries is not None:
+            removed += self._db.execute(
+                "DELETE FROM content WHERE rowid IN (SELECT rowid FROM content "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (max_entries,)).rowcount
+        self._db.commit()
+        return removed
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+def add_cache_args(parser):
+    """Общие аргументы командной строки для кэша"""
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE, metavar='FILE',
+                        help=f"кэш результатов SQLite (по умолчанию {DEFAULT_CACHE})")
+    parser.add_argument('--cache-max-age', type=float, metavar='DAYS',
+                        help="удалить из кэша записи, не использовавшиеся DAYS дней")
+    parser.add_argument('--cache-max-entries', type=int, metavar='N',
+                        help="оставить в кэше не более N последних записей")
+
+def run_cached(sources, cache, kind, run, read, window=16384):
+    """Потоковое объединение попаданий кэша и вычисленных результатов
+
+    Источники обрабатываются окнами по window: поиск в кэше идёт по окну,
+    промахи окна передаются run, результаты выдаются по мере готовности,
+    поэтому в памяти не больше одного окна попаданий.
+
+    run(misses) - генератор (name, results, data, error) в порядке misses;
+    read(src) - чтение образа для сверки хэша. Выдаёт (name, results, data, error)
+    в порядке sources; data для попаданий - None. Попадания того же типа,
+    что и вычисленные результаты (см. decode_payload).
+    """
+    from spd_batch import chunked, source_name
+
+    for part in chunked(sources, window):
+        cached = [cache.get(src, kind, read) for src in part]
+        misses = [src for src, hit in zip(part, cached) if hit is None]
+        computed = run(misses) if misses else iter(())
+        for src, hit in zip(part, cached):
+            if hit is not None:
+                yield source_name(src), hit, None, None
+                continue
+            name, results, data, error = next(computed)
+            if error is None:
+                cache.put(src, kind, data, results)
+            yield name, results, data, error
+        cache.flush()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Эталон партии по большинству и поиск модулей, отличающихся от него
+
+Первый проход копит гистограммы байт по смещениям (spd_stats.ByteStats) и
+строит консенсусный образ: самое частое значение каждого байта и доля
+модулей, которые с ним согласны. Второй проход сравнивает каждый модуль с
+консенсусом вне полей, уникальных для модуля (S/N, дата, CRC, HPE Secure ID),
+и группирует отличия по регионам spd_layout. Оба прохода идут порциями:
+время O(N), память не зависит от размера партии.
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from compare_hpe import REGION_NAMES, REGION_STARTS, region_counts
+from spd_layout import FIELD_BY_NAME, SPD_SIZE
+
+# Поля, которые по определению различаются у модулей одной партии
+PER_UNIT_FIELDS = ('serial_number', 'mfg_year', 'mfg_week', 'crc_page0', 'crc_page1',
+                   'crc_mfg', 'hpe_secure_id')
+
+def unit_mask(fields=PER_UNIT_FIELDS, size=SPD_SIZE):
+    """Маска (size,) смещений полей, исключаемых из сравнения"""
+    mask = np.zeros(size, dtype=bool)
+    for name in fields:
+        f = FIELD_BY_NAME[name]
+        mask[f.offset:f.offset + f.width] = True
+    return mask
+
+class Consensus:
+    """Консенсусный образ партии
+
+    image - значение большинства по каждому смещению, agreement - доля
+    модулей с этим значением, mask - смещения полей fields, исключённых
+    из сравнения.
+    """
+
+    def __init__(self, image, agreement, count, fields=PER_UNIT_FIELDS):
+        self.image = image
+        self.agreement = agreement
+        self.count = count
+        self.fields = tuple(fields)
+        self.mask = unit_mask(fields, len(image))
+
+    @classmethod
+    def from_stats(cls, stats, fields=PER_UNIT_FIELDS):
+        if stats.start != 0:
+            raise ValueError("консенсус строится по статистике с начала образа")
+        values, share = stats.modes()
+        return cls(values.astype(np.uint8), share, stats.count, fields)
+
+    def diff(self, arr):
+        """Маска отличий (N, L) порции образов от консенсуса вне mask"""
+        return (np.asarray(arr)[:, :len(self.image)] != self.image) & ~self.mask
+
+    def weak_offsets(self, threshold=1.0):
+        """Сравниваемые смещения с согласием ниже threshold, по возрастанию согласия"""
+        idx = np.flatnonzero((self.agreement < threshold) & ~self.mask)
+        return idx[np.argsort(self.agreement[idx], kind='stable')]
+
+    def to_dict(self, limit=None):
+        weak = self.weak_offsets()
+        return {
+            'modules': self.count,
+            'image': bytes(self.image).hex(),
+            'masked_fields': list(self.fields),
+            'weak_offsets': [{'offset': int(i), 'value': int(self.image[i]),
+                              'agreement': round(float(self.agreement[i]), 4)}
+                             for i in weak[:limit]],
+        }
+
+def build_consensus(sources, fields=PER_UNIT_FIELDS, chunk_size=65536):
+    """Первый проход: консенсус по источникам (.bin или PackRecord)"""
+    from spd_stats import collect
+
+    return Consensus.from_stats(collect(sources, 0, SPD_SIZE, chunk_size), fields)
+
+def find_outliers(sources, consensus, chunk_size=65536):
+    """Второй проход: модули с отличиями от консенсуса
+
+    Генератор словарей: имя, число отличающихся байт, отличия по регионам
+    и список смещений. Модули, совпадающие с консенсусом, не выдаются.
+    """
+    from spd_batch import chunked, source_name
+    from spd_numpy import load_batch
+
+    for chunk in chunked(sources, chunk_size):
+        arr = load_batch(chunk, SPD_SIZE)
+        mask = consensus.diff(arr)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if not len(rows):
+            continue
+        counts = region_counts(mask[rows], REGION_STARTS)
+        for row, per_region in zip(rows, counts):
+            offsets = np.flatnonzero(mask[row])
+            yield {
+                'name': source_name(chunk[row]),
+                'differing': len(offsets),
+                'regions': {REGION_NAMES[i]: int(c) for i, c in enumerate(per_region) if c},
+                'offsets': offsets.tolist(),
+            }
+
+def print_consensus(consensus, limit=16):
+    """Текстовый отчёт по консенсусу"""
+    print(f"{'='*80}")
+    print(f"🧭 КОНСЕНСУС ПАРТИИ ({consensus.count} модулей)")
+    print(f"{'='*80}\n")
+    compared = int((~consensus.mask).sum())
+    unanimous = int(((consensus.agreement >= 1.0) & ~consensus.mask).sum())
+    print(f"Сравниваемых смещений: {compared} (исключены поля: {', '.join(consensus.fields) or '-'})")
+    print(f"Единогласных:          {unanimous}/{compared}")
+    weak = consensus.weak_offsets()
+    if len(weak):
+        from spd_layout import region_name
+        print(f"\n  Смещения с наименьшим согласием:")
+        print(f"  {'Offset':<14} {'Регион':<18} {'Значение':>9} {'Согласие':>9}")
+        for i in weak[:limit]:
+            print(f"  {i:3d} (0x{i:03X})    {region_name(i):<18}      0x{consensus.image[i]:02X} "
+                  f"{100 * consensus.agreement[i]:8.1f}%")
+        if len(weak) > limit:
+            print(f"  ... и еще {len(weak) - limit}")
+
+def print_outliers(outliers, total, limit=20):
+    """Текстовый отчёт по модулям, отличающимся от консенсуса"""
+    by_region = {}
+    for o in outliers:
+        for region in o['regions']:
+            by_region.setdefault(region, []).append(o)
+
+    print(f"\n{'='*80}")
+    print(f"🚩 ОТЛИЧИЯ ОТ КОНСЕНСУСА: {len(outliers)} из {total} модулей")
+    print(f"{'='*80}")
+    if not outliers:
+        print("\n✅ Все модули совпадают с консенсусом вне полей модуля")
+        return
+    for region, items in sorted(by_region.items(), key=lambda kv: -len(kv[1])):
+        print(f"\n  {region}: {len(items)} модулей")
+        for o in items[:limit]:
+            print(f"    - {o['name']}: {o['regions'][region]} байт "
+                  f"(всего {o['differing']}, смещения {_offsets_text(o['offsets'])})")
+        if len(items) > limit:
+            print(f"    ... и еще {len(items) - limit}")
+
+def _offsets_text(offsets, limit=8):
+    text = ', '.join(map(str, offsets[:limit]))
+    return text + ', ...' if len(offsets) > limit else text
+
+def main():
+    """Главная функция"""
+    import argparse
+    from spd_batch import collect_inputs
+
+    parser = argparse.ArgumentParser(description="Консенсус партии и модули, отличающиеся от него")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('--mask', nargs='*', default=list(PER_UNIT_FIELDS), metavar='FIELD',
+                        help="поля spd_layout, исключаемые из сравнения "
+                             f"(по умолчанию {' '.join(PER_UNIT_FIELDS)})")
+    parser.add_argument('--chunk-size', type=int, default=65536, help="образов в одной порции")
+    parser.add_argument('--save-image', metavar='BIN', help="сохранить консенсусный образ")
+    parser.add_argument('--limit', type=int, default=20, help="строк в списках отчёта")
+    parser.add_argument('--json', action='store_true', help="вывод JSON")
+    args = parser.parse_args()
+
+    unknown = [f for f in args.mask if f not in FIELD_BY_NAME]
+    if unknown:
+        parser.error(f"неизвестные поля: {', '.join(unknown)}")
+
+    sources = collect_inputs(args.paths, args.recursive)
+    if not sources:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+
+    consensus = build_consensus(sources, args.mask, args.chunk_size)
+    if args.save_image:
+        with open(args.save_image, 'wb') as f:
+            f.write(bytes(consensus.image))
+    outliers = list(find_outliers(sources, consensus, args.chunk_size))
+
+    if args.json:
+        print(json.dumps({'consensus': consensus.to_dict(), 'outliers': outliers},
+                         indent=2, ensure_ascii=False))
+        return
+    print_consensus(consensus, args.limit)
+    print_outliers(outliers, len(sources), args.limit)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Проверка и исправление JEDEC CRC-16 блоков SPD (по одному образу и партиями)
+
+CRC-16/XMODEM: полином 0x1021, начальное значение 0, хранится little-endian.
+DDR4: байты 0-125 → 126-127, байты 128-253 → 254-255.
+DDR5: байты 0-509 → 510-511; при заголовке Intel XMP 3.0 - заголовок
+640-703 и блоки профилей по 64 байта (CRC в последних 2 байтах), при блоке
+AMD EXPO - 832-957 → 958-959 (как проверяет spd_ddr5).
+Производственная область (DDR4 320-383, DDR5 512-639) по JEDEC CRC не защищена.
+"""
+
+import os
+import sys
+import time
+
+CRC_POLY = 0x1021
+
+def _make_table(poly=CRC_POLY):
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+CRC_TABLE = _make_table()
+
+# Блоки с CRC по типу DRAM (байт 2): имя, начало данных, длина, смещение CRC
+CRC_BLOCKS = {
+    0x0C: (("Block 0 (0-125)", 0, 126, 126),
+           ("Block 1 (128-253)", 128, 126, 254)),
+    0x12: (("Base (0-509)", 0, 510, 510),),
+}
+
+DDR5_TYPE = 0x12
+
+# Блоки профилей разгона DDR5 - только при сигнатуре (смещение, байты);
+# смещения те же, что в spd_ddr5 (XMP_HEADER, XMP_PROFILES, EXPO_BLOCK)
+XMP_SIGNATURE = (640, b'\x0C\x4A')
+EXPO_SIGNATURE = (832, b'EXPO')
+XMP_CRC_BLOCKS = (("XMP header (640-703)", 640, 62, 702),) + tuple(
+    (f"XMP {i} ({base}-{base + 63})", base, 62, base + 62)
+    for i, base in enumerate((704, 768, 832, 896, 960), 1))
+EXPO_CRC_BLOCK = ("EXPO (832-959)", 832, 126, 958)
+# Профили XMP, место которых занимает блок EXPO
+_EXPO_RANGE = range(832, 960)
+
+def crc16(data, crc=0):
+    """CRC-16 по таблице"""
+    table = CRC_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ b]
+    return crc
+
+def _has_signature(data, signature):
+    offset, magic = signature
+    return bytes(data[offset:offset + len(magic)]) == magic
+
+def profile_blocks(data):
+    """Блоки CRC профилей XMP / EXPO образа DDR5 (по их сигнатурам)"""
+    expo = _has_signature(data, EXPO_SIGNATURE)
+    blocks = ()
+    if _has_signature(data, XMP_SIGNATURE):
+        blocks += tuple(b for b in XMP_CRC_BLOCKS if not (expo and b[1] in _EXPO_RANGE))
+    if expo:
+        blocks += (EXPO_CRC_BLOCK,)
+    return blocks
+
+def crc_blocks(data):
+    """Блоки CRC для образа (по байту 2) или пустой кортеж"""
+    if len(data) < 3:
+        return ()
+    blocks = CRC_BLOCKS.get(data[2], ())
+    if data[2] == DDR5_TYPE:
+        blocks += profile_blocks(data)
+    return blocks
+
+def check_image(data):
+    """Проверка всех CRC образа: список (имя, записанная, вычисленная, ok)"""
+    out = []
+    for name, start, length, crc_offset in crc_blocks(data):
+        if len(data) < crc_offset + 2:
+            continue
+        stored = data[crc_offset] | (data[crc_offset + 1] << 8)
+        computed = crc16(data[start:start + length])
+        out.append((name, stored, computed, stored == computed))
+    return out
+
+def fix_image(data):
+    """Копия образа с пересчитанными CRC всех блоков"""
+    fixed = bytearray(data)
+    for name, start, length, crc_offset in crc_blocks(fixed):
+        if len(fixed) < crc_offset + 2:
+            continue
+        crc = crc16(fixed[start:start + length])
+        fixed[crc_offset] = crc & 0xFF
+        fixed[crc_offset + 1] = crc >> 8
+    return fixed
+
+# --- Векторизованная версия для массивов (N, L) ---
+
+def crc16_batch(arr, start, length):
+    """CRC-16 диапазона [start, start+length) для каждой строки массива (N, L)"""
+    import numpy as np
+
+    table = np.array(CRC_TABLE, dtype=np.uint16)
+    crc = np.zeros(len(arr), dtype=np.uint16)
+    for col in arr[:, start:start + length].T:
+        crc = (crc << 8) ^ table[(crc >> 8) ^ col]
+    return crc
+
+def _signature_batch(arr, signature):
+    import numpy as np
+
+    offset, magic = signature
+    if arr.shape[1] < offset + len(magic):
+        return np.zeros(len(arr), dtype=bool)
+    return (arr[:, offset:offset + len(magic)] == np.frombuffer(magic, dtype=np.uint8)).all(axis=1)
+
+def check_batch(arr, sizes=None):
+    """Проверка CRC для партии: {имя блока: (stored, computed, ok, строки)}
+
+    Строки сгруппированы по типу DRAM; образы неизвестного типа пропускаются.
+    Блоки XMP / EXPO проверяются у строк DDR5 с их сигнатурой. sizes - длины
+    образов (N,): блок проверяется, только если образ его содержит.
+    """
+    import numpy as np
+
+    arr = np.asarray(arr, dtype=np.uint8)
+    if sizes is None:
+        sizes = np.full(len(arr), arr.shape[1])
+    sizes = np.asarray(sizes)
+    out = {}
+
+    def check(block, selected):
+        name, start, length, crc_offset = block
+        if arr.shape[1] < crc_offset + 2:
+            return
+        rows = np.flatnonzero(selected & (sizes >= crc_offset + 2))
+        if not len(rows):
+            return
+        sub = arr[rows]
+        stored = sub[:, crc_offset].astype(np.uint16) | (sub[:, crc_offset + 1].astype(np.uint16) << 8)
+        computed = crc16_batch(sub, start, length)
+        out[name] = (stored, computed, stored == computed, rows)
+
+    for dram_type, blocks in CRC_BLOCKS.items():
+        selected = arr[:, 2] == dram_type
+        for block in blocks:
+            check(block, selected)
+
+    ddr5 = arr[:, 2] == DDR5_TYPE
+    expo = ddr5 & _signature_batch(arr, EXPO_SIGNATURE)
+    xmp = ddr5 & _signature_batch(arr, XMP_SIGNATURE)
+    for block in XMP_CRC_BLOCKS:
+        check(block, xmp & ~expo if block[1] in _EXPO_RANGE else xmp)
+    check(EXPO_CRC_BLOCK, expo)
+    return out
+
+def fix_batch(arr):
+    """Исправление CRC на месте для всех строк массива (N, L)"""
+    for name, (stored, computed, ok, rows) in check_batch(arr).items():
+        crc_offset = _crc_offset(name)
+        arr[rows, crc_offset] = computed & 0xFF
+        arr[rows, crc_offset + 1] = computed >> 8
+    return arr
+
+def _crc_offset(block_name):
+    for blocks in tuple(CRC_BLOCKS.values()) + (XMP_CRC_BLOCKS, (EXPO_CRC_BLOCK,)):
+        for name, _, _, crc_offset in blocks:
+            if name == block_name:
+                return crc_offset
+    raise KeyError(block_name)
+
+def load_images(sources, width=1024):
+    """Порция источников в массив (N, width) с длинами и ошибками чтения
+
+    Возвращает (arr, sizes, errors): errors - {строка: текст ошибки}; строка
+    с ошибкой остаётся нулевой (sizes 0) и не проверяется.
+    """
+    import numpy as np
+    from spd_batch import read_source
+
+    arr = np.zeros((len(sources), width), dtype=np.uint8)
+    sizes = np.zeros(len(sources), dtype=np.int64)
+    errors = {}
+    for i, src in enumerate(sources):
+        try:
+            data = read_source(src)
+        except Exception as e:
+            errors[i] = str(e)
+            continue
+        n = min(len(data), width)
+        arr[i, :n] = np.frombuffer(data, dtype=np.uint8, count=n)
+        sizes[i] = len(data)
+    return arr, sizes, errors
+
+def read_full(src):
+    """Образ целиком (для .bin - весь файл, включая байты за 1024)"""
+    from spd_batch import PackRecord, read_source
+
+    if isinstance(src, PackRecord):
+        return bytes(read_source(src))
+    with open(src, 'rb') as f:
+        return f.read()
+
+def _path_parts(path):
+    """Компоненты пути без диска, корня, '.' и '..'"""
+    path = os.path.splitdrive(str(path))[1].replace('\\', '/')
+    return [p for p in path.split('/') if p not in ('', '.', '..')]
+
+def fix_paths(sources, out_dir):
+    """Пути исправленных образов в out_dir с сохранением структуры источников
+
+    Путь образа - его путь (для записи контейнера или архива - путь
+    контейнера и имя члена) без общего для всех источников префикса
+    директорий, поэтому одноимённые дампы из разных директорий и архивов не
+    перезаписывают друг друга. При совпадении путей - ValueError.
+    """
+    from spd_batch import PackRecord, source_name
+
+    parts = []
+    for src in sources:
+        if isinstance(src, PackRecord):
+            parts.append(_path_parts(os.path.abspath(src.pack_path)) + _path_parts(src.name))
+        else:
+            parts.append(_path_parts(os.path.abspath(src)))
+
+    # Общий префикс, но имя файла всегда остаётся
+    common = min((len(p) for p in parts), default=1) - 1
+    for i in range(common):
+        if any(p[i] != parts[0][i] for p in parts):
+            common = i
+            break
+
+    paths = []
+    owners = {}
+    for k, (src, p) in enumerate(zip(sources, parts)):
+        path = os.path.join(out_dir, *p[common:])
+        j = owners.setdefault(path, k)
+        if j != k:
+            raise ValueError(f"{source_name(sources[j])} и {source_name(src)} -> {path}")
+        paths.append(path)
+    return paths
+
+def main():
+    """Главная функция: проверка CRC всей партии"""
+    import argparse
+    import numpy as np
+    from spd_batch import chunked, collect_inputs, source_name
+
+    parser = argparse.ArgumentParser(description="Проверка JEDEC CRC-16 SPD дампов")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('--fix', metavar='DIR',
+                        help="сохранить исправленные образы с ошибками CRC в DIR "
+                             "(с сохранением относительных путей)")
+    parser.add_argument('--all', action='store_true',
+                        help="выводить все модули, а не только с ошибками")
+    parser.add_argument('--batch-size', type=int, default=65536,
+                        help="образов в одном векторном проходе")
+    args = parser.parse_args()
+
+    print("🔍 Проверка JEDEC CRC-16 SPD дампов\n")
+
+    sources = collect_inputs(args.paths, args.recursive)
+    if not sources:
+        print("❌ Не найдено .bin файлов")
+        return
+
+    out_paths = None
+    if args.fix:
+        try:
+            out_paths = fix_paths(sources, args.fix)
+        except ValueError as e:
+            print(f"❌ Совпадают пути исправленных образов: {e}")
+            sys.exit(1)
+
+    totals = {}
+    bad_modules = 0
+    read_errors = 0
+    t0 = time.perf_counter()
+    offset = 0
+
+    for chunk in chunked(sources, args.batch_size):
+        arr, sizes, errors = load_images(chunk)
+        for i, error in errors.items():
+            print(f"❌ Ошибка при обработке {source_name(chunk[i])}: {error}")
+        read_errors += len(errors)
+        checks = check_batch(arr, sizes)
+        bad = np.zeros(len(chunk), dtype=bool)
+        for name, (stored, computed, ok, rows) in checks.items():
+            passed, total = totals.get(name, (0, 0))
+            totals[name] = (passed + int(ok.sum()), total + len(ok))
+            bad[rows[~ok]] = True
+
+        for i in np.flatnonzero(bad) if not args.all else range(len(chunk)):
+            if i in errors:
+                continue
+            status = []
+            for name, (stored, computed, ok, rows) in checks.items():
+                j = np.searchsorted(rows, i)
+                if j < len(rows) and rows[j] == i:
+                    mark = "✅" if ok[j] else "❌"
+                    status.append(f"{mark} {name}: 0x{stored[j]:04X}/0x{computed[j]:04X}")
+            print(f"  {source_name(chunk[i])}")
+            for s in status or ["⚠️  неизвестный тип SPD или короткий образ - CRC не проверялась"]:
+                print(f"    {s}")
+        bad_modules += int(bad.sum())
+
+        if args.fix and bad.any():
+            # Исправляется образ целиком: размер и байты за пределами блоков CRC
+            # (в том числе после 1024) сохраняются
+            for i in np.flatnonzero(bad):
+                try:
+                    fixed = fix_image(read_full(chunk[i]))
+                except OSError as e:
+                    print(f"❌ Ошибка при обработке {source_name(chunk[i])}: {e}")
+                    continue
+                path = out_paths[offset + i]
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(fixed)
+        offset += len(chunk)
+
+    elapsed = time.perf_counter() - t0
+    print(f"\n📊 ИТОГО ({len(sources)} модулей, {elapsed:.2f} с):")
+    for name, (passed, total) in totals.items():
+        print(f"  {name:<20} {passed}/{total} OK")
+    if read_errors:
+        print(f"\n❌ Не прочитано файлов: {read_errors}")
+    if bad_modules:
+        print(f"\n❌ Модулей с ошибками CRC: {bad_modules}")
+        if args.fix:
+            print(f"   Исправленные образы сохранены в {args.fix}")
+    elif not read_errors:
+        print("\n✅ Все CRC корректны")
+
+if __name__ == '__main__':
+    main()
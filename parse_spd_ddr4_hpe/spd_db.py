@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Справочники из Database/*.json: производители JEDEC, регистры, part numbers
+
+JSON разбираются один раз при первом обращении и превращаются в индексы:
+словари с целыми ключами (ID производителя = байты 320-321 как '>H', модель
+регистра = байты 133-134) и префиксные деревья для part numbers. Индексы
+сохраняются в marshal-кэш с ключом (размер, mtime) всех JSON, поэтому
+следующие процессы (в т.ч. рабочие процессы пула) загружают их за
+миллисекунды без разбора JSON. Изменение любого JSON перестраивает кэш.
+"""
+
+import json
+import marshal
+import os
+import re
+import sys
+import zlib
+from pathlib import Path
+
+DATABASE_DIR = Path(os.environ.get('SPD_DATABASE_DIR',
+                                   Path(__file__).resolve().parent.parent / 'Database'))
+SOURCES = ('manufacturers.json', 'register_models.json', 'part_number_decoder.json',
+           'dram_part_numbers.json')
+
+# Увеличивать при изменении структуры индексов
+INDEX_VERSION = 1
+
+_LEAF = ''  # ключ узла дерева со значениями (символы part number непусты)
+_LITERAL_PREFIX = re.compile(r'\^([A-Z0-9]*)(?![*+?{])')
+
+def default_cache_path(db_dir=DATABASE_DIR):
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    tag = f"{zlib.crc32(os.fsencode(Path(db_dir).resolve())):08x}"
+    return os.path.join(base, 'spd_tools', f'spd_db_{tag}.marshal')
+
+# --- Префиксное дерево ---
+
+def trie_insert(trie, key, value):
+    node = trie
+    for ch in key:
+        node = node.setdefault(ch, {})
+    node.setdefault(_LEAF, []).append(value)
+
+def trie_prefixes(trie, text):
+    """Значения всех ключей-префиксов text, от самого длинного к короткому"""
+    found = []
+    node = trie
+    if _LEAF in node:
+        found.append(node[_LEAF])
+    for ch in text:
+        node = node.get(ch)
+        if node is None:
+            break
+        if _LEAF in node:
+            found.append(node[_LEAF])
+    return [v for values in reversed(found) for v in values]
+
+# --- Построение индексов из JSON ---
+
+def _load_json(db_dir, name):
+    path = os.path.join(db_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def build_index(db_dir=DATABASE_DIR):
+    """Индексы из JSON: только dict/list/tuple/str/int (пригодно для marshal)"""
+    manufacturers = {}
+    data = _load_json(db_dir, 'manufacturers.json') or {}
+    for key, name in data.get('manufacturers', {}).items():
+        manufacturers[int(key, 16)] = name
+
+    registers = {}
+    for entry in _load_json(db_dir, 'register_models.json') or []:
+        # type/revision в базе - байты 134 и 133 SPD (ID производителя регистра)
+        registers[(entry['revision'] << 8) | entry['type']] = (entry['manufacturer'], entry['model'])
+
+    patterns = []
+    pattern_trie = {}
+    decoder = _load_json(db_dir, 'part_number_decoder.json') or {}
+    for vendor, info in decoder.get('manufacturers', {}).items():
+        for p in info.get('patterns', []):
+            if 'regex' not in p:
+                continue
+            # Поля с index >= 1 - группы regex; index 0 - литеральный префикс
+            groups = tuple(sorted(((f['index'], name) for name, f in p.get('fields', {}).items()
+                                  if f.get('index', 0) > 0)))
+            m = _LITERAL_PREFIX.match(p['regex'])
+            trie_insert(pattern_trie, m.group(1) if m else '', len(patterns))
+            patterns.append((vendor, p['regex'], p.get('description', ''), groups))
+
+    speed_codes = {mem: {int(rate): code for rate, code in codes.items() if rate.isdigit()}
+                   for mem, codes in decoder.get('speedCodes', {}).items() if mem != 'notes'}
+
+    drams = []
+    dram_trie = {}
+    for entry in _load_json(db_dir, 'dram_part_numbers.json') or []:
+        pn = entry['partNumber'].split(' ')[0].upper()
+        trie_insert(dram_trie, pn, len(drams))
+        drams.append(entry)
+
+    return {
+        'manufacturers': manufacturers,
+        'registers': registers,
+        'patterns': patterns,
+        'pattern_trie': pattern_trie,
+        'speed_codes': speed_codes,
+        'drams': drams,
+        'dram_trie': dram_trie,
+    }
+
+def source_signature(db_dir=DATABASE_DIR):
+    """Ключ кэша: версия индексов и (имя, размер, mtime_ns) каждого JSON"""
+    sig = [INDEX_VERSION]
+    for name in SOURCES:
+        try:
+            st = os.stat(os.path.join(db_dir, name))
+            sig.append((name, st.st_size, st.st_mtime_ns))
+        except OSError:
+            sig.append((name, None, None))
+    return tuple(sig)
+
+def load_index(db_dir=DATABASE_DIR, cache_path=None):
+    """Индексы из marshal-кэша, если он свежий, иначе из JSON (с обновлением кэша)"""
+    cache_path = cache_path or default_cache_path(db_dir)
+    sig = source_signature(db_dir)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_sig, index = marshal.loads(f.read())
+        if cached_sig == sig:
+            return index
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    index = build_index(db_dir)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            marshal.dump((sig, index), f)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass  # кэш необязателен (read-only домашняя директория и т.п.)
+    return index
+
+# --- Поиск ---
+
+class SpdDatabase:
+    """Ленивая обёртка над индексами: загрузка при первом обращении"""
+
+    def __init__(self, db_dir=DATABASE_DIR, cache_path=None):
+        self.db_dir = db_dir
+        self.cache_path = cache_path
+        self._index = None
+        self._compiled = {}
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = load_index(self.db_dir, self.cache_path)
+        return self._index
+
+    def manufacturer(self, mfg_id):
+        """Имя производителя по ID (байты 320-321 как '>H'); None - неизвестен
+
+        В базе у номера банка всегда стоит бит 7, в SPD это бит чётности.
+        """
+        return self.index['manufacturers'].get(mfg_id | 0x8000)
+
+    def register_model(self, reg_id):
+        """(производитель, модель) регистра по байтам 133-134 как '>H'; None - неизвестен"""
+        return self.index['registers'].get(reg_id)
+
+    def manufacturers_batch(self, ids, default=None):
+        """Имена для массива ID: словарь ищется один раз на уникальное значение"""
+        import numpy as np
+
+        ids = np.asarray(ids)
+        uniq, inverse = np.unique(ids, return_inverse=True)
+        names = self.index['manufacturers']
+        table = np.array([names.get(int(i) | 0x8000, default) for i in uniq], dtype=object)
+        return table[inverse.reshape(ids.shape)]
+
+    def _regex(self, i):
+        rx = self._compiled.get(i)
+        if rx is None:
+            rx = self._compiled[i] = re.compile(self.index['patterns'][i][1])
+        return rx
+
+    def decode_part_number(self, part_number):
+        """Разбор part number модуля по шаблонам part_number_decoder.json
+
+        Кандидаты берутся из префиксного дерева (самый длинный литеральный
+        префикс шаблона - первым). Возвращает словарь vendor/format/fields
+        или None.
+        """
+        pn = part_number.strip().upper()
+        patterns = self.index['patterns']
+        for i in trie_prefixes(self.index['pattern_trie'], pn):
+            m = self._regex(i).match(pn)
+            if m is None:
+                continue
+            vendor, _, description, groups = patterns[i]
+            fields = {}
+            for index, name in groups:
+                if index <= m.re.groups and m.group(index):
+                    fields[name] = m.group(index)
+            return {'vendor': vendor, 'format': description, 'fields': fields}
+        return None
+
+    def dram_part(self, part_number):
+        """Запись dram_part_numbers.json с самым длинным совпадающим префиксом"""
+        found = trie_prefixes(self.index['dram_trie'], part_number.strip().upper())
+        return self.index['drams'][found[0]] if found else None
+
+    def speed_code(self, rate, memory='DDR4'):
+        """Буквенный код скоростной категории JEDEC (например, 3200 -> 'AA')"""
+        return self.index['speed_codes'].get(memory, {}).get(rate)
+
+_default = None
+
+def get_db():
+    """Общий экземпляр справочника процесса"""
+    global _default
+    if _default is None:
+        _default = SpdDatabase()
+    return _default
+
+def manufacturer_name(mfg_id, fallback=None):
+    """Имя производителя: база JEDEC, затем fallback, иначе 'Unknown (0x....)'"""
+    name = get_db().manufacturer(mfg_id)
+    if name is None and fallback is not None:
+        name = fallback.get(mfg_id)
+    return name if name is not None else f"Unknown (0x{mfg_id:04X})"
+
+def manufacturer_ids(name):
+    """ID производителей, в имени которых есть name (без учёта регистра), или ID в hex
+
+    В базе у номера банка стоит бит 7; в SPD это бит чётности, поэтому
+    возвращаются оба варианта ID.
+    """
+    if re.fullmatch(r'(0x)?[0-9A-Fa-f]{4}', name):
+        mfg_id = int(name, 16)
+        return sorted({mfg_id, mfg_id ^ 0x8000})
+    needle = name.lower()
+    ids = [i for i, n in get_db().index['manufacturers'].items() if needle in n.lower()]
+    return sorted(set(ids) | {i & 0x7FFF for i in ids})
+
+def main():
+    """Главная функция: поиск по справочникам из командной строки"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Поиск в справочниках Database/*.json")
+    parser.add_argument('--mfg', nargs='+', default=[], metavar='ID',
+                        help="ID производителя JEDEC (hex, например 80CE)")
+    parser.add_argument('--register', nargs='+', default=[], metavar='ID',
+                        help="ID регистра (байты 133-134, hex)")
+    parser.add_argument('--pn', nargs='+', default=[], metavar='PART', help="part number модуля")
+    parser.add_argument('--rebuild', action='store_true', help="перестроить кэш индексов")
+    args = parser.parse_args()
+
+    db = get_db()
+    if args.rebuild:
+        try:
+            os.remove(db.cache_path or default_cache_path(db.db_dir))
+        except OSError:
+            pass
+    t0 = time.perf_counter()
+    index = db.index
+    print(f"📚 {db.db_dir}: производителей {len(index['manufacturers'])}, регистров "
+          f"{len(index['registers'])}, шаблонов PN {len(index['patterns'])}, "
+          f"DRAM {len(index['drams'])} ({1000 * (time.perf_counter() - t0):.1f} мс)",
+          file=sys.stderr)
+
+    for value in args.mfg:
+        mfg_id = int(value, 16)
+        print(f"0x{mfg_id:04X}: {manufacturer_name(mfg_id)}")
+    for value in args.register:
+        model = db.register_model(int(value, 16))
+        print(f"0x{int(value, 16):04X}: {' '.join(model) if model else 'неизвестен'}")
+    for pn in args.pn:
+        decoded = db.decode_part_number(pn)
+        dram = db.dram_part(pn)
+        print(json.dumps({'part_number': pn, 'decoded': decoded, 'dram': dram},
+                         indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
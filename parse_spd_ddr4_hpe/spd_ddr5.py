@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Декодер DDR5 SPD (JESD400-5): базовая конфигурация, тайминги, XMP 3.0 / EXPO
+
+Образ DDR5 - 1024 байта: базовая конфигурация 0-127, параметры модуля
+192-447, CRC 510-511, производственные данные 512-554, пользовательская
+область 640-1023 (заголовок и профили Intel XMP 3.0, блок AMD EXPO).
+Поля описаны таблицами spd_layout.Field и компилируются тем же
+spd_layout.compile_fields; чтение идёт struct.unpack_from прямо из bytes,
+memoryview или mmap записи .spdpack без срезов и копий.
+
+Тайминги DDR5 хранятся в пс (tRFC - в нс), без MTB/FTB. Такты - по
+правилу округления JESD400-5: поправка 0.3% вниз, затем вверх до целого.
+analyze_ddr5() возвращает словарь с теми же ключами, что analyze_spd для
+DDR4, поэтому пакетная обработка, кэш и вывод работают со смешанными партиями.
+"""
+
+import os
+
+from spd_crc import crc16
+from spd_db import manufacturer_name
+from spd_layout import Field, compile_fields
+from spd_timing import SPEED_TOLERANCE_PS, speed_grade
+
+DDR5_TYPE = 0x12
+DDR5_SIZE = 1024
+# Минимум для разбора: базовая конфигурация, параметры модуля и производственные данные
+DDR5_MIN_SIZE = 640
+
+# Типы модулей DDR5 (байт 3, биты 3-0)
+MODULE_TYPES = {
+    0x01: "RDIMM",
+    0x02: "UDIMM",
+    0x03: "SODIMM",
+    0x04: "LRDIMM",
+    0x05: "CUDIMM",
+    0x06: "CSODIMM",
+    0x07: "MRDIMM",
+    0x08: "CAMM2",
+    0x0A: "DDIMM",
+    0x0B: "Solder down",
+}
+
+# Плотность кристалла (байт 4, биты 4-0), Гбит
+DIE_DENSITIES = {1: 4, 2: 8, 3: 12, 4: 16, 5: 24, 6: 32, 7: 48, 8: 64}
+
+# Кристаллов в корпусе (байт 4, биты 7-5): (число, 3DS)
+DIE_PACKAGES = {0: (1, False), 2: (2, False), 3: (2, True), 4: (4, True), 5: (8, True), 6: (16, True)}
+
+DEVICE_WIDTHS = {0: "x4", 1: "x8", 2: "x16", 3: "x32"}
+
+# Стандартные скорости DDR5: MT/s, tCK (пс) по JESD79-5
+SPEED_BINS = (
+    (8800, 227),
+    (8400, 238),
+    (8000, 250),
+    (7600, 263),
+    (7200, 277),
+    (6800, 294),
+    (6400, 312),
+    (6000, 333),
+    (5600, 357),
+    (5200, 384),
+    (4800, 416),
+    (4400, 454),
+    (4000, 500),
+    (3600, 555),
+    (3200, 625),
+)
+
+# Тайминги в пс: (имя, поле младшей границы в тактах или None); tRFC* - в нс
+PARAMS = (
+    ('tck_min', None),
+    ('tck_max', None),
+    ('taa_min', None),
+    ('trcd_min', None),
+    ('trp_min', None),
+    ('tras_min', None),
+    ('trc_min', None),
+    ('twr_min', None),
+    ('trfc1_min', None),
+    ('trfc2_min', None),
+    ('trfcsb_min', None),
+    ('trrd_l_min', 'trrd_l_nck'),
+    ('tccd_l_min', 'tccd_l_nck'),
+    ('tccd_l_wr_min', 'tccd_l_wr_nck'),
+    ('tccd_l_wr2_min', 'tccd_l_wr2_nck'),
+    ('tfaw_min', 'tfaw_nck'),
+    ('tccd_l_wtr_min', 'tccd_l_wtr_nck'),
+    ('tccd_s_wtr_min', 'tccd_s_wtr_nck'),
+    ('trtp_min', 'trtp_nck'),
+)
+
+PARAM_NAMES = tuple(name for name, _ in PARAMS)
+_NS_PARAMS = ('trfc1_min', 'trfc2_min', 'trfcsb_min')
+_CYCLE_PARAMS = ('trcd_min', 'trp_min', 'tras_min', 'trc_min')
+
+def _timing_fields(names, start):
+    return tuple(Field(name, start + 2 * i, 2, '<') for i, name in enumerate(names))
+
+def _limited_fields(params, start):
+    """Параметры с младшей границей: 2 байта пс + 1 байт тактов"""
+    fields = []
+    for i, (name, nck_name) in enumerate(params):
+        fields += [Field(name, start + 3 * i, 2, '<'), Field(nck_name, start + 3 * i + 2)]
+    return tuple(fields)
+
+FIELDS = (
+    # Базовая конфигурация (0-127)
+    Field('spd_bytes_used', 0),
+    Field('spd_size_code', 0, mask=0x70, shift=4),
+    Field('spd_revision', 1),
+    Field('dram_type', 2),
+    Field('module_type_code', 3),
+    Field('density_code', 4, mask=0x1F),
+    Field('package_code', 4, mask=0xE0, shift=5),
+    Field('row_addr', 5, mask=0x1F, add=16),
+    Field('col_addr', 5, mask=0xE0, shift=5, add=10),
+    Field('width_code', 6, mask=0xE0, shift=5),
+    Field('bank_groups_code', 7, mask=0xE0, shift=5),
+    Field('banks_code', 7, mask=0x07),
+    Field('vdd_code', 16, mask=0xF0, shift=4),
+    Field('vddq_code', 17, mask=0xF0, shift=4),
+    Field('vpp_code', 18, mask=0xF0, shift=4),
+    # Маска CAS - 5 байт (24-28): бит i - CL 20 + 2i
+    Field('cas_mask', 24, 4, '<', msb=(28, 0xFF, 0)),
+) + _timing_fields(('tck_min', 'tck_max'), 20) + \
+    _timing_fields(PARAM_NAMES[2:11], 30) + \
+    _limited_fields(PARAMS[11:], 70) + (
+    # Общие параметры модуля (192-239)
+    Field('spd_hub_mfg_id', 194, 2, '>'),
+    Field('spd_hub_type', 196),
+    Field('spd_hub_rev', 197),
+    Field('pmic_mfg_id', 198, 2, '>'),
+    Field('pmic_type', 200),
+    Field('pmic_rev', 201),
+    Field('ranks', 234, mask=0x38, shift=3, add=1),
+    Field('subchannels_code', 235, mask=0x60, shift=5),
+    Field('bus_ext_code', 235, mask=0x18, shift=3),
+    Field('bus_width_code', 235, mask=0x07),
+    # RDIMM/LRDIMM: регистр (RCD)
+    Field('register_mfg_id', 240, 2, '>'),
+    Field('register_type', 242),
+    Field('register_rev', 243),
+    Field('crc_base', 510, 2, '<'),
+    # Производственные данные (512-554), дата в BCD
+    Field('module_mfg_id', 512, 2, '>'),
+    Field('mfg_location', 514),
+    Field('mfg_year', 515, add=2000, bcd=True),
+    Field('mfg_week', 516, bcd=True),
+    Field('serial_number', 517, 4, '>'),
+    Field('part_number', 521, 30, kind='str'),
+    Field('module_revision', 551),
+    Field('dram_mfg_id', 552, 2, '>'),
+    Field('dram_stepping', 554),
+)
+
+FIELD_BY_NAME = {f.name: f for f in FIELDS}
+
+# --- Intel XMP 3.0: заголовок 640-703, профили по 64 байта, CRC в последних 2 байтах ---
+
+XMP_MAGIC = 0x0C4A
+XMP_HEADER = 640
+XMP_BLOCK = 64
+XMP_PROFILES = (704, 768, 832, 896, 960)
+XMP_NAMES = ('Performance', 'Extreme', 'Fastest', 'User 1', 'User 2')
+
+XMP_HEADER_FIELDS = (
+    Field('magic', 0, 2, '>'),
+    Field('version', 2),
+    Field('enabled', 3),
+    # Имена профилей 1-3 (16 байт, ASCII до \r)
+    Field('name1', 14, 16, kind='raw'),
+    Field('name2', 30, 16, kind='raw'),
+    Field('name3', 46, 16, kind='raw'),
+)
+
+XMP_PROFILE_FIELDS = (
+    Field('vpp_code', 0),
+    Field('vdd_code', 1),
+    Field('vddq_code', 2),
+    Field('tck_min', 5, 2, '<'),
+    Field('cas_mask', 7, 4, '<', msb=(11, 0xFF, 0)),
+) + _timing_fields(('taa_min', 'trcd_min', 'trp_min', 'tras_min', 'trc_min', 'twr_min',
+                    'trfc1_min', 'trfc2_min', 'trfcsb_min'), 13)
+
+# --- AMD EXPO: блок 832-959 ("EXPO"), два профиля по 40 байт, CRC 958-959 ---
+
+EXPO_MAGIC = b'EXPO'
+EXPO_BLOCK = 832
+EXPO_SIZE = 128
+EXPO_PROFILES = (EXPO_BLOCK + 10, EXPO_BLOCK + 50)
+
+EXPO_HEADER_FIELDS = (
+    Field('magic', 0, 4, kind='raw'),
+    Field('version', 4),
+)
+
+EXPO_PROFILE_FIELDS = (
+    Field('vdd_code', 0),
+    Field('vddq_code', 1),
+    Field('vpp_code', 2),
+    Field('tck_min', 4, 2, '<'),
+) + _timing_fields(('taa_min', 'trcd_min', 'trp_min', 'tras_min', 'trc_min', 'twr_min',
+                    'trfc1_min', 'trfc2_min', 'trfcsb_min'), 6)
+
+decode_base, BASE_SPAN = compile_fields(FIELDS)
+_decode_xmp_header, _ = compile_fields(XMP_HEADER_FIELDS)
+_decode_xmp_profile, _ = compile_fields(XMP_PROFILE_FIELDS)
+_decode_expo_header, _ = compile_fields(EXPO_HEADER_FIELDS)
+_decode_expo_profile, _ = compile_fields(EXPO_PROFILE_FIELDS)
+
+def is_ddr5(data):
+    """Образ DDR5 по ключевому байту 2"""
+    return len(data) > 2 and data[2] == DDR5_TYPE
+
+# --- Тайминги ---
+
+def nck(t_ps, tck_ps):
+    """Параметр в тактах по округлению JESD400-5: поправка 0.3% вниз, затем вверх"""
+    return (t_ps * 997 // tck_ps + 1000) // 1000
+
+def cas_latencies(mask):
+    """Поддерживаемые CL из маски байтов 24-28"""
+    return tuple(20 + 2 * i for i in range(40) if mask >> i & 1)
+
+def select_cl(cls, taa_ps, tck_ps):
+    """Минимальный CL, покрывающий tAAmin; без маски (EXPO) - чётный CL по tAA"""
+    need = nck(taa_ps, tck_ps)
+    if not cls:
+        return need + (need & 1)
+    return next((cl for cl in cls if cl >= need), 0)
+
+def timings_ps(fields):
+    """Все параметры PARAMS в пс (tRFC переводятся из нс)"""
+    return {name: fields[name] * 1000 if name in _NS_PARAMS else fields[name]
+            for name in PARAM_NAMES if name in fields}
+
+def cycles_at(ps, cls, tck_ps):
+    """(CL, tRCD, tRP, tRAS, tRC) на заданном tCK"""
+    return (select_cl(cls, ps['taa_min'], tck_ps),) + \
+        tuple(nck(ps[name], tck_ps) for name in _CYCLE_PARAMS)
+
+def cycle_table(ps, cls):
+    """Строки (MT/s, CL, tRCD, tRP, tRAS, tRC) для скоростей, доступных модулю"""
+    rows = []
+    for rate, bin_tck in SPEED_BINS:
+        if bin_tck + SPEED_TOLERANCE_PS < ps['tck_min']:
+            continue
+        row = cycles_at(ps, cls, max(bin_tck, ps['tck_min']))
+        if row[0]:
+            rows.append((rate,) + row)
+    return tuple(rows)
+
+def limited_cycles(fields, ps, tck_ps):
+    """Такты параметров с младшей границей: max(округлённое значение, граница)"""
+    return {name: max(nck(ps[name], tck_ps), fields[nck_name])
+            for name, nck_name in PARAMS if nck_name}
+
+# --- Напряжения ---
+
+# Номинальные напряжения базовой конфигурации (байты 16-18, биты 7-4), мВ
+NOMINAL_MV = {'vdd': {0: 1100}, 'vddq': {0: 1100}, 'vpp': {0: 1800}}
+
+def profile_mv(code):
+    """Напряжение профиля XMP/EXPO: биты 6-5 - вольты, биты 4-0 - шаг 50 мВ"""
+    return ((code >> 5) & 0x03) * 1000 + (code & 0x1F) * 50
+
+# --- Профили разгона ---
+
+def _profile(kind, index, name, fields, crc_ok):
+    ps = timings_ps(fields)
+    tck = ps['tck_min']
+    cls = cas_latencies(fields.get('cas_mask', 0))
+    return {
+        'kind': kind,
+        'index': index,
+        'name': name,
+        'freq_mhz': speed_grade(tck, SPEED_BINS),
+        'tck_ps': tck,
+        'vdd': profile_mv(fields['vdd_code']) / 1000,
+        'vddq': profile_mv(fields['vddq_code']) / 1000,
+        'vpp': profile_mv(fields['vpp_code']) / 1000,
+        'cas_latencies': list(cls),
+        'timing_cycles': list(cycles_at(ps, cls, tck)),
+        'timings_ps': ps,
+        'crc_ok': crc_ok,
+    }
+
+def _block_crc_ok(view, start, size):
+    stored = view[start + size - 2] | (view[start + size - 1] << 8)
+    return crc16(view[start:start + size - 2]) == stored
+
+def xmp_profiles(view):
+    """Профили Intel XMP 3.0 (пусто, если заголовка нет)"""
+    header = _decode_xmp_header(view, XMP_HEADER)
+    if header['magic'] != XMP_MAGIC:
+        return []
+    expo = expo_present(view)
+    out = []
+    for i, base in enumerate(XMP_PROFILES):
+        # Профиль 3 занимает место блока EXPO
+        if expo and base == EXPO_BLOCK:
+            continue
+        fields = _decode_xmp_profile(view, base)
+        if not (header['enabled'] >> i & 1 or i >= 3) or fields['tck_min'] == 0:
+            continue
+        name = XMP_NAMES[i]
+        if i < 3:
+            custom = header[f'name{i + 1}'].split(b'\r')[0].strip(b'\x00 ')
+            name = custom.decode('ascii', errors='ignore') or name
+        out.append(_profile('XMP', i + 1, name, fields, _block_crc_ok(view, base, XMP_BLOCK)))
+    return out
+
+def expo_present(view):
+    return _decode_expo_header(view, EXPO_BLOCK)['magic'] == EXPO_MAGIC
+
+def expo_profiles(view):
+    """Профили AMD EXPO (пусто, если блока нет)"""
+    if not expo_present(view):
+        return []
+    crc_ok = _block_crc_ok(view, EXPO_BLOCK, EXPO_SIZE)
+    out = []
+    for i, base in enumerate(EXPO_PROFILES):
+        fields = _decode_expo_profile(view, base)
+        if fields['tck_min']:
+            out.append(_profile('EXPO', i + 1, f"EXPO {i + 1}", fields, crc_ok))
+    return out
+
+# --- Анализ ---
+
+def capacity_gb(f):
+    """Объём модуля: подканалы * (ширина шины / ширина чипа) * плотность * ранги"""
+    density = DIE_DENSITIES.get(f['density_code'])
+    width = 4 << f['width_code']
+    if density is None or f['width_code'] not in DEVICE_WIDTHS:
+        return None
+    dies, stacked = DIE_PACKAGES.get(f['package_code'], (1, False))
+    subchannels = 1 << f['subchannels_code']
+    bus_width = 8 << f['bus_width_code']
+    gbit = subchannels * bus_width // width * density * f['ranks'] * (dies if stacked else 1)
+    return gbit / 8
+
+def analyze_ddr5(data, filename):
+    """Детальный анализ DDR5 SPD в формате результатов analyze_spd"""
+    view = memoryview(data)
+    if len(view) < DDR5_MIN_SIZE:
+        raise ValueError(f"образ DDR5 короче {DDR5_MIN_SIZE} байт: {len(view)}")
+    f = decode_base(view)
+    results = {}
+    results['filename'] = os.path.basename(filename)
+    results['memory_type'] = 'DDR5'
+
+    results['spd_bytes_used'] = f['spd_bytes_used']
+    results['spd_revision'] = f"{f['spd_revision'] >> 4}.{f['spd_revision'] & 0x0F}"
+    results['dram_type'] = f['dram_type']
+    results['module_type_code'] = f['module_type_code']
+    results['module_type'] = MODULE_TYPES.get(f['module_type_code'] & 0x0F, "Unknown")
+
+    density = DIE_DENSITIES.get(f['density_code'])
+    results['sdram_density'] = f"{density}Gb" if density else "Unknown"
+    results['sdram_banks'] = str(1 << f['banks_code'])
+    results['bank_groups'] = 1 << f['bank_groups_code']
+    results['row_addr'] = f['row_addr']
+    results['col_addr'] = f['col_addr']
+    results['device_width'] = DEVICE_WIDTHS.get(f['width_code'], "Unknown")
+    results['ranks'] = f['ranks']
+    results['capacity_gb'] = capacity_gb(f)
+    results['voltages'] = {name: NOMINAL_MV[name].get(f[f'{name}_code'], 0) / 1000
+                           for name in ('vdd', 'vddq', 'vpp')}
+
+    ps = timings_ps(f)
+    tck = ps['tck_min']
+    if tck <= 0:
+        raise ValueError(f"некорректный tCKmin: {tck} пс")
+    cls = cas_latencies(f['cas_mask'])
+    cycles = cycles_at(ps, cls, tck)
+    results['tck_min'] = tck / 1000
+    results['tck_max'] = ps['tck_max'] / 1000
+    results['freq_mhz'] = speed_grade(tck, SPEED_BINS)
+    results['cas_latencies'] = list(cls)
+    results['taa_min'] = ps['taa_min'] / 1000
+    results['trcd_min'] = ps['trcd_min'] / 1000
+    results['trp_min'] = ps['trp_min'] / 1000
+    results['tras_min'] = ps['tras_min'] / 1000
+    results['trc_min'] = ps['trc_min'] / 1000
+    results['timings_ps'] = ps
+    results['timing_cycles'] = list(cycles[:4])
+    results['cycle_table'] = [list(row) for row in cycle_table(ps, cls)]
+    results['limited_cycles'] = limited_cycles(f, ps, tck)
+
+    mfg_id = f['module_mfg_id']
+    results['module_mfg_id'] = mfg_id
+    results['module_mfg'] = manufacturer_name(mfg_id)
+    results['part_number'] = f['part_number']
+    results['serial_number'] = f"0x{f['serial_number']:08X}"
+    results['mfg_date'] = f"Week {f['mfg_week']}, {f['mfg_year']}"
+    results['mfg_location'] = f['mfg_location']
+    dram_mfg_id = f['dram_mfg_id']
+    results['dram_mfg_id'] = dram_mfg_id
+    results['dram_mfg'] = manufacturer_name(dram_mfg_id)
+    results['dram_stepping'] = f['dram_stepping']
+
+    results['spd_hub'] = manufacturer_name(f['spd_hub_mfg_id'])
+    results['spd_hub_mfg_id'] = f['spd_hub_mfg_id']
+    if f['pmic_mfg_id']:
+        results['pmic_mfg_id'] = f['pmic_mfg_id']
+        results['pmic'] = manufacturer_name(f['pmic_mfg_id'])
+
+    if results['module_type'] in ("RDIMM", "LRDIMM", "MRDIMM"):
+        results['register_mfg_id'] = f['register_mfg_id']
+        results['register_mfg'] = manufacturer_name(f['register_mfg_id'])
+        results['register_rev'] = f['register_rev']
+
+    results['crc_base'] = f"0x{f['crc_base']:04X}"
+    results['crc_base_ok'] = crc16(view[0:510]) == f['crc_base']
+
+    if len(view) >= DDR5_SIZE:
+        results['profiles'] = xmp_profiles(view) + expo_profiles(view)
+    return results
+
+def print_ddr5_details(results):
+    """Разделы отчёта, которых нет у DDR4: доп. тайминги, хаб/PMIC, профили"""
+    ps = results['timings_ps']
+    limits = results.get('limited_cycles', {})
+
+    def cell(name):
+        value = f"{ps[name] / 1000:.3f}"
+        return f"{value} ({limits[name]}T)" if name in limits else value
+
+    print(f"  tWR:                   {ps['twr_min'] / 1000:.3f} ns")
+    print(f"  tRFC1/2/sb:            {ps['trfc1_min'] / 1000:g} / {ps['trfc2_min'] / 1000:g} / "
+          f"{ps['trfcsb_min'] / 1000:g} ns")
+    print(f"  tRRD_L, tFAW:          {cell('trrd_l_min')}, {cell('tfaw_min')} ns")
+    print(f"  tCCD_L, tCCD_L_WR:     {cell('tccd_l_min')}, {cell('tccd_l_wr_min')} ns")
+    print(f"  tCCD_L/S_WTR, tRTP:    {cell('tccd_l_wtr_min')} / {cell('tccd_s_wtr_min')}, "
+          f"{cell('trtp_min')} ns")
+    v = results['voltages']
+    print(f"  Voltage:               VDD {v['vdd']:.2f} V / VDDQ {v['vddq']:.2f} V / VPP {v['vpp']:.2f} V")
+
+    profiles = results.get('profiles')
+    if profiles:
+        print(f"\n🚀 ПРОФИЛИ XMP / EXPO:")
+        for p in profiles:
+            crc = "" if p['crc_ok'] else " ❌ CRC"
+            print(f"  {p['kind']} {p['index']} ({p['name']}): DDR5-{p['freq_mhz']} "
+                  f"{'-'.join(map(str, p['timing_cycles']))} @ {p['vdd']:.2f} V{crc}")
+
+    print(f"\n🧩 КОМПОНЕНТЫ МОДУЛЯ:")
+    print(f"  SPD Hub:               {results['spd_hub']} (ID: 0x{results['spd_hub_mfg_id']:04X})")
+    if 'pmic' in results:
+        print(f"  PMIC:                  {results['pmic']} (ID: 0x{results['pmic_mfg_id']:04X})")
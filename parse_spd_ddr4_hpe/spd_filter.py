@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Фильтр модулей по выражению над сырыми байтами SPD (до декодирования)
+
+Выражение - условия "поле оп значение", связанные and / or (and сильнее):
+
+    part_number=M393A8G40CB4-CWE and module_type=RDIMM and mfg_year>=2021
+    dram_mfg_id=Micron or dram_mfg_id=Hynix
+    part_number=M393A8G* and register_rev!=0xB1 and memory_type=DDR4
+
+Поля - имена spd_layout.FIELDS (для DDR5 - spd_ddr5.FIELDS) и сокращения
+module_type (RDIMM/UDIMM/...) и memory_type (DDR4/DDR5). Операции
+= != < <= > >=; у строк '*' в конце значения - префикс; у *_mfg_id
+значение может быть именем производителя (подстрока, как в spd_db).
+
+Каждое условие компилируется в чтение своих байт образа (смещение, mask,
+shift) и сравнение со значением, уже переведённым в единицы поля:
+- Predicate(data) - проверка одного образа, читаются только байты условий
+  (байт 2 - выбор карты DDR4 / DDR5);
+- Predicate.mask(arr) - то же по столбцам партии (N, L) через numpy;
+- select() - отбор источников: порции читаются только на span байт
+  (load_batch), полный анализ получают лишь подошедшие модули.
+"""
+
+import operator
+import re
+import sys
+
+import numpy as np
+
+OPS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+_CLAUSE = re.compile(r'\s*([A-Za-z_][A-Za-z0-9_]*)\s*(==|!=|<=|>=|=|<|>)\s*(.+?)\s*$')
+_SPLIT_OR = re.compile(r'\s+or\s+', re.IGNORECASE)
+_SPLIT_AND = re.compile(r'\s+and\s+', re.IGNORECASE)
+
+MEMORY_TYPES = {'DDR4': 0x0C, 'DDR5': 0x12}
+
+def _layouts():
+    """Карты полей по байту 2: (имя -> Field, сокращения)"""
+    from analyze_hpe_spd import MODULE_TYPES as DDR4_MODULE_TYPES
+    from spd_ddr5 import DDR5_TYPE
+    from spd_ddr5 import FIELDS as DDR5_FIELDS
+    from spd_ddr5 import MODULE_TYPES as DDR5_MODULE_TYPES
+    from spd_layout import FIELDS, Field
+
+    def layout(fields, module_types):
+        by_name = {f.name: f for f in fields}
+        by_name['module_type'] = Field('module_type', 3, mask=0x0F)
+        by_name['memory_type'] = by_name['dram_type']._replace(name='memory_type')
+        names = {'module_type': {v.upper(): k for k, v in module_types.items()},
+                 'memory_type': MEMORY_TYPES}
+        return by_name, names
+
+    # Год и неделя в BCD переводятся самими картами полей (Field.bcd)
+    return {
+        None: layout(FIELDS, DDR4_MODULE_TYPES),
+        DDR5_TYPE: layout(DDR5_FIELDS, DDR5_MODULE_TYPES),
+    }
+
+class Clause:
+    """Одно условие, скомпилированное для одной карты полей"""
+
+    def __init__(self, field, op, value, names):
+        from spd_layout import compile_fields
+
+        self.field = field
+        self.op = op
+        self.end = field.offset + field.width
+        if field.msb is not None:
+            self.end = max(self.end, field.msb[0] + 1)
+        self._decode = compile_fields((field,))[0]
+        self.prefix = None
+        self.values = None
+
+        if field.kind != 'int':
+            if value.endswith('*'):
+                if op not in ('=', '==', '!='):
+                    raise ValueError(f"{field.name}: префикс '*' только с = и !=")
+                self.prefix = value[:-1]
+            self.value = value
+            return
+
+        mapping = names.get(field.name)
+        if mapping is not None and value.upper() in mapping:
+            self.value = mapping[value.upper()]
+        else:
+            try:
+                self.value = int(value, 0)
+            except ValueError:
+                if not field.name.endswith('_mfg_id') or op not in ('=', '==', '!='):
+                    raise ValueError(f"{field.name}: ожидается число, получено '{value}'") from None
+                from spd_db import manufacturer_ids
+                self.values = manufacturer_ids(value)
+                self.value = None
+
+    def _test(self, value):
+        if self.values is not None:
+            found = value in self.values
+            return found if self.op != '!=' else not found
+        if self.prefix is not None:
+            found = value.startswith(self.prefix)
+            return found if self.op != '!=' else not found
+        return OPS[self.op](value, self.value)
+
+    def __call__(self, data):
+        return self._test(self._decode(data)[self.field.name])
+
+    def mask(self, arr):
+        """Вектор bool (N,) по строкам arr"""
+        from spd_numpy import column
+
+        col = column(arr, self.field)
+        if self.field.kind != 'int':
+            col = np.char.strip(col)
+            if self.prefix is not None:
+                found = np.char.startswith(col, self.prefix.encode('ascii'))
+                return found if self.op != '!=' else ~found
+            return OPS[self.op](col, self.value.encode('ascii'))
+        if self.values is not None:
+            found = np.isin(col, self.values)
+            return found if self.op != '!=' else ~found
+        return OPS[self.op](col, self.value)
+
+class Predicate:
+    """Скомпилированное выражение фильтра (ИЛИ групп И условий)"""
+
+    def __init__(self, expr):
+        self.expr = expr
+        terms = []
+        for text in _SPLIT_OR.split(expr.strip()):
+            clauses = []
+            for part in _SPLIT_AND.split(text):
+                m = _CLAUSE.match(part)
+                if m is None:
+                    raise ValueError(f"не разобрано условие: '{part}'")
+                clauses.append(m.groups())
+            terms.append(clauses)
+
+        # Для каждой карты полей - свои смещения; поле, которого нет в карте, ложно
+        layouts = _layouts()
+        self._plans = {}
+        for generation, (by_name, names) in layouts.items():
+            plan = []
+            for clauses in terms:
+                term = []
+                for name, op, value in clauses:
+                    field = by_name.get(name)
+                    if field is None:
+                        if not any(name in layout[0] for layout in layouts.values()):
+                            raise ValueError(f"неизвестное поле: {name}")
+                        term = None
+                        break
+                    term.append(Clause(field, op, value.strip('"\''), names))
+                if term is not None:
+                    # Дешёвые условия (целые, ранние байты) - первыми
+                    term.sort(key=lambda c: (c.field.kind != 'int', c.end))
+                    plan.append(term)
+            self._plans[generation] = plan
+        # Сколько байт образа нужно прочитать для проверки
+        self.span = max([3] + [c.end for plan in self._plans.values()
+                               for term in plan for c in term])
+
+    def __call__(self, data):
+        """Проверка одного образа (bytes / memoryview), без полного разбора"""
+        if len(data) < self.span:
+            data = bytes(data).ljust(self.span, b'\0')
+        plan = self._plans.get(data[2], self._plans[None])
+        return any(all(clause(data) for clause in term) for term in plan)
+
+    def mask(self, arr):
+        """Вектор bool (N,) для партии (N, L >= span) uint8"""
+        arr = np.asarray(arr, dtype=np.uint8)
+        out = np.zeros(len(arr), dtype=bool)
+        generation = arr[:, 2]
+        for key, plan in self._plans.items():
+            if key is None:
+                rows = ~np.isin(generation, [k for k in self._plans if k is not None])
+            else:
+                rows = generation == key
+            if not rows.any() or not plan:
+                continue
+            sub = arr[rows]
+            hit = np.zeros(len(sub), dtype=bool)
+            for term in plan:
+                keep = ~hit
+                for clause in term:
+                    if not keep.any():
+                        break
+                    keep &= clause.mask(sub)
+                hit |= keep
+            out[rows] = hit
+        return out
+
+def select(sources, predicate, chunk_size=65536):
+    """Источники (.bin или PackRecord), подходящие под predicate, в исходном порядке
+
+    Из файлов читаются только первые predicate.span байт.
+    """
+    from spd_batch import chunked
+    from spd_numpy import load_batch
+
+    for chunk in chunked(sources, chunk_size):
+        arr = load_batch(chunk, predicate.span)
+        for i in np.flatnonzero(predicate.mask(arr)):
+            yield chunk[i]
+
+def add_filter_args(parser):
+    """Общий аргумент --filter"""
+    parser.add_argument('--filter', metavar='EXPR',
+                        help="отбор модулей по сырым байтам до анализа, например "
+                             "\"part_number=M393A8G40CB4-CWE and module_type=RDIMM and "
+                             "mfg_year>=2021\"")
+
+def main():
+    """Главная функция: имена подходящих модулей"""
+    import argparse
+    import time
+    from spd_batch import collect_inputs, source_name
+
+    parser = argparse.ArgumentParser(description="Отбор SPD дампов по выражению над сырыми байтами")
+    parser.add_argument('expr', help="выражение фильтра")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack, архивы и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=65536, help="образов в одной порции")
+    parser.add_argument('--count', action='store_true', help="только число подошедших")
+    args = parser.parse_args()
+
+    try:
+        predicate = Predicate(args.expr)
+    except ValueError as e:
+        parser.error(str(e))
+    sources = collect_inputs(args.paths, args.recursive)
+    t0 = time.perf_counter()
+    found = 0
+    for src in select(sources, predicate, args.chunk_size):
+        found += 1
+        if not args.count:
+            print(source_name(src))
+    if args.count:
+        print(found)
+    print(f"🔎 Подошло {found} из {len(sources)} (прочитано {predicate.span} байт на образ, "
+          f"{time.perf_counter() - t0:.3f} с)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Быстрый hex dump образов SPD: одиночный, массовый, рядом и с подсветкой отличий
+
+Строка дампа собирается не побайтно: hex - один вызов bytes.hex(' ') на
+весь диапазон с нарезкой по 3 символа на байт, ASCII столбец - bytes.translate
+по заранее построенной таблице, подписи смещений кэшируются для каждого
+(префикс, диапазон, ширина). Формат строки прежний:
+
+    "  180: 48 50 45 ...                                      HPE..."
+
+write_dumps() пишет дампы партии прямо в буферизованный файл / stdout, так
+что полный дамп сотни тысяч модулей упирается в вывод, а не в форматирование.
+diff_dump() и side_by_side() показывают несколько модулей построчно или
+колонками, выделяя байты, отличающиеся от первого (эталонного) модуля.
+ascii_strings() - серии печатаемого ASCII (regex, без numpy).
+"""
+
+import re
+import sys
+from functools import lru_cache
+
+# Печатаемый ASCII - как есть, остальное - '.'
+ASCII_TABLE = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+# Серии печатаемого ASCII минимум из MIN_STRING символов
+MIN_STRING = 4
+ASCII_RUN = re.compile(rb'[\x20-\x7e]{%d,}' % MIN_STRING)
+
+# Ширина hex столбца (16 байт по 3 символа без последнего пробела; шире - без выравнивания)
+HEX_WIDTH = 48
+
+# ANSI: инверсия для отличающихся байт
+HIGHLIGHT = ('\x1b[7m', '\x1b[0m')
+
+_labels = {}
+
+def _line_labels(prefix, start, stop, step):
+    key = (prefix, start, stop, step)
+    labels = _labels.get(key)
+    if labels is None:
+        if len(_labels) > 256:
+            _labels.clear()
+        labels = _labels[key] = [f"{prefix}{i:03X}: " for i in range(start, stop, step)]
+    return labels
+
+def hex_bytes(data):
+    """Байты через пробел в верхнем регистре ('0C 12 A0')"""
+    return bytes(data).hex(' ').upper()
+
+@lru_cache(maxsize=None)
+def ascii_run(min_length=MIN_STRING):
+    """Скомпилированное выражение для серий печатаемого ASCII от min_length символов"""
+    if min_length == MIN_STRING:
+        return ASCII_RUN
+    return re.compile(rb'[\x20-\x7e]{%d,}' % min_length)
+
+def ascii_strings(data, min_length=MIN_STRING):
+    """(смещение, строка) серий печатаемого ASCII длиной не меньше min_length"""
+    return [(m.start(), m.group().decode('ascii')) for m in ascii_run(min_length).finditer(bytes(data))]
+
+def dump_lines(data, offset, length, line_prefix="", bytes_per_line=16):
+    """Строки hex dump диапазона [offset, offset + length)"""
+    end = min(offset + length, len(data))
+    if end <= offset:
+        return []
+    chunk = bytes(data[offset:end])
+    hexs = chunk.hex(' ').upper()
+    text = chunk.translate(ASCII_TABLE).decode('ascii')
+    step = bytes_per_line
+    labels = _line_labels(line_prefix, offset, end, step)
+    return [f"{label}{hexs[3 * j:3 * (j + step) - 1]:<{HEX_WIDTH}} {text[j:j + step]}"
+            for label, j in zip(labels, range(0, end - offset, step))]
+
+def hex_dump(data, offset, length, line_prefix="", bytes_per_line=16):
+    """Форматированный hex dump"""
+    return "\n".join(dump_lines(data, offset, length, line_prefix, bytes_per_line))
+
+def write_dumps(items, out=None, offset=0, length=None, line_prefix="  ", bytes_per_line=16):
+    """Дампы многих образов подряд: items - пары (имя, образ)
+
+    Каждый дамп - заголовок с именем и строки; вывод идёт кусками в out
+    (по умолчанию sys.stdout). Возвращает число образов.
+    """
+    out = out or sys.stdout
+    count = 0
+    for name, data in items:
+        size = len(data) - offset if length is None else length
+        out.write(f"# {name}\n")
+        out.write(hex_dump(data, offset, size, line_prefix, bytes_per_line))
+        out.write("\n\n")
+        count += 1
+    return count
+
+def _diff_rows(images, offset, end):
+    """Общая длина и маска отличий каждого байта от первого образа"""
+    import numpy as np
+
+    rows = [np.frombuffer(bytes(img[offset:end]), dtype=np.uint8) for img in images]
+    n = min(len(r) for r in rows)
+    arr = np.stack([r[:n] for r in rows])
+    return n, arr != arr[0]
+
+def _mark_hex(hexs, diff, color):
+    """hex строки с выделением отличающихся байт
+
+    color - ANSI инверсия; иначе совпадающие с эталоном байты заменяются на '..'.
+    """
+    parts = hexs.split(' ')
+    if color:
+        on, off = HIGHLIGHT
+        return ' '.join(f"{on}{p}{off}" if d else p for p, d in zip(parts, diff))
+    return ' '.join(p if d else '..' for p, d in zip(parts, diff))
+
+def diff_dump(images, names, offset=0, length=None, bytes_per_line=16, only_diff=False,
+              color=False):
+    """Построчное сравнение: для каждой строки смещений - строка каждого модуля
+
+    Первый образ - эталон, у остальных выделены отличающиеся байты.
+    only_diff - пропускать строки, где все модули совпадают.
+    """
+    end = min(len(img) for img in images) if length is None else offset + length
+    n, mask = _diff_rows(images, offset, end)
+    width = max(len(name) for name in names)
+    step = bytes_per_line
+    hexs = [bytes(img[offset:offset + n]).hex(' ').upper() for img in images]
+    lines = []
+    for j in range(0, n, step):
+        line_diff = mask[:, j:j + step]
+        if only_diff and not line_diff.any():
+            continue
+        for k, name in enumerate(names):
+            h = hexs[k][3 * j:3 * (j + min(step, n - j)) - 1]
+            if k:
+                h = _mark_hex(h, line_diff[k], color)
+            lines.append(f"{offset + j:03X}  {name:<{width}}  {h}")
+        lines.append("")
+    return "\n".join(lines)
+
+def side_by_side(images, names, offset=0, length=None, bytes_per_line=8, only_diff=False,
+                 color=False):
+    """Модули колонками: одна строка смещений - hex всех модулей через ' | '"""
+    end = min(len(img) for img in images) if length is None else offset + length
+    n, mask = _diff_rows(images, offset, end)
+    step = bytes_per_line
+    col = 3 * step - 1
+    hexs = [bytes(img[offset:offset + n]).hex(' ').upper() for img in images]
+    lines = ["     " + " | ".join(f"{name[:col]:<{col}}" for name in names)]
+    for j in range(0, n, step):
+        line_diff = mask[:, j:j + step]
+        if only_diff and not line_diff.any():
+            continue
+        cells = []
+        for k in range(len(images)):
+            h = hexs[k][3 * j:3 * (j + min(step, n - j)) - 1]
+            pad = ' ' * (col - len(h))
+            cells.append((_mark_hex(h, line_diff[k], color) if k else h) + pad)
+        lines.append(f"{offset + j:03X}: " + " | ".join(cells))
+    return "\n".join(lines)
+
+def main():
+    """Главная функция"""
+    import argparse
+    import time
+    from spd_batch import collect_inputs, read_source, source_name
+
+    parser = argparse.ArgumentParser(description="Hex dump SPD образов: массовый, рядом, с отличиями")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack, архивы и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('--offset', type=lambda v: int(v, 0), default=0, help="начальное смещение")
+    parser.add_argument('--length', type=lambda v: int(v, 0), help="длина (по умолчанию до конца)")
+    parser.add_argument('-w', '--width', type=int, help="байт в строке (16, рядом - 8)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--diff', action='store_true',
+                      help="построчное сравнение модулей с первым")
+    mode.add_argument('--side-by-side', action='store_true', help="модули колонками")
+    parser.add_argument('--only-diff', action='store_true', help="только строки с отличиями")
+    parser.add_argument('--color', choices=('auto', 'always', 'never'), default='auto',
+                        help="подсветка отличий ANSI (иначе совпадающие байты - '..')")
+    parser.add_argument('-o', '--output', metavar='FILE', help="файл вывода (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    sources = collect_inputs(args.paths, args.recursive)
+    if not sources:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+
+    out = open(args.output, 'w', encoding='utf-8', buffering=1 << 20) if args.output else sys.stdout
+    color = args.color == 'always' or (args.color == 'auto' and out.isatty())
+    t0 = time.perf_counter()
+    try:
+        if args.diff or args.side_by_side:
+            images = [read_source(src) for src in sources]
+            names = [source_name(src) for src in sources]
+            render = diff_dump if args.diff else side_by_side
+            width = args.width or (16 if args.diff else 8)
+            out.write(render(images, names, args.offset, args.length, width, args.only_diff, color))
+            out.write("\n")
+            count = len(images)
+        else:
+            items = ((source_name(src), read_source(src)) for src in sources)
+            count = write_dumps(items, out, args.offset, args.length, "", args.width or 16)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ Модулей: {count} ({time.perf_counter() - t0:.2f} с)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Постоянный индекс инвентаризации модулей (SQLite) и запросы к нему
+
+Одна строка на модуль: источник (.bin или запись .spdpack / архива), part
+number, S/N, ID производителей модуля / DRAM / регистра, модель и ревизия
+регистра, год и неделя производства, скорость. Вторичные индексы SQLite по
+каждому полю запроса дают ответ за миллисекунды на миллионах модулей.
+
+Обновление инкрементальное, как в spd_cache: источники с теми же размером
+и mtime не перечитываются, изменённые и новые анализируются пакетно
+(spd_batch.run_batch, пул процессов) и вставляются одной транзакцией.
+Индекс, построенный другой версией схемы или декодера (например, до
+перевода даты DDR4 из BCD), при открытии очищается - следующий add
+переиндексирует все модули.
+
+    python spd_index.py add /data/lots -r -j 8
+    python spd_index.py query --register M88DR4RCD02 --year 2021 --week 30-40
+    python spd_index.py query --serial 0x4448ED0E
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import time
+
+DEFAULT_INDEX = 'spd_index.sqlite'
+
+# Увеличивать при изменении схемы или значений столбцов
+INDEX_VERSION = 2
+
+# Столбцы строки модуля (после source/size/mtime_ns)
+COLUMNS = ('filename', 'memory_type', 'module_type', 'part_number', 'serial', 'module_mfg_id',
+           'dram_mfg_id', 'register_mfg_id', 'register_model', 'register_rev', 'mfg_year',
+           'mfg_week', 'freq_mhz')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    source          TEXT PRIMARY KEY,
+    size            INTEGER NOT NULL,
+    mtime_ns        INTEGER NOT NULL,
+    filename        TEXT NOT NULL,
+    memory_type     TEXT,
+    module_type     TEXT,
+    part_number     TEXT,
+    serial          INTEGER,
+    module_mfg_id   INTEGER,
+    dram_mfg_id     INTEGER,
+    register_mfg_id INTEGER,
+    register_model  TEXT,
+    register_rev    INTEGER,
+    mfg_year        INTEGER,
+    mfg_week        INTEGER,
+    freq_mhz        INTEGER
+);
+CREATE INDEX IF NOT EXISTS modules_part_number ON modules (part_number);
+CREATE INDEX IF NOT EXISTS modules_serial ON modules (serial);
+CREATE INDEX IF NOT EXISTS modules_date ON modules (mfg_year, mfg_week);
+CREATE INDEX IF NOT EXISTS modules_module_mfg ON modules (module_mfg_id);
+CREATE INDEX IF NOT EXISTS modules_dram_mfg ON modules (dram_mfg_id);
+CREATE INDEX IF NOT EXISTS modules_register ON modules (register_model, register_rev);
+CREATE INDEX IF NOT EXISTS modules_register_mfg ON modules (register_mfg_id);
+CREATE INDEX IF NOT EXISTS modules_freq ON modules (freq_mhz);
+CREATE INDEX IF NOT EXISTS modules_filename ON modules (filename);
+"""
+
+_META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def index_version():
+    """Версия индекса: номер схемы + версия декодера spd_cache"""
+    from spd_cache import decoder_version
+    return f"{INDEX_VERSION}/{decoder_version()}"
+
+_DATE = re.compile(r'Week (\d+), (\d+)')
+
+def index_values(results):
+    """Значения COLUMNS из результата analyze_spd (DDR4 или DDR5)"""
+    m = _DATE.match(results['mfg_date'])
+    week, year = (int(m.group(1)), int(m.group(2))) if m else (None, None)
+    return (results['filename'], results.get('memory_type', 'DDR4'), results['module_type'],
+            results['part_number'], int(results['serial_number'], 16), results['module_mfg_id'],
+            results['dram_mfg_id'], results.get('register_mfg_id'), results.get('register_model'),
+            results.get('register_rev'), year, week, results['freq_mhz'])
+
+class InventoryIndex:
+    """Индекс модулей: update() по источникам, query() по полям"""
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_META_SCHEMA)
+        self.version = index_version()
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        exists = self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                                  "AND name = 'modules'").fetchone() is not None
+        # Строки другой версии (схема, декодер; без версии - до её учёта) не годятся
+        # для запросов - индекс строится заново
+        self.rebuilt = exists and (row is None or row[0] != self.version)
+        with self._db:
+            if self.rebuilt:
+                self._db.execute("DROP TABLE IF EXISTS modules")
+            self._db.executescript(_SCHEMA)
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM modules").fetchone()[0]
+
+    def update(self, sources, workers=1, chunk_size=None, log=None):
+        """Добавление новых и изменённых источников
+
+        Возвращает (добавлено/обновлено, без изменений, ошибок).
+        """
+        from spd_batch import DEFAULT_CHUNK_SIZE, run_batch
+        from spd_cache import source_key
+
+        known = dict(((row[0], (row[1], row[2])) for row in
+                      self._db.execute("SELECT source, size, mtime_ns FROM modules")))
+        stale = []
+        stats = {}
+        # Все записи контейнера защищены одним stat контейнера
+        for src in sources:
+            key, stat_path = source_key(src)
+            st = stats.get(stat_path)
+            if st is None:
+                try:
+                    st = stats[stat_path] = os.stat(stat_path)
+                except OSError:
+                    continue
+            meta = (st.st_size, st.st_mtime_ns)
+            if known.get(key) != meta:
+                stale.append((src, key, meta))
+
+        added = errors = 0
+        rows = []
+        stream = run_batch([src for src, _, _ in stale], workers,
+                           chunk_size=chunk_size or DEFAULT_CHUNK_SIZE)
+        with self._db:
+            for (src, key, meta), (name, results, _, error) in zip(stale, stream):
+                if error is not None:
+                    errors += 1
+                    if log is not None:
+                        print(f"❌ Ошибка при обработке {name}: {error}", file=log)
+                    continue
+                rows.append((key,) + meta + index_values(results))
+                if len(rows) >= 10000:
+                    added += self._insert(rows)
+                    rows = []
+            added += self._insert(rows)
+        return added, len(sources) - len(stale), errors
+
+    def _insert(self, rows):
+        placeholders = ', '.join('?' * (3 + len(COLUMNS)))
+        self._db.executemany(f"INSERT OR REPLACE INTO modules VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def prune(self):
+        """Удаление модулей, чьи файлы / контейнеры больше не существуют"""
+        removed = 0
+        with self._db:
+            paths = {}
+            for (source,) in self._db.execute("SELECT source FROM modules").fetchall():
+                path = source if '#' not in source else source.rsplit('#', 1)[0]
+                if path not in paths:
+                    paths[path] = os.path.exists(path)
+                if not paths[path]:
+                    removed += self._db.execute("DELETE FROM modules WHERE source = ?",
+                                                (source,)).rowcount
+        return removed
+
+    def query(self, where=(), params=(), limit=None):
+        """Строки модулей (словари) по условиям where (SQL, объединяются AND)"""
+        sql = f"SELECT source, {', '.join(COLUMNS)} FROM modules"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        cursor = self._db.execute(sql, list(params))
+        names = [d[0] for d in cursor.description]
+        for row in cursor:
+            yield dict(zip(names, row))
+
+    def count(self, where=(), params=()):
+        sql = "SELECT COUNT(*) FROM modules"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._db.execute(sql, list(params)).fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            # Статистика для планировщика (выбор индекса при нескольких условиях)
+            self._db.execute("PRAGMA optimize")
+            self._db.close()
+            self._db = None
+
+# --- Условия запроса ---
+
+def parse_range(text, base=10):
+    """'30' -> (30, 30), '30-40' -> (30, 40)"""
+    lo, _, hi = text.partition('-')
+    return int(lo, base), int(hi or lo, base)
+
+def parse_hex(text):
+    return int(text, 16)
+
+def build_where(args):
+    """Условия SQL и параметры из аргументов query"""
+    from spd_db import manufacturer_ids
+
+    where, params = [], []
+
+    def ids_in(column, ids):
+        where.append(f"{column} IN ({', '.join('?' * len(ids))})" if ids else "0")
+        params.extend(ids)
+
+    if args.pn:
+        # GLOB с литеральным префиксом использует индекс
+        where.append("part_number GLOB ?")
+        params.append(f"{args.pn.upper()}*")
+    if args.serial:
+        ids_in('serial', [parse_hex(s) for s in args.serial])
+    if args.module_mfg:
+        ids_in('module_mfg_id', manufacturer_ids(args.module_mfg))
+    if args.dram_mfg:
+        ids_in('dram_mfg_id', manufacturer_ids(args.dram_mfg))
+    if args.register_mfg:
+        ids_in('register_mfg_id', manufacturer_ids(args.register_mfg))
+    if args.register:
+        where.append("register_model GLOB ?")
+        params.append(f"{args.register.upper()}*")
+    if args.register_rev:
+        where.append("register_rev BETWEEN ? AND ?")
+        params.extend(parse_range(args.register_rev, 16))
+    if args.year:
+        where.append("mfg_year BETWEEN ? AND ?")
+        params.extend(parse_range(args.year))
+    if args.week:
+        where.append("mfg_week BETWEEN ? AND ?")
+        params.extend(parse_range(args.week))
+    if args.speed:
+        where.append("freq_mhz BETWEEN ? AND ?")
+        params.extend(parse_range(args.speed))
+    if args.type:
+        where.append("memory_type = ?")
+        params.append(args.type.upper())
+    if args.file:
+        where.append("filename GLOB ?")
+        params.append(args.file)
+    return where, params
+
+def format_row(row):
+    reg = f"{row['register_model'] or '-'} rev 0x{row['register_rev']:02X}" \
+        if row['register_rev'] is not None else '-'
+    date = f"{row['mfg_year']}-W{row['mfg_week']:02d}" if row['mfg_year'] is not None else '-'
+    return (f"{row['part_number']:<20} 0x{row['serial']:08X} {row['memory_type']}-{row['freq_mhz']} "
+            f"{date:<8} {reg:<22} {row['source']}")
+
+def main():
+    """Главная функция"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Индекс инвентаризации SPD модулей (SQLite)")
+    parser.add_argument('--index', default=DEFAULT_INDEX, metavar='FILE',
+                        help=f"файл индекса (по умолчанию {DEFAULT_INDEX})")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_add = sub.add_parser('add', help="добавить / обновить модули из файлов, контейнеров, архивов")
+    p_add.add_argument('paths', nargs='+')
+    p_add.add_argument('-r', '--recursive', action='store_true')
+    p_add.add_argument('-j', '--workers', type=int, default=1,
+                       help="число рабочих процессов (0 = все ядра)")
+    p_add.add_argument('--prune', action='store_true',
+                       help="удалить модули, чьих файлов больше нет")
+
+    p_query = sub.add_parser('query', help="поиск модулей")
+    p_query.add_argument('--pn', help="part number (префикс)")
+    p_query.add_argument('--serial', nargs='+', metavar='HEX', help="серийные номера (hex)")
+    p_query.add_argument('--module-mfg', metavar='NAME|ID', help="производитель модуля")
+    p_query.add_argument('--dram-mfg', metavar='NAME|ID', help="производитель DRAM")
+    p_query.add_argument('--register-mfg', metavar='NAME|ID', help="производитель регистра")
+    p_query.add_argument('--register', metavar='MODEL', help="модель регистра (префикс)")
+    p_query.add_argument('--register-rev', metavar='HEX[-HEX]', help="ревизия регистра")
+    p_query.add_argument('--year', metavar='Y[-Y]', help="год производства")
+    p_query.add_argument('--week', metavar='W[-W]', help="неделя производства")
+    p_query.add_argument('--speed', metavar='MT[-MT]', help="скорость, MT/s")
+    p_query.add_argument('--type', choices=('DDR4', 'DDR5', 'ddr4', 'ddr5'), help="поколение")
+    p_query.add_argument('--file', metavar='GLOB', help="имя файла (шаблон GLOB)")
+    p_query.add_argument('--limit', type=int, help="не более N строк")
+    p_query.add_argument('--count', action='store_true', help="только число модулей")
+    p_query.add_argument('--json', action='store_true', help="вывод JSON Lines")
+    args = parser.parse_args()
+
+    with InventoryIndex(args.index) as index:
+        if index.rebuilt:
+            print(f"⚠️  Индекс {args.index} построен другой версией декодера - очищен, "
+                  f"выполните add заново", file=sys.stderr)
+        if args.command == 'add':
+            from spd_batch import collect_inputs
+
+            t0 = time.perf_counter()
+            sources = collect_inputs(args.paths, args.recursive)
+            added, unchanged, errors = index.update(sources, args.workers, log=sys.stderr)
+            removed = index.prune() if args.prune else 0
+            print(f"✅ Индекс {args.index}: добавлено/обновлено {added}, без изменений {unchanged}, "
+                  f"ошибок {errors}, удалено {removed}; всего {len(index)} "
+                  f"({time.perf_counter() - t0:.2f} с)")
+            return
+
+        where, params = build_where(args)
+        t0 = time.perf_counter()
+        if args.count:
+            print(index.count(where, params))
+        else:
+            found = 0
+            for row in index.query(where, params, args.limit):
+                print(json.dumps(row, ensure_ascii=False) if args.json else format_row(row))
+                found += 1
+            print(f"🔎 Найдено: {found} ({1000 * (time.perf_counter() - t0):.1f} мс)",
+                  file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
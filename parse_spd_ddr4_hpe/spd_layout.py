@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Декларативная карта полей DDR4 SPD и скомпилированные декодеры
+
+Единственное место, где описаны смещения полей. При импорте таблица FIELDS
+компилируется в struct.Struct распаковщики и планы mask/shift, так что
+decode_image() разбирает весь образ одним проходом, а read_field() - одно
+поле без разбора остальных.
+"""
+
+import struct
+from bisect import bisect_right
+from typing import NamedTuple, Optional, Tuple
+
+SPD_SIZE = 512
+# Ключевой байт 2 (тип DRAM) образов DDR4
+DDR4_TYPE = 0x0C
+
+class Field(NamedTuple):
+    """Описание поля SPD
+
+    offset/width/endian - сырое чтение ('<' или '>'; для width=1 не важно).
+    kind: 'int' - целое, 'str' - ASCII строка, 'raw' - байты.
+    Для 'int': value = ((raw & mask) >> shift) [| старшие биты из msb] + add, затем * scale.
+    msb - (offset, mask, shift): старшие биты из другого байта, ставятся над width*8 битами.
+    bcd - значение в двоично-десятичном виде (0x23 -> 23), переводится до add.
+    """
+    name: str
+    offset: int
+    width: int = 1
+    endian: str = '<'
+    kind: str = 'int'
+    mask: Optional[int] = None
+    shift: int = 0
+    add: int = 0
+    scale: Optional[float] = None
+    msb: Optional[Tuple[int, int, int]] = None
+    bcd: bool = False
+
+MTB_NS = 0.125  # Medium Timebase = 125ps для DDR4 (точный пересчёт - spd_timing)
+
+FIELDS = (
+    # Базовая конфигурация (0-127)
+    Field('spd_bytes_used', 0),
+    Field('spd_revision', 1),
+    Field('dram_type', 2),
+    Field('module_type_code', 3),
+    Field('density_code', 4, mask=0x0F),
+    Field('banks_code', 4, mask=0x30, shift=4),
+    Field('row_addr', 5, mask=0x07, add=12),
+    Field('col_addr', 5, mask=0x38, shift=3, add=9),
+    Field('width_code', 12, mask=0x07),
+    Field('ranks', 12, mask=0x38, shift=3, add=1),
+    # Тайминги - целые числа MTB; поправки FTB (знаковые, в пс) - байты 117-125
+    Field('tck_min', 18),
+    Field('tck_max', 19),
+    Field('cas_mask', 20, 4, '<'),
+    Field('taa_min', 24),
+    Field('trcd_min', 25),
+    Field('trp_min', 26),
+    Field('tras_min', 28, msb=(27, 0x0F, 0)),
+    Field('trc_min', 29, msb=(27, 0xF0, 4)),
+    Field('trfc1_min', 30, 2, '<'),
+    Field('trfc2_min', 32, 2, '<'),
+    Field('trfc4_min', 34, 2, '<'),
+    Field('tfaw_min', 37, msb=(36, 0x0F, 0)),
+    Field('trrd_s_min', 38),
+    Field('trrd_l_min', 39),
+    Field('tccd_l_min', 40),
+    Field('twr_min', 42, msb=(41, 0x0F, 0)),
+    Field('twtr_s_min', 44, msb=(43, 0x0F, 0)),
+    Field('twtr_l_min', 45, msb=(43, 0xF0, 4)),
+    Field('tccd_l_ftb', 117),
+    Field('trrd_l_ftb', 118),
+    Field('trrd_s_ftb', 119),
+    Field('trc_ftb', 120),
+    Field('trp_ftb', 121),
+    Field('trcd_ftb', 122),
+    Field('taa_ftb', 123),
+    Field('tck_max_ftb', 124),
+    Field('tck_min_ftb', 125),
+    Field('crc_page0', 126, 2, '<'),
+    # Параметры модуля (128-255), RDIMM
+    Field('register_mfg_id', 133, 2, '>'),
+    Field('register_rev', 135),
+    Field('crc_page1', 254, 2, '<'),
+    # Производственные данные (320-383)
+    Field('module_mfg_id', 320, 2, '>'),
+    Field('mfg_location', 322),
+    Field('mfg_year', 323, add=2000, bcd=True),
+    Field('mfg_week', 324, bcd=True),
+    Field('serial_number', 325, 4, '>'),
+    Field('part_number', 329, 20, kind='str'),
+    Field('module_revision', 349),
+    Field('dram_mfg_id', 350, 2, '>'),
+    Field('dram_stepping', 352),
+    Field('crc_mfg', 382, 2, '<'),
+    # HPE vendor область (384-415)
+    Field('hpe_header', 384, 4, kind='raw'),
+    Field('hpe_secure_id', 388, 4, '<'),
+    Field('hpe_product_code', 400, 11, kind='str'),
+)
+
+FIELD_BY_NAME = {f.name: f for f in FIELDS}
+
+# Разбиение образа на регионы (непрерывно, без пропусков): имя, начало, размер
+REGIONS = (
+    ("Base Config", 0, 128),
+    ("Module Params", 128, 128),
+    ("Reserved", 256, 64),
+    ("Module Mfg ID", 320, 2),
+    ("Location", 322, 1),
+    ("Mfg Date", 323, 2),
+    ("Serial Number", 325, 4),
+    ("Part Number", 329, 20),
+    ("Revision", 349, 1),
+    ("DRAM Mfg ID", 350, 2),
+    ("DRAM Stepping", 352, 1),
+    ("Manuf Data", 353, 29),
+    ("CRC", 382, 2),
+    ("HPE Header", 384, 4),
+    ("HPE Secure ID", 388, 4),
+    ("HPE Reserved", 392, 8),
+    ("HPE Product Code", 400, 16),
+    ("Extended", 416, 96),
+)
+
+# Крупные блоки для сводных отчётов
+BLOCKS = (
+    ("Base Config (0-127)", 0, 128),
+    ("Module Params (128-255)", 128, 128),
+    ("Reserved (256-319)", 256, 64),
+    ("Manufacturing (320-383)", 320, 64),
+    ("HPE Secure Code (384-415)", 384, 32),
+    ("Extended (416-511)", 416, 96),
+)
+
+# Именованные области vendor части
+AREAS = {
+    'manufacturing': (320, 384),
+    'hpe_secure': (384, 416),
+    'hpe_smart': (416, 480),
+    'vendor': (384, 512),
+}
+
+_REGION_STARTS = [start for _, start, _ in REGIONS]
+
+def region_name(offset):
+    """Имя региона для смещения (бинарный поиск по REGIONS)"""
+    i = bisect_right(_REGION_STARTS, offset) - 1
+    if i < 0:
+        return REGIONS[0][0]
+    name, start, size = REGIONS[i]
+    return name if offset < start + size else "Out of range"
+
+# --- Компиляция таблицы ---
+
+_INT_CODES = {1: 'B', 2: 'H', 4: 'I'}
+
+def bcd(value):
+    """Двоично-десятичное значение байта (0x23 -> 23); работает и для массивов numpy"""
+    return (value >> 4) * 10 + (value & 0x0F)
+
+def _read_key(field):
+    """Ключ сырого чтения: одинаковые чтения разных полей объединяются"""
+    if field.kind != 'int':
+        return (field.offset, field.width, '<', 's')
+    endian = '<' if field.width == 1 else field.endian
+    return (field.offset, field.width, endian, _INT_CODES[field.width])
+
+def _compile_reads(keys):
+    """Раскладка сырых чтений по struct.Struct без перекрытий
+
+    Возвращает список (Struct, [индексы чтений]) - в каждом Struct чтения
+    одной endianness, упорядоченные по смещению, с 'x' между ними.
+    """
+    passes = []  # [endian, end, fmt_parts, indices]
+    for idx in sorted(range(len(keys)), key=lambda i: keys[i][0]):
+        offset, width, endian, code = keys[idx]
+        for p in passes:
+            if (p[0] == endian or code in ('s', 'B')) and p[1] <= offset:
+                break
+        else:
+            p = [endian, 0, [], []]
+            passes.append(p)
+        gap = offset - p[1]
+        if gap:
+            p[2].append(f"{gap}x")
+        p[2].append(f"{width}s" if code == 's' else code)
+        p[1] = offset + width
+        p[3].append(idx)
+    return [(struct.Struct(p[0] + ''.join(p[2])), p[3]) for p in passes]
+
+def _compile(fields):
+    """Компиляция полей в (распаковщики, план)
+
+    План - кортеж (name, read_idx, kind, mask, shift, msb_idx, msb_mask,
+    msb_shift, msb_pos, bcd, add, scale) для каждого поля.
+    """
+    keys = []
+    key_index = {}
+
+    def read_index(key):
+        if key not in key_index:
+            key_index[key] = len(keys)
+            keys.append(key)
+        return key_index[key]
+
+    plan = []
+    for f in fields:
+        idx = read_index(_read_key(f))
+        msb_idx = msb_mask = msb_shift = None
+        if f.msb is not None:
+            msb_idx = read_index((f.msb[0], 1, '<', 'B'))
+            msb_mask, msb_shift = f.msb[1], f.msb[2]
+        plan.append((f.name, idx, f.kind, f.mask, f.shift, msb_idx, msb_mask,
+                     msb_shift, f.width * 8, f.bcd, f.add, f.scale))
+
+    unpackers = _compile_reads(keys)
+    size = max(st.size for st, _ in unpackers)
+    return unpackers, tuple(plan), len(keys), size
+
+def _apply(plan, raws):
+    name, idx, kind, mask, shift, msb_idx, msb_mask, msb_shift, msb_pos, is_bcd, add, scale = plan
+    raw = raws[idx]
+    if kind == 'str':
+        return raw.decode('ascii', errors='ignore').strip()
+    if kind == 'raw':
+        return raw
+    if mask is not None:
+        raw = (raw & mask) >> shift
+    if msb_idx is not None:
+        raw |= ((raws[msb_idx] & msb_mask) >> msb_shift) << msb_pos
+    if is_bcd:
+        raw = bcd(raw)
+    raw += add
+    return raw * scale if scale is not None else raw
+
+def _run(unpackers, n_reads, data, base=0):
+    raws = [None] * n_reads
+    for st, indices in unpackers:
+        for i, v in zip(indices, st.unpack_from(data, base)):
+            raws[i] = v
+    return raws
+
+_IMAGE_UNPACKERS, _IMAGE_PLAN, _IMAGE_READS, IMAGE_SPAN = _compile(FIELDS)
+
+# Для ленивого чтения каждое поле компилируется отдельно
+_FIELD_PLANS = {f.name: _compile((f,)) for f in FIELDS}
+
+def decode_image(data):
+    """Декодирование всех полей FIELDS из образа одним проходом"""
+    raws = _run(_IMAGE_UNPACKERS, _IMAGE_READS, data)
+    return {p[0]: _apply(p, raws) for p in _IMAGE_PLAN}
+
+def read_field(data, name):
+    """Декодирование одного поля без разбора остального образа"""
+    unpackers, plan, n_reads, _ = _FIELD_PLANS[name]
+    return _apply(plan[0], _run(unpackers, n_reads, data))
+
+def read_fields(data, names):
+    """Декодирование нескольких полей по имени"""
+    return {name: read_field(data, name) for name in names}
+
+def compile_fields(fields):
+    """Декодер для другой таблицы полей (DDR5, профили XMP/EXPO)
+
+    Возвращает (decode, span): decode(data, base=0) разбирает все поля
+    таблицы, смещения которой отсчитываются от base, прямо из data
+    (bytes, memoryview, mmap) без срезов; span - охват таблицы в байтах.
+    """
+    unpackers, plan, n_reads, span = _compile(fields)
+
+    def decode(data, base=0):
+        raws = _run(unpackers, n_reads, data, base)
+        return {p[0]: _apply(p, raws) for p in plan}
+    return decode, span
+
+def field_slice(name):
+    """Срез байтов поля в образе"""
+    f = FIELD_BY_NAME[name]
+    return slice(f.offset, f.offset + f.width)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Векторизованный декодер DDR4 SPD для массивов дампов (N, 512)"""
+
+import time
+
+import numpy as np
+
+from spd_layout import FIELDS, SPD_SIZE, bcd
+from spd_timing import (CYCLE_COLUMNS, PARAM_NAMES, SPEED_BINS, cycle_table_batch,
+                        cycles_batch, speed_grade_batch, timings_ps_batch)
+from spd_timing import cas_latencies as _cas_latencies
+
+# Поля analyze_spd в сыром (целочисленном) виде; форматирование - при выводе
+SPD_DTYPE = np.dtype([
+    ('spd_bytes_used', 'u1'),
+    ('spd_revision', 'u1'),
+    ('dram_type', 'u1'),
+    ('module_type_code', 'u1'),
+    ('density_code', 'u1'),
+    ('banks_code', 'u1'),
+    ('row_addr', 'u1'),
+    ('col_addr', 'u1'),
+    ('width_code', 'u1'),
+    ('ranks', 'u1'),
+    ('freq_mhz', 'u2'),
+    ('cas_mask', 'u4'),
+] + [(f'{name}_ps', 'i4') for name in PARAM_NAMES] + [
+    ('timing_cycles', 'u2', (4,)),
+    ('cycle_table', 'u2', (len(SPEED_BINS), len(CYCLE_COLUMNS))),
+    ('module_mfg_id', 'u2'),
+    ('mfg_location', 'u1'),
+    ('mfg_year', 'u2'),
+    ('mfg_week', 'u1'),
+    ('serial_number', 'u4'),
+    ('part_number', 'S20'),
+    ('dram_mfg_id', 'u2'),
+    ('is_rdimm', '?'),
+    ('register_mfg_id', 'u2'),
+    ('register_rev', 'u1'),
+    ('crc_page0', 'u2'),
+    ('crc_page1', 'u2'),
+])
+
+def load_batch(paths, size=SPD_SIZE):
+    """Загрузка дампов в массив (N, size) uint8 без промежуточных bytes
+
+    paths - пути к .bin или PackRecord. Короткие образы дополняются нулями.
+    """
+    from spd_batch import PackRecord, read_source
+
+    arr = np.zeros((len(paths), size), dtype=np.uint8)
+    for i, path in enumerate(paths):
+        if isinstance(path, PackRecord):
+            data = read_source(path)[:size]
+            arr[i, :len(data)] = np.frombuffer(data, dtype=np.uint8)
+            continue
+        with open(path, 'rb') as f:
+            f.readinto(memoryview(arr[i]))
+    return arr
+
+def from_buffer(buf, stride=SPD_SIZE):
+    """Представление непрерывного буфера образов как (N, stride) без копирования"""
+    return np.frombuffer(buf, dtype=np.uint8).reshape(-1, stride)
+
+def column(arr, field):
+    """Векторное декодирование одного поля spd_layout.Field по всем строкам"""
+    cols = arr[:, field.offset:field.offset + field.width]
+    if field.kind != 'int':
+        return np.ascontiguousarray(cols).view(f'S{field.width}').ravel()
+    if field.width == 1:
+        raw = cols[:, 0].astype(np.uint32)
+    else:
+        code = {2: 'u2', 4: 'u4'}[field.width]
+        raw = np.ascontiguousarray(cols).view(field.endian + code).ravel().astype(np.uint32)
+    if field.mask is not None:
+        raw = (raw & field.mask) >> field.shift
+    if field.msb is not None:
+        offset, mask, shift = field.msb
+        raw = raw | (((arr[:, offset].astype(np.uint32) & mask) >> shift) << (field.width * 8))
+    if field.bcd:
+        raw = bcd(raw)
+    raw = raw + field.add
+    return raw * field.scale if field.scale is not None else raw
+
+def decode_batch(arr):
+    """Декодирование всех полей analyze_spd по столбцам за один проход
+
+    arr - массив (N, >=512) uint8. Поля и смещения берутся из spd_layout.FIELDS.
+    Возвращает структурированный массив SPD_DTYPE.
+    """
+    arr = np.asarray(arr, dtype=np.uint8)
+    if arr.ndim != 2 or arr.shape[1] < SPD_SIZE:
+        raise ValueError(f"ожидается массив (N, {SPD_SIZE}), получен {arr.shape}")
+
+    out = np.zeros(len(arr), dtype=SPD_DTYPE)
+    for field in FIELDS:
+        if field.name in SPD_DTYPE.names:
+            out[field.name] = column(arr, field)
+
+    # Производные значения: тайминги в пс и такты (spd_timing)
+    ps = timings_ps_batch(arr)
+    for name, value in ps.items():
+        out[f'{name}_ps'] = value
+    tck = ps['tck_min']
+    out['freq_mhz'] = speed_grade_batch(tck)
+    out['timing_cycles'] = cycles_batch(ps, out['cas_mask'], tck)[:, :4]
+    out['cycle_table'] = cycle_table_batch(ps, out['cas_mask'])
+
+    # Регистр (только RDIMM)
+    rdimm = (out['module_type_code'] & 0x0F) == 0x01
+    out['is_rdimm'] = rdimm
+    out['register_mfg_id'] = np.where(rdimm, out['register_mfg_id'], 0)
+    out['register_rev'] = np.where(rdimm, out['register_rev'], 0)
+
+    return out
+
+def cas_latencies(mask):
+    """Список поддерживаемых CL из битовой маски"""
+    return list(_cas_latencies(int(mask)))
+
+def to_results(rec, filename):
+    """Запись SPD_DTYPE как spd_record.SpdRecord (словарь формата analyze_spd)"""
+    from spd_record import SpdRecord
+    return SpdRecord.from_row(rec, filename)
+
+def main():
+    """Главная функция: декодирование партии и краткая сводка"""
+    import argparse
+    from spd_batch import collect_inputs
+    from spd_pack import SpdPack, is_pack
+
+    parser = argparse.ArgumentParser(description="Векторное декодирование партии SPD дампов")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if len(args.paths) == 1 and is_pack(args.paths[0]):
+        # Единственный контейнер - декодируем прямо из mmap без копирования
+        arr = SpdPack(args.paths[0]).array()
+    else:
+        files = collect_inputs(args.paths, args.recursive)
+        if not files:
+            print("❌ Не найдено .bin файлов")
+            return
+        arr = load_batch(files)
+    t1 = time.perf_counter()
+    table = decode_batch(arr)
+    t2 = time.perf_counter()
+
+    print(f"📁 Модулей: {len(table)}")
+    print(f"  Загрузка:      {t1 - t0:.3f} с")
+    print(f"  Декодирование: {t2 - t1:.3f} с")
+
+    pns, counts = np.unique(table['part_number'], return_counts=True)
+    print(f"\n📊 Part Numbers ({len(pns)}):")
+    for pn, count in zip(pns, counts):
+        print(f"  {bytes(pn).decode('ascii', errors='ignore').strip():<22} {count} шт.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Машиночитаемый вывод результатов анализа: JSON Lines, CSV, колоночный файл
+
+Запись идёт потоково из генератора результатов: в памяти держится только
+буфер вывода (и одна группа строк для колоночного формата).
+
+Колоночный формат (.spdcol, little-endian):
+  magic "SPDCOL1\\0", u32 длина схемы, схема JSON [[имя, тип], ...]
+  затем группы строк: u32 число строк, для каждого столбца u32 длина + данные
+  Типы: 'q' - int64, 'd' - float64, 's' - строки (u32 смещения + UTF-8)
+"""
+
+import csv
+import io
+import json
+import struct
+import sys
+from array import array
+
+FORMATS = ('text', 'jsonl', 'csv', 'columnar')
+
+# Столбцы результатов analyze_spd и их типы в колоночном формате
+COLUMNS = (
+    ('filename', 's'),
+    ('spd_bytes_used', 'q'),
+    ('spd_revision', 's'),
+    ('dram_type', 'q'),
+    ('memory_type', 's'),
+    ('module_type_code', 'q'),
+    ('module_type', 's'),
+    ('sdram_density', 's'),
+    ('sdram_banks', 's'),
+    ('row_addr', 'q'),
+    ('col_addr', 'q'),
+    ('device_width', 's'),
+    ('ranks', 'q'),
+    ('mtb', 'd'),
+    ('tck_min', 'd'),
+    ('tck_max', 'd'),
+    ('freq_mhz', 'q'),
+    ('cas_latencies', 's'),
+    ('taa_min', 'd'),
+    ('trcd_min', 'd'),
+    ('trp_min', 'd'),
+    ('tras_min', 'd'),
+    ('trc_min', 'd'),
+    ('timing_cycles', 's'),
+    ('module_mfg_id', 'q'),
+    ('module_mfg', 's'),
+    ('part_number', 's'),
+    ('serial_number', 's'),
+    ('mfg_date', 's'),
+    ('mfg_location', 'q'),
+    ('dram_mfg_id', 'q'),
+    ('dram_mfg', 's'),
+    ('register_mfg_id', 'q'),
+    ('register_mfg', 's'),
+    ('register_model', 's'),
+    ('register_rev', 'q'),
+    ('crc_page0', 's'),
+    ('crc_page1', 's'),
+    ('crc_page0_ok', 'q'),
+    ('crc_page1_ok', 'q'),
+    ('crc_base', 's'),
+    ('crc_base_ok', 'q'),
+    ('capacity_gb', 'd'),
+    ('profiles', 's'),
+)
+
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+# Значения для отсутствующих полей (например, регистр у не-RDIMM, CRC страниц у DDR5)
+_MISSING = {'q': -1, 'd': float('nan'), 's': ''}
+
+COLUMNAR_MAGIC = b'SPDCOL1\x00'
+ROW_GROUP_SIZE = 4096
+BUFFER_SIZE = 1 << 20
+
+def flat_value(results, name):
+    """Значение столбца в плоском виде (список CL - через пробел, такты - через '-')
+
+    Профили XMP/EXPO: "XMP1 5200 40-40-40-80-125 1.25V" через '; '.
+    """
+    value = results.get(name)
+    if name == 'cas_latencies' and value is not None:
+        return ' '.join(map(str, value))
+    if name == 'timing_cycles' and value is not None:
+        return '-'.join(map(str, value))
+    if name == 'profiles' and value is not None:
+        return '; '.join(f"{p['kind']}{p['index']} {p['freq_mhz']} "
+                         f"{'-'.join(map(str, p['timing_cycles']))} {p['vdd']:.2f}V" for p in value)
+    return value
+
+def write_jsonl(records, out):
+    """JSON Lines: один объект на строку"""
+    count = 0
+    for results in records:
+        out.write(json.dumps(dict(results), ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+def write_csv(records, out):
+    """CSV с фиксированным набором столбцов COLUMNS"""
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(COLUMN_NAMES)
+    count = 0
+    for results in records:
+        row = []
+        for name in COLUMN_NAMES:
+            value = flat_value(results, name)
+            row.append('' if value is None else value)
+        writer.writerow(row)
+        count += 1
+    return count
+
+def _encode_column(kind, values):
+    if kind == 's':
+        offsets = array('I', [0])
+        blob = io.BytesIO()
+        for v in values:
+            blob.write(v.encode('utf-8'))
+            offsets.append(blob.tell())
+        return offsets.tobytes() + blob.getvalue()
+    return array(kind, values).tobytes()
+
+def _write_group(out, group):
+    out.write(struct.pack('<I', len(group[0])))
+    for (_, kind), values in zip(COLUMNS, group):
+        payload = _encode_column(kind, values)
+        out.write(struct.pack('<I', len(payload)))
+        out.write(payload)
+
+def write_columnar(records, out, row_group_size=ROW_GROUP_SIZE):
+    """Колоночный бинарный формат группами по row_group_size строк"""
+    schema = json.dumps(COLUMNS).encode('utf-8')
+    out.write(COLUMNAR_MAGIC)
+    out.write(struct.pack('<I', len(schema)))
+    out.write(schema)
+
+    group = [[] for _ in COLUMNS]
+    count = 0
+    for results in records:
+        for (name, kind), column in zip(COLUMNS, group):
+            value = flat_value(results, name)
+            column.append(_MISSING[kind] if value is None else value)
+        count += 1
+        if len(group[0]) >= row_group_size:
+            _write_group(out, group)
+            group = [[] for _ in COLUMNS]
+    if group[0]:
+        _write_group(out, group)
+    return count
+
+def read_columnar(path):
+    """Чтение колоночного файла: генератор словарей {столбец: список} по группам"""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path}: не является колоночным файлом SPD")
+        schema_len, = struct.unpack('<I', f.read(4))
+        schema = json.loads(f.read(schema_len))
+        while True:
+            head = f.read(4)
+            if not head:
+                break
+            rows, = struct.unpack('<I', head)
+            group = {}
+            for name, kind in schema:
+                size, = struct.unpack('<I', f.read(4))
+                payload = f.read(size)
+                if kind == 's':
+                    offsets = array('I')
+                    offsets.frombytes(payload[:(rows + 1) * 4])
+                    blob = payload[(rows + 1) * 4:]
+                    group[name] = [blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                                   for i in range(rows)]
+                else:
+                    values = array(kind)
+                    values.frombytes(payload)
+                    group[name] = values.tolist()
+            yield group
+
+_WRITERS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'columnar': write_columnar,
+}
+
+def open_output(fmt, path=None):
+    """Буферизованный поток вывода для формата (stdout, если path не задан)"""
+    if fmt == 'columnar':
+        if path is None or path == '-':
+            return sys.stdout.buffer
+        return open(path, 'wb', buffering=BUFFER_SIZE)
+    if path is None or path == '-':
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8', newline='', buffering=BUFFER_SIZE)
+
+def write_records(records, fmt, path=None):
+    """Запись потока результатов в выбранном формате; возвращает число записей"""
+    out = open_output(fmt, path)
+    try:
+        return _WRITERS[fmt](records, out)
+    finally:
+        if out in (sys.stdout, sys.stdout.buffer):
+            out.flush()
+        else:
+            out.close()
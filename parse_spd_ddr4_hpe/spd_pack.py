@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Упакованный контейнер SPD дампов (.spdpack) с доступом через mmap
+
+Формат (little-endian):
+  0   Заголовок (64 байта): magic "SPDPACK\\0", версия, stride, count, смещение индекса
+  64  Записи фиксированного размера stride (512 для DDR4, 1024 при наличии DDR5)
+  ... Индекс: для каждой записи size (u32), generation (u8, байт 2 SPD),
+      длина имени (u16) и имя в UTF-8
+"""
+
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+MAGIC = b'SPDPACK\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIIQ')
+HEADER_SIZE = 64
+INDEX_ENTRY = struct.Struct('<IBH')
+PACK_SUFFIX = '.spdpack'
+
+def is_pack(path):
+    """Проверка, является ли файл контейнером .spdpack"""
+    path = str(path)
+    if path.lower().endswith(PACK_SUFFIX):
+        return True
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+class SpdPack:
+    """Контейнер .spdpack, отображённый в память только для чтения
+
+    record(i) возвращает memoryview на запись без копирования. Пока живы
+    такие представления, close() невозможен (ограничение mmap).
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Пустой файл нельзя отобразить
+            self._file.close()
+            raise ValueError(f"{self.path}: пустой файл")
+        magic, version, _, self.stride, count, index_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path}: не является контейнером .spdpack")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{self.path}: неподдерживаемая версия {version}")
+
+        self._view = memoryview(self._mm)
+        self.names = []
+        self.sizes = []
+        self.generations = []
+        pos = index_offset
+        for _ in range(count):
+            size, generation, name_len = INDEX_ENTRY.unpack_from(self._mm, pos)
+            pos += INDEX_ENTRY.size
+            self.names.append(bytes(self._view[pos:pos + name_len]).decode('utf-8'))
+            pos += name_len
+            self.sizes.append(size)
+            self.generations.append(generation)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.names[i], self.record(i)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, i):
+        """Запись i как memoryview (без копирования)"""
+        start = HEADER_SIZE + i * self.stride
+        return self._view[start:start + self.sizes[i]]
+
+    def array(self):
+        """Все записи как массив numpy (N, stride) без копирования"""
+        import numpy as np
+        return np.frombuffer(self._mm, dtype=np.uint8, count=len(self) * self.stride,
+                             offset=HEADER_SIZE).reshape(len(self), self.stride)
+
+    def close(self):
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+def pack_images(images, out_path, stride=512):
+    """Потоковая упаковка образов из памяти
+
+    images - итератор (name, data); записи длиннее stride и повторяющиеся
+    имена (при распаковке один файл затёр бы другой) не допускаются:
+    ValueError, недописанный контейнер удаляется. Возвращает число
+    записанных записей.
+    """
+    index = []
+    seen = set()
+    with open(out_path, 'wb') as out:
+        try:
+            out.write(b'\x00' * HEADER_SIZE)
+            for name, data in images:
+                if len(data) > stride:
+                    raise ValueError(f"{name}: {len(data)} байт больше stride {stride}")
+                if name in seen:
+                    raise ValueError(f"{name}: повторяющееся имя записи (одноимённые файлы "
+                                     f"из разных директорий или архивов)")
+                seen.add(name)
+                out.write(data)
+                out.write(b'\x00' * (stride - len(data)))
+                generation = data[2] if len(data) > 2 else 0
+                index.append((name, len(data), generation))
+        except BaseException:
+            out.close()
+            os.remove(out_path)
+            raise
+
+        index_offset = out.tell()
+        for name, size, generation in index:
+            raw = name.encode('utf-8')
+            out.write(INDEX_ENTRY.pack(size, generation, len(raw)))
+            out.write(raw)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, 0, stride, len(index), index_offset))
+    return len(index)
+
+def pack(sources, out_path, stride=None):
+    """Упаковка дампов в контейнер
+
+    sources - список (name, path). stride по умолчанию - наибольший размер
+    файла, округлённый до 512. Возвращает число записанных записей.
+    """
+    sizes = [os.path.getsize(path) for _, path in sources]
+    if stride is None:
+        stride = max([512] + [-(-s // 512) * 512 for s in sizes])
+
+    def read_all():
+        for (name, path), size in zip(sources, sizes):
+            with open(path, 'rb') as f:
+                yield name, f.read(size)
+
+    return pack_images(read_all(), out_path, stride)
+
+def pack_dirs(dirs, out_path, recursive=False, pattern='*.bin'):
+    """Упаковка .bin файлов из директорий и архивов zip/tar
+
+    Имена - пути относительно директории или внутри архива. Архивы читаются
+    потоково через переиспользуемый буфер (spd_archive.iter_images), без
+    распаковки на диск; stride в этом случае - 1024.
+    """
+    from spd_archive import STRIDE, is_archive, iter_images
+
+    sources = []
+    archives = []
+    for d in dirs:
+        d = Path(d)
+        if d.is_dir():
+            matches = d.rglob(pattern) if recursive else d.glob(pattern)
+            for f in sorted(m for m in matches if m.is_file()):
+                sources.append((f.relative_to(d).as_posix(), str(f)))
+        elif is_archive(d):
+            archives.append(str(d))
+        else:
+            sources.append((d.name, str(d)))
+    if not archives:
+        return pack(sources, out_path)
+
+    def images():
+        for name, path in sources:
+            with open(path, 'rb') as f:
+                yield name, f.read(STRIDE)
+        for archive in archives:
+            yield from iter_images(archive, pattern, STRIDE)
+
+    return pack_images(images(), out_path, STRIDE)
+
+def unpack(pack_path, out_dir):
+    """Распаковка контейнера обратно в отдельные .bin файлы
+
+    Контейнер с повторяющимися именами записей (упакованный старой версией)
+    не распаковывается - ValueError до записи первого файла.
+    """
+    out_dir = Path(out_dir)
+    count = 0
+    with SpdPack(pack_path) as p:
+        seen = set()
+        for name in p.names:
+            if name in seen:
+                raise ValueError(f"{name}: повторяющееся имя записи - файлы затёрли бы друг друга")
+            seen.add(name)
+        for name, data in p:
+            target = out_dir / name
+            # Защита от выхода за пределы out_dir
+            if Path(name).is_absolute() or '..' in Path(name).parts:
+                raise ValueError(f"недопустимое имя записи: {name}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            data.release()
+            count += 1
+    return count
+
+def main():
+    """Главная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Контейнер SPD дампов .spdpack")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_pack = sub.add_parser('pack', help="упаковать .bin файлы/директории/архивы zip и tar")
+    p_pack.add_argument('output')
+    p_pack.add_argument('inputs', nargs='+')
+    p_pack.add_argument('-r', '--recursive', action='store_true')
+
+    p_unpack = sub.add_parser('unpack', help="распаковать контейнер в директорию")
+    p_unpack.add_argument('pack')
+    p_unpack.add_argument('output_dir')
+
+    p_list = sub.add_parser('list', help="показать индекс контейнера")
+    p_list.add_argument('pack')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'pack':
+            count = pack_dirs(args.inputs, args.output, args.recursive)
+            print(f"✅ Упаковано записей: {count} → {args.output}")
+        elif args.command == 'unpack':
+            count = unpack(args.pack, args.output_dir)
+            print(f"✅ Распаковано файлов: {count} → {args.output_dir}")
+        else:
+            with SpdPack(args.pack) as p:
+                print(f"📦 {args.pack}: {len(p)} записей, stride {p.stride}")
+                for i, name in enumerate(p.names):
+                    print(f"  {i:6d}  0x{p.generations[i]:02X}  {p.sizes[i]:5d}  {name}")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Поиск ASCII строк и повторяющихся последовательностей байт по всей партии
+
+В отличие от "Поиска паттернов" analyze_hpe_secure (vendor область первых
+трёх файлов), здесь просматриваются образы целиком по всем модулям:
+- ASCII строки - одним проходом скомпилированного регулярного выражения по
+  буферу порции (строки образов разделены нулевым байтом);
+- n-граммы - полиномиальный хэш Рабина-Карпа каждого окна n байт, считается
+  сразу для всех окон порции (N, L) через numpy; ключ - (смещение, хэш).
+Счётчики показывают, какая последовательность стоит на каком смещении и у
+какой доли модулей; соседние окна с одинаковым счётчиком склеиваются в
+одну последовательность (заголовок "HPT\\0...", коды вида P030530A1).
+
+Окна из одного повторяющегося байта (заполнение 00 / FF) по умолчанию не
+считаются. Чтобы память не росла со случайными областями (S/N, Secure
+Code), в каждой порции отбрасываются ключи, встреченные не более
+epsilon * N раз (lossy counting): счётчики оставшихся занижены не более
+чем на PatternStats.error, а последовательности с долей выше epsilon не
+теряются.
+
+Модули делятся на группы по хэшу содержимого; сводка группы сохраняется в
+кэше (spd_cache.ContentCache) под ключом из хэшей её образов и параметров,
+поэтому повторный просмотр партии пересчитывает только изменившиеся группы.
+"""
+
+import hashlib
+import io
+import json
+import math
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from spd_hexdump import MIN_STRING, ascii_run
+from spd_layout import SPD_SIZE
+
+# Основание полиномиального хэша (по модулю 2**64) и перемешивание смещения в ключ
+HASH_BASE = np.uint64(0x100000001B3)
+OFFSET_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# Увеличивать при изменении подсчёта (сбрасывает кэш сводок)
+PATTERN_VERSION = 1
+
+def window_hashes(arr, n):
+    """Хэш каждого окна n байт по строкам arr: (N, L - n + 1) uint64"""
+    arr = np.asarray(arr, dtype=np.uint8)
+    width = arr.shape[1] - n + 1
+    h = np.zeros((len(arr), width), dtype=np.uint64)
+    for k in range(n):
+        h *= HASH_BASE
+        h += arr[:, k:k + width]
+    return h
+
+class PatternStats:
+    """Счётчики n-грамм по смещениям и ASCII строк части партии
+
+    Сводки частей с одинаковыми параметрами складываются merge().
+    """
+
+    def __init__(self, n=4, start=0, end=SPD_SIZE, min_string=MIN_STRING, epsilon=0.001,
+                 keep_fill=False):
+        self.n = n
+        self.start = start
+        self.end = end
+        self.min_string = min_string
+        self.epsilon = epsilon
+        self.keep_fill = keep_fill
+        self.count = 0
+        # Верхняя граница недосчёта любого ключа из-за отброшенных редких ключей
+        self.error = 0
+        # Ключи n-грамм (отсортированы) и для каждого - смещение, число модулей, байты
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.samples = np.zeros((0, n), dtype=np.uint8)
+        # (смещение, строка) -> число модулей
+        self.strings = Counter()
+
+    def __len__(self):
+        return self.count
+
+    def params(self):
+        return (self.n, self.start, self.end, self.min_string, self.epsilon, self.keep_fill)
+
+    def update(self, arr):
+        """Учёт порции образов (N, L), L >= end"""
+        cols = np.asarray(arr, dtype=np.uint8)[:, self.start:self.end]
+        rows, width = cols.shape
+        if not rows:
+            return self
+        limit = int(self.epsilon * rows)
+        self.count += rows
+        self.error += limit
+        self._update_strings(cols, limit)
+        if width < self.n:
+            return self
+
+        windows = np.lib.stride_tricks.sliding_window_view(cols, self.n, axis=1)
+        offsets = np.arange(self.start, self.end - self.n + 1, dtype=np.uint64)
+        keys = (window_hashes(cols, self.n) ^ (offsets * OFFSET_MIX)).ravel()
+        if self.keep_fill:
+            index = np.arange(keys.size)
+        else:
+            # Окно - заполнение, если каждый байт равен следующему
+            same = cols[:, 1:] == cols[:, :-1]
+            fill = same[:, :windows.shape[1]].copy()
+            for k in range(1, self.n - 1):
+                fill &= same[:, k:k + windows.shape[1]]
+            index = np.flatnonzero(~fill)
+            keys = keys[index]
+
+        # Счётчики по отсортированным ключам; редкие отбрасываются до поиска их байт
+        ordered = np.sort(keys)
+        starts = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+        counts = np.diff(np.append(starts, len(ordered)))
+        keep = counts > limit
+        kept, counts = ordered[starts[keep]], counts[keep]
+        # Позиция одного вхождения каждого оставленного ключа - для байт и смещения
+        slot = np.minimum(np.searchsorted(kept, keys), len(kept) - 1)
+        hit = np.flatnonzero(kept[slot] == keys) if len(kept) else np.zeros(0, dtype=np.intp)
+        first = np.zeros(len(kept), dtype=np.intp)
+        first[slot[hit[::-1]]] = index[hit[::-1]]
+        rows_at, cols_at = np.divmod(first, windows.shape[1])
+        self._add(kept, cols_at + self.start, counts, windows[rows_at, cols_at])
+        return self
+
+    def _update_strings(self, cols, limit):
+        # Один проход по буферу порции; нулевой столбец не даёт строке перейти в соседний образ
+        stride = cols.shape[1] + 1
+        buf = np.zeros((len(cols), stride), dtype=np.uint8)
+        buf[:, :-1] = cols
+        found = Counter((m.start() % stride + self.start, m.group().decode('ascii'))
+                        for m in ascii_run(self.min_string).finditer(buf.tobytes()))
+        self.strings.update({key: count for key, count in found.items() if count > limit})
+
+    def _add(self, keys, offsets, counts, samples):
+        keys = np.concatenate([self.keys, keys])
+        offsets = np.concatenate([self.offsets, offsets])
+        samples = np.concatenate([self.samples, samples])
+        self.keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        total = np.zeros(len(self.keys), dtype=np.int64)
+        np.add.at(total, inverse, np.concatenate([self.counts, counts]))
+        self.counts = total
+        self.offsets = offsets[first]
+        self.samples = samples[first]
+
+    def merge(self, other):
+        """Сложение со сводкой другой части (те же параметры)"""
+        if other.params() != self.params():
+            raise ValueError(f"разные параметры сводок: {self.params()} и {other.params()}")
+        self._add(other.keys, other.offsets, other.counts, other.samples)
+        self.strings.update(other.strings)
+        self.count += other.count
+        self.error += other.error
+        return self
+
+    __iadd__ = merge
+
+    def to_bytes(self):
+        meta = {'params': list(self.params()), 'count': self.count, 'error': self.error,
+                'strings': [[offset, text, count] for (offset, text), count in self.strings.items()]}
+        buf = io.BytesIO()
+        np.savez_compressed(buf, keys=self.keys, offsets=self.offsets, counts=self.counts,
+                            samples=self.samples,
+                            meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        with np.load(io.BytesIO(payload)) as f:
+            meta = json.loads(f['meta'].tobytes().decode('utf-8'))
+            stats = cls(*meta['params'])
+            stats.keys, stats.offsets = f['keys'], f['offsets']
+            stats.counts, stats.samples = f['counts'], f['samples']
+        stats.count = meta['count']
+        stats.error = meta['error']
+        stats.strings = Counter({(offset, text): count for offset, text, count in meta['strings']})
+        return stats
+
+    def min_count(self, min_share):
+        """Порог числа модулей для доли min_share (повтор - минимум в двух модулях)"""
+        return max(2, math.ceil(min_share * self.count))
+
+    def sequences(self, min_share=0.05):
+        """Повторяющиеся последовательности: [(bytes, [(смещение, модулей), ...]), ...]
+
+        Окна подряд (смещение + 1, перекрытие n - 1 байт) с одинаковым
+        счётчиком склеиваются. Сортировка - по наибольшей доле, затем по длине.
+        """
+        selected = np.flatnonzero(self.counts >= self.min_count(min_share))
+        selected = selected[np.argsort(self.offsets[selected], kind='stable')]
+        # (следующее смещение, перекрытие, счётчик) -> [смещение, байты, счётчик]
+        open_chains = {}
+        chains = []
+        for i in selected:
+            offset, count = int(self.offsets[i]), int(self.counts[i])
+            gram = self.samples[i].tobytes()
+            chain = open_chains.pop((offset, gram[:-1], count), None)
+            if chain is None:
+                chain = [offset, bytearray(gram), count]
+                chains.append(chain)
+            else:
+                chain[1].append(gram[-1])
+            open_chains[(offset + 1, gram[1:], count)] = chain
+
+        groups = {}
+        for offset, seq, count in chains:
+            groups.setdefault(bytes(seq), []).append((offset, count))
+        return sorted(groups.items(), key=lambda g: (-max(c for _, c in g[1]), -len(g[0]), g[1][0][0]))
+
+    def string_groups(self, min_share=0.05):
+        """ASCII строки: [(строка, [(смещение, модулей), ...]), ...] по убыванию доли"""
+        threshold = self.min_count(min_share)
+        groups = {}
+        for (offset, text), count in sorted(self.strings.items()):
+            if count >= threshold:
+                groups.setdefault(text, []).append((offset, count))
+        return sorted(groups.items(), key=lambda g: (-max(c for _, c in g[1]), -len(g[0])))
+
+    def to_dict(self, min_share=0.05, limit=20):
+        places = lambda items: [{'offset': o, 'modules': c, 'share': c / self.count} for o, c in items]
+        return {
+            'modules': self.count,
+            'ngram': self.n,
+            'range': [self.start, self.end],
+            'error': self.error,
+            'strings': [{'text': text, 'offsets': places(items)}
+                        for text, items in self.string_groups(min_share)[:limit]],
+            'sequences': [{'hex': seq.hex(), 'offsets': places(items)}
+                          for seq, items in self.sequences(min_share)[:limit]],
+        }
+
+    def print_report(self, min_share=0.05, limit=20):
+        from spd_hexdump import ASCII_TABLE, hex_bytes
+
+        def places(items):
+            return ", ".join(f"0x{o:03X}: {c} ({c / self.count * 100:.1f}%)" for o, c in items[:8]) + \
+                (f", ... ещё {len(items) - 8}" if len(items) > 8 else "")
+
+        print(f"\n{'='*80}")
+        print(f"🔤 ASCII СТРОКИ (от {self.min_string} символов, не реже {min_share * 100:g}% модулей)")
+        print(f"{'='*80}\n")
+        strings = self.string_groups(min_share)
+        if not strings:
+            print("ASCII строки не найдены")
+        for text, items in strings[:limit]:
+            print(f"  '{text}'")
+            print(f"      {places(items)}")
+        if len(strings) > limit:
+            print(f"  ... и еще {len(strings) - limit}")
+
+        print(f"\n{'='*80}")
+        print(f"🧬 ПОВТОРЯЮЩИЕСЯ ПОСЛЕДОВАТЕЛЬНОСТИ (окно {self.n} байт, "
+              f"не реже {min_share * 100:g}% модулей)")
+        print(f"{'='*80}\n")
+        sequences = self.sequences(min_share)
+        if not sequences:
+            print("Повторяющиеся последовательности не найдены")
+        for seq, items in sequences[:limit]:
+            shown = seq[:24]
+            more = f" ... ({len(seq)} байт)" if len(seq) > len(shown) else ""
+            print(f"  {hex_bytes(shown)}{more}  '{shown.translate(ASCII_TABLE).decode('ascii')}'")
+            print(f"      {places(items)}")
+        if len(sequences) > limit:
+            print(f"  ... и еще {len(sequences) - limit}")
+        if self.error:
+            print(f"\n⚠️  Счётчики могут быть занижены не более чем на {self.error} "
+                  f"(отброшены ключи с долей до {self.epsilon * 100:g}% в порции)")
+
+def group_key(digests, params):
+    """Ключ кэша сводки группы: параметры + отсортированные хэши образов"""
+    h = hashlib.blake2b(repr((PATTERN_VERSION,) + tuple(params)).encode(), digest_size=16)
+    for digest in sorted(digests):
+        h.update(bytes.fromhex(digest))
+    return f"patterns:{h.hexdigest()}"
+
+def mine(sources, cache=None, groups=64, chunk_size=65536, **params):
+    """Сводка PatternStats по источникам (.bin или PackRecord)
+
+    Модули распределяются по groups группам по хэшу содержимого; сводка
+    каждой группы берётся из cache (spd_cache.ContentCache) или считается
+    порциями по chunk_size и сохраняется в нём.
+    """
+    from spd_batch import chunked, read_source
+    from spd_cache import content_digest
+    from spd_numpy import load_batch
+
+    total = PatternStats(**params)
+    members = [[] for _ in range(max(1, groups))]
+    for src in sources:
+        digest = content_digest(read_source(src))
+        members[int(digest[:8], 16) % len(members)].append((digest, src))
+
+    for group in members:
+        if not group:
+            continue
+        key = group_key([digest for digest, _ in group], total.params())
+        payload = cache.get(key) if cache is not None else None
+        if payload is not None:
+            total.merge(PatternStats.from_bytes(payload))
+            continue
+        part = PatternStats(**params)
+        for chunk in chunked([src for _, src in group], chunk_size):
+            part.update(load_batch(chunk, part.end))
+        if cache is not None:
+            cache.put(key, part.to_bytes())
+        total.merge(part)
+    return total
+
+def main():
+    """Главная функция"""
+    import argparse
+    from spd_batch import collect_inputs
+    from spd_cache import add_cache_args
+
+    parser = argparse.ArgumentParser(description="ASCII строки и повторяющиеся последовательности "
+                                                 "байт по всей партии SPD")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack, архивы и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('-n', '--ngram', type=int, default=4, help="длина окна n-грамм")
+    parser.add_argument('--offset', type=lambda v: int(v, 0), default=0, help="начальное смещение")
+    parser.add_argument('--length', type=lambda v: int(v, 0),
+                        help=f"длина области (по умолчанию до {SPD_SIZE}; для DDR5 - 1024)")
+    parser.add_argument('--min-length', type=int, default=MIN_STRING, help="мин. длина ASCII строки")
+    parser.add_argument('--min-share', type=float, default=5.0,
+                        help="мин. доля модулей в отчёте, %% (по умолчанию 5)")
+    parser.add_argument('--epsilon', type=float, default=0.1,
+                        help="доля (%%), ниже которой ключи порции отбрасываются (по умолчанию 0.1)")
+    parser.add_argument('--keep-fill', action='store_true',
+                        help="учитывать окна из одного байта (00 00 00 00, FF FF FF FF)")
+    parser.add_argument('--groups', type=int, default=64, help="групп по хэшу содержимого (единица кэша)")
+    parser.add_argument('--chunk-size', type=int, default=65536, help="образов в одной порции")
+    parser.add_argument('--limit', type=int, default=20, help="строк в списках отчёта")
+    parser.add_argument('--json', action='store_true', help="вывод JSON")
+    add_cache_args(parser)
+    args = parser.parse_args()
+
+    if args.ngram < 2:
+        parser.error("--ngram: минимум 2")
+    end = SPD_SIZE if args.length is None else args.offset + args.length
+    sources = collect_inputs(args.paths, args.recursive)
+    if not sources:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+
+    cache = None
+    if args.cache:
+        from spd_cache import ContentCache
+        cache = ContentCache(args.cache)
+    t0 = time.perf_counter()
+    try:
+        stats = mine(sources, cache, args.groups, args.chunk_size, n=args.ngram, start=args.offset,
+                     end=end, min_string=args.min_length, epsilon=args.epsilon / 100,
+                     keep_fill=args.keep_fill)
+    finally:
+        if cache is not None:
+            removed = cache.evict(args.cache_max_age, args.cache_max_entries)
+            print(f"💾 Кэш: попаданий {cache.hits}, промахов {cache.misses}, удалено {removed}",
+                  file=sys.stderr)
+            cache.close()
+    elapsed = time.perf_counter() - t0
+
+    min_share = args.min_share / 100
+    if args.json:
+        print(json.dumps(stats.to_dict(min_share, args.limit), ensure_ascii=False, indent=2))
+    else:
+        print(f"📁 Модулей: {len(stats)}, область 0x{args.offset:03X}-0x{end - 1:03X}")
+        stats.print_report(min_share, args.limit)
+    print(f"✅ Модулей: {len(stats)} ({elapsed:.2f} с)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Профилирование стадий анализаторов (--profile)
+
+Стадии - функции модулей (read_spd, analyze_spd, print_detailed_analysis,
+hex_dump, compare_modules, ...). При --profile они подменяются в своих
+модулях обёртками, которые считают вызовы, время (wall, CPU потока, собственное
+время без вложенных стадий), прочитанные байты и пиковый RSS; для выбранных
+стадий дополнительно включается cProfile. Без --profile ничего не
+подменяется: код анализаторов не меняется и не платит за замеры.
+
+Отчёт JSON пишется при выходе из процесса, краткая таблица - в stderr.
+В рабочих процессах пула (-j N, --executor process) стадии не учитываются.
+"""
+
+import atexit
+import cProfile
+import functools
+import importlib
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_REPORT = 'spd_profile.json'
+
+def peak_rss_kb():
+    """Пиковый RSS процесса в КБ (None, если недоступно)"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS отдаёт байты, Linux - килобайты
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+class StageStats:
+    """Накопленные замеры одной стадии"""
+
+    __slots__ = ('calls', 'wall', 'child_wall', 'cpu', 'bytes', 'peak_rss_kb', 'profile')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.child_wall = 0.0
+        self.cpu = 0.0
+        self.bytes = 0
+        self.peak_rss_kb = None
+        self.profile = None
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'wall_s': round(self.wall, 6),
+            'self_s': round(self.wall - self.child_wall, 6),
+            'cpu_s': round(self.cpu, 6),
+            'per_call_us': round(1e6 * self.wall / self.calls, 2) if self.calls else None,
+            'bytes': self.bytes,
+            'peak_rss_kb': self.peak_rss_kb,
+        }
+
+class Profiler:
+    """Замеры стадий; instrument() подменяет функции модулей обёртками"""
+
+    def __init__(self, sample=(), top=25):
+        self.stages = {}
+        self.sample = set(sample)
+        self.top = top
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sampling = False
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+
+    def stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages.setdefault(name, StageStats())
+        return stats
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def call(self, name, func, args, kwargs, count_bytes=False):
+        """Вызов func как стадии name"""
+        stats = self.stats(name)
+        stack = self._stack()
+        profile = None
+        if name in self.sample and not self._sampling:
+            # cProfile не вкладывается: профилируется только внешняя выбранная стадия
+            self._sampling = True
+            profile = stats.profile = stats.profile or cProfile.Profile()
+            profile.enable()
+        stack.append(name)
+        t0 = time.perf_counter()
+        c0 = time.thread_time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - t0
+            cpu = time.thread_time() - c0
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+                self._sampling = False
+            with self._lock:
+                stats.calls += 1
+                stats.wall += wall
+                stats.cpu += cpu
+                stats.peak_rss_kb = peak_rss_kb()
+                if stack:
+                    self.stats(stack[-1]).child_wall += wall
+        if count_bytes:
+            with self._lock:
+                stats.bytes += len(result)
+        return result
+
+    def wrap(self, name, func, count_bytes=False):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(name, func, args, kwargs, count_bytes)
+        wrapper.__wrapped_stage__ = func
+        return wrapper
+
+    def instrument(self, module_name, names, read=()):
+        """Подмена функций names модуля обёртками; read - стадии чтения (считаются байты)
+
+        Если модуль запущен как скрипт, подменяются функции и в __main__.
+        """
+        for module in _modules(module_name):
+            for name in tuple(names) + tuple(read):
+                func = getattr(module, name)
+                if not hasattr(func, '__wrapped_stage__'):
+                    setattr(module, name, self.wrap(name, func, name in read))
+
+    def report(self):
+        """Сводка замеров в виде JSON-совместимого словаря"""
+        out = {
+            'command': sys.argv,
+            'pid': os.getpid(),
+            'wall_s': round(time.perf_counter() - self._t0, 6),
+            'cpu_s': round(time.process_time() - self._c0, 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'stages': {name: s.to_dict() for name, s in self.stages.items()},
+        }
+        profiles = {name: _top_functions(s.profile, self.top)
+                    for name, s in self.stages.items() if s.profile is not None}
+        if profiles:
+            out['cprofile'] = profiles
+        return out
+
+    def print_summary(self, report, file=sys.stderr):
+        print(f"\n⏱️  Профиль ({report['wall_s']:.3f} с, CPU {report['cpu_s']:.3f} с, "
+              f"пиковый RSS {report['peak_rss_kb']} КБ):", file=file)
+        print(f"  {'Стадия':<26} {'Вызовов':>8} {'Wall, с':>9} {'Своё, с':>9} "
+              f"{'CPU, с':>9} {'Байт':>11}", file=file)
+        for name, s in sorted(report['stages'].items(), key=lambda kv: -kv[1]['wall_s']):
+            print(f"  {name:<26} {s['calls']:8d} {s['wall_s']:9.4f} {s['self_s']:9.4f} "
+                  f"{s['cpu_s']:9.4f} {s['bytes']:11d}", file=file)
+
+    def finish(self, path):
+        """Запись отчёта JSON и вывод краткой таблицы"""
+        report = self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.print_summary(report)
+        print(f"  Отчёт: {path}", file=sys.stderr)
+
+def _modules(module_name):
+    """Модуль по имени и __main__, если это тот же файл, запущенный как скрипт"""
+    module = importlib.import_module(module_name)
+    out = [module]
+    main = sys.modules.get('__main__')
+    main_file = getattr(main, '__file__', None)
+    if main is not module and main_file and \
+            os.path.splitext(os.path.basename(main_file))[0] == module_name:
+        out.append(main)
+    return out
+
+def _top_functions(profile, top):
+    """Самые затратные функции cProfile по суммарному времени"""
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})",
+                     'calls': nc, 'tottime_s': round(tt, 6), 'cumtime_s': round(ct, 6)})
+    rows.sort(key=lambda r: -r['cumtime_s'])
+    return rows[:top]
+
+def add_profile_args(parser):
+    """Общие аргументы командной строки для профилирования"""
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_REPORT, metavar='FILE',
+                        help=f"замеры стадий, отчёт JSON при выходе (по умолчанию {DEFAULT_REPORT})")
+    parser.add_argument('--profile-cprofile', nargs='+', default=[], metavar='STAGE',
+                        help="стадии, для которых дополнительно собирается cProfile")
+    parser.add_argument('--profile-top', type=int, default=25,
+                        help="функций cProfile в отчёте по каждой стадии")
+
+def start_profiling(args, stages):
+    """Включение профилирования по аргументам --profile
+
+    stages - {имя модуля: (функции стадий, функции чтения)}. Возвращает
+    Profiler или None, если --profile не задан.
+    """
+    if not args.profile:
+        return None
+    known = {name for names, read in stages.values() for name in names + read}
+    unknown = sorted(set(args.profile_cprofile) - known)
+    if unknown:
+        print(f"⚠️  Неизвестные стадии для cProfile: {', '.join(unknown)} "
+              f"(доступны: {', '.join(sorted(known))})", file=sys.stderr)
+    profiler = Profiler(args.profile_cprofile, args.profile_top)
+    for module_name, (names, read) in stages.items():
+        profiler.instrument(module_name, names, read)
+    atexit.register(profiler.finish, args.profile)
+    return profiler
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Компактная запись результата анализа DDR4 SPD с ленивым форматированием
+
+SpdRecord хранит только имя файла, part number (интернированная строка,
+общая для модулей одной модели) и сырые целые поля, упакованные struct в
+один bytes (~110 байт): коды, маску CAS, тайминги в пс, ID, S/N, дату, CRC.
+Строки ("Week 12, 2021", "0x4448ECFB"), список CL, такты и таблица тактов
+вычисляются только при обращении.
+
+Доступ:
+- record['serial_number'], .get(), in, keys()/items(), dict(record) -
+  тот же словарь, что раньше возвращал analyze_spd (Mapping, порядок ключей
+  прежний), поэтому вывод, кэш и сравнение работают без изменений;
+- record.serial_number, record.cas_mask, record.taa_min_ps - сырые целые
+  значения полей RAW_FIELDS без форматирования.
+"""
+
+import struct
+import sys
+from collections.abc import Mapping
+
+from spd_layout import MTB_NS
+from spd_timing import (PARAM_NAMES, cas_latencies, cycle_table, cycles_at,
+                        speed_grade)
+
+# Сырые поля записи: имена совпадают с spd_layout.FIELDS и spd_numpy.SPD_DTYPE
+RAW_FIELDS = (
+    ('spd_bytes_used', 'B'),
+    ('spd_revision', 'B'),
+    ('dram_type', 'B'),
+    ('module_type_code', 'B'),
+    ('density_code', 'B'),
+    ('banks_code', 'B'),
+    ('row_addr', 'B'),
+    ('col_addr', 'B'),
+    ('width_code', 'B'),
+    ('ranks', 'B'),
+    ('cas_mask', 'I'),
+) + tuple((f'{name}_ps', 'i') for name in PARAM_NAMES) + (
+    ('module_mfg_id', 'H'),
+    ('mfg_location', 'B'),
+    ('mfg_year', 'H'),
+    ('mfg_week', 'B'),
+    ('serial_number', 'I'),
+    ('dram_mfg_id', 'H'),
+    ('register_mfg_id', 'H'),
+    ('register_rev', 'B'),
+    ('crc_page0', 'H'),
+    ('crc_page1', 'H'),
+    ('crc_flags', 'B'),
+)
+
+RAW = struct.Struct('<' + ''.join(code for _, code in RAW_FIELDS))
+
+# Имя поля -> (struct одного поля, смещение в упакованной записи)
+_OFFSETS = {}
+_pos = 0
+for _name, _code in RAW_FIELDS:
+    _OFFSETS[_name] = (struct.Struct('<' + _code), _pos)
+    _pos += struct.calcsize('<' + _code)
+del _pos, _name, _code
+
+# Ключ представления записи в кэше (spd_cache): {PAYLOAD_KEY: [имя, PN, raw hex]}
+PAYLOAD_KEY = '__spd_record__'
+
+# Биты crc_flags: CRC страниц проверены / совпали
+CRC_CHECKED = 0x01
+CRC_PAGE0_OK = 0x02
+CRC_PAGE1_OK = 0x04
+
+def _tables():
+    # Справочники DDR4 живут в analyze_hpe_spd (импорт при первом обращении)
+    import analyze_hpe_spd
+    return analyze_hpe_spd
+
+def _mfg(mfg_id):
+    from spd_db import manufacturer_name
+    return manufacturer_name(mfg_id, _tables().MANUFACTURERS)
+
+def _ns(name):
+    return lambda r: getattr(r, f'{name}_ps') / 1000
+
+def _is_rdimm(r):
+    return r.module_type_code & 0x0F == 0x01
+
+def _has_register_model(r):
+    return _is_rdimm(r) and _tables().register_info(r.register_mfg_id)[1] is not None
+
+def _crc_checked(r):
+    return bool(r.crc_flags & CRC_CHECKED)
+
+# Ключ словаря analyze_spd -> (вычисление, условие наличия или None)
+VIEWS = {
+    'filename': (lambda r: r.filename, None),
+    'memory_type': (lambda r: 'DDR4', None),
+    'spd_bytes_used': (lambda r: r.spd_bytes_used, None),
+    'spd_revision': (lambda r: f"{r.spd_revision >> 4}.{r.spd_revision & 0x0F}", None),
+    'dram_type': (lambda r: r.dram_type, None),
+    'module_type_code': (lambda r: r.module_type_code, None),
+    'module_type': (lambda r: _tables().MODULE_TYPES.get(r.module_type_code & 0x0F, "Unknown"),
+                    None),
+    'sdram_density': (lambda r: _tables().DENSITIES.get(r.density_code, "Unknown"), None),
+    'sdram_banks': (lambda r: _tables().BANKS_COUNT.get(r.banks_code, "Unknown"), None),
+    'row_addr': (lambda r: r.row_addr, None),
+    'col_addr': (lambda r: r.col_addr, None),
+    'device_width': (lambda r: _tables().DEVICE_WIDTHS.get(r.width_code, "Unknown"), None),
+    'ranks': (lambda r: r.ranks, None),
+    'mtb': (lambda r: MTB_NS, None),
+    'tck_min': (_ns('tck_min'), None),
+    'tck_max': (_ns('tck_max'), None),
+    'freq_mhz': (lambda r: speed_grade(r.tck_min_ps), None),
+    'cas_latencies': (lambda r: list(cas_latencies(r.cas_mask)), None),
+    'taa_min': (_ns('taa_min'), None),
+    'trcd_min': (_ns('trcd_min'), None),
+    'trp_min': (_ns('trp_min'), None),
+    'tras_min': (_ns('tras_min'), None),
+    'trc_min': (_ns('trc_min'), None),
+    'timings_ps': (lambda r: r.timings_ps(), None),
+    'timing_cycles': (lambda r: list(r.cycles()), None),
+    'cycle_table': (lambda r: [list(row) for row in cycle_table(r.timings_ps(),
+                                                                cas_latencies(r.cas_mask))], None),
+    'module_mfg_id': (lambda r: r.module_mfg_id, None),
+    'module_mfg': (lambda r: _mfg(r.module_mfg_id), None),
+    'part_number': (lambda r: r.part_number, None),
+    'serial_number': (lambda r: f"0x{r.serial_number:08X}", None),
+    'mfg_date': (lambda r: f"Week {r.mfg_week}, {r.mfg_year}", None),
+    'mfg_location': (lambda r: r.mfg_location, None),
+    'dram_mfg_id': (lambda r: r.dram_mfg_id, None),
+    'dram_mfg': (lambda r: _mfg(r.dram_mfg_id), None),
+    'register_mfg_id': (lambda r: r.register_mfg_id, _is_rdimm),
+    'register_mfg': (lambda r: _tables().register_info(r.register_mfg_id)[0], _is_rdimm),
+    'register_model': (lambda r: _tables().register_info(r.register_mfg_id)[1], _has_register_model),
+    'register_rev': (lambda r: r.register_rev, _is_rdimm),
+    'crc_page0': (lambda r: f"0x{r.crc_page0:04X}", None),
+    'crc_page1': (lambda r: f"0x{r.crc_page1:04X}", None),
+    'crc_page0_ok': (lambda r: bool(r.crc_flags & CRC_PAGE0_OK), _crc_checked),
+    'crc_page1_ok': (lambda r: bool(r.crc_flags & CRC_PAGE1_OK), _crc_checked),
+}
+
+class SpdRecord(Mapping):
+    """Результат анализа одного DDR4 модуля: сырые поля + ленивый словарь
+
+    Неизменяемая запись; сериализация в JSON - через dict(record).
+    """
+
+    __slots__ = ('filename', 'part_number', '_raw')
+
+    def __init__(self, filename, part_number, raw):
+        self.filename = filename
+        self.part_number = sys.intern(part_number)
+        self._raw = raw
+
+    @classmethod
+    def from_fields(cls, fields, filename, crc_ok=None):
+        """Запись из полей spd_layout.decode_image
+
+        crc_ok - (CRC страницы 0 совпал, CRC страницы 1 совпал) или None,
+        если CRC не проверялись.
+        """
+        from spd_timing import timings_ps
+
+        ps = timings_ps(fields)
+        if ps['tck_min'] <= 0:
+            raise ValueError(f"некорректный tCKmin: {ps['tck_min']} пс")
+        flags = 0
+        if crc_ok is not None:
+            flags = CRC_CHECKED | (CRC_PAGE0_OK if crc_ok[0] else 0) | \
+                (CRC_PAGE1_OK if crc_ok[1] else 0)
+        values = {f'{name}_ps': value for name, value in ps.items()}
+        values['crc_flags'] = flags
+        raw = RAW.pack(*(values[name] if name in values else fields[name]
+                         for name, _ in RAW_FIELDS))
+        return cls(filename, fields['part_number'], raw)
+
+    @classmethod
+    def from_row(cls, rec, filename):
+        """Запись из строки структурированного массива spd_numpy.SPD_DTYPE
+
+        CRC в decode_batch не сверяются, поэтому ключей crc_page*_ok нет.
+        """
+        raw = RAW.pack(*(0 if name == 'crc_flags' else int(rec[name]) for name, _ in RAW_FIELDS))
+        part_number = bytes(rec['part_number']).decode('ascii', errors='ignore').strip()
+        return cls(filename, part_number, raw)
+
+    def __getattr__(self, name):
+        # Только сырые поля; filename/part_number/_raw - слоты
+        try:
+            unpacker, offset = _OFFSETS[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return unpacker.unpack_from(self._raw, offset)[0]
+
+    def __reduce__(self):
+        return (type(self), (self.filename, self.part_number, self._raw))
+
+    def to_payload(self):
+        """JSON-совместимое представление для кэша (сырые поля, без форматирования)"""
+        return {PAYLOAD_KEY: [self.filename, self.part_number, self._raw.hex()]}
+
+    @classmethod
+    def from_payload(cls, payload):
+        filename, part_number, raw = payload[PAYLOAD_KEY]
+        return cls(filename, part_number, bytes.fromhex(raw))
+
+    def timings_ps(self):
+        """Параметры spd_timing.PARAMS в пс"""
+        return {name: getattr(self, f'{name}_ps') for name in PARAM_NAMES}
+
+    def cycles(self):
+        """(CL, tRCD, tRP, tRAS) на tCKmin"""
+        tck = self.tck_min_ps
+        return cycles_at(self.timings_ps(), cas_latencies(self.cas_mask), tck)[:4]
+
+    # --- Mapping: словарь в формате analyze_spd ---
+
+    def __getitem__(self, key):
+        view = VIEWS.get(key)
+        if view is None or (view[1] is not None and not view[1](self)):
+            raise KeyError(key)
+        return view[0](self)
+
+    def __iter__(self):
+        for key, (_, present) in VIEWS.items():
+            if present is None or present(self):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SpdRecord({self.filename!r}, {self.part_number!r}, S/N 0x{self.serial_number:08X})"
@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Чтение SPD через программатор SpdReaderWriter (Arduino) и эмулятор прошивки
+
+Протокол прошивки Arduino/firmware/SpdReaderWriter (115200 бод):
+  команда - один символ и аргументы, например 'r' addr off_hi off_lo len
+  ответ   - '&' длина данные контрольная_сумма (сумма байт mod 256)
+  событие - '@' код ('+'/'-' модуль вставлен/извлечён, '/'/'\\' частота I2C)
+Выбор страницы DDR4 (SPA0/SPA1) прошивка делает сама по смещению.
+
+Клиент на asyncio держит в полёте несколько команд чтения (окно), повторяет
+блоки при ошибках и отдаёт образ в analyze_spd, пока читается следующий модуль.
+Эмулятор на pty отдаёт образы из директории с дампами - для проверки без железа.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+
+# Команды и маркеры прошивки
+READBYTE = b'r'
+SCANBUS = b's'
+SIZE = b'z'
+VERSION = b'v'
+TEST = b't'
+NAME = b'n'
+RSWP = b'b'
+DDR4DETECT = b'4'
+DDR5DETECT = b'5'
+GET = ord('?')
+RESPONSE = ord('&')
+ALERT = ord('@')
+SLAVEINC = ord('+')
+SLAVEDEC = ord('-')
+
+BAUD_RATE = 115200
+BASE_ADDRESS = 0x50   # scanBus: бит i - адрес 80 + i
+BLOCK_SIZE = 32       # размер responseBuffer в прошивке
+WINDOW = 8            # команд чтения в полёте (5 байт каждая, RX буфер AVR - 64 байта)
+DDR4_BLOCKS = 4       # блоки RSWP DDR4 (по 128 байт)
+
+# Ответ cmdSize(): индекс длины образа
+SIZES = {1: 256, 2: 512, 3: 1024}
+
+class ProtocolError(Exception):
+    """Ошибка обмена с программатором (контрольная сумма, таймаут, мусор)"""
+
+# --- Последовательный порт ---
+
+async def open_serial(port, baudrate=BAUD_RATE):
+    """Пара (StreamReader, StreamWriter) для последовательного порта или pty"""
+    try:
+        import termios
+        import tty
+    except ImportError:  # Windows
+        return await _open_pyserial(port, baudrate)
+
+    loop = asyncio.get_running_loop()
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    attrs = termios.tcgetattr(fd)
+    speed = getattr(termios, f'B{baudrate}')
+    attrs[4] = attrs[5] = speed
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                 os.fdopen(fd, 'rb', buffering=0))
+    transport, protocol = await loop.connect_write_pipe(
+        lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()),
+        os.fdopen(os.dup(fd), 'wb', buffering=0))
+    return reader, asyncio.StreamWriter(transport, protocol, None, loop)
+
+async def _open_pyserial(port, baudrate):
+    """Запасной вариант через pyserial: чтение в отдельном потоке"""
+    import threading
+    import serial
+
+    loop = asyncio.get_running_loop()
+    ser = serial.Serial(port, baudrate, timeout=0.05)
+    reader = asyncio.StreamReader()
+
+    def pump():
+        while ser.is_open:
+            try:
+                chunk = ser.read(ser.in_waiting or 1)
+            except serial.SerialException:
+                break
+            if chunk:
+                loop.call_soon_threadsafe(reader.feed_data, chunk)
+
+    threading.Thread(target=pump, daemon=True).start()
+    return reader, _PySerialWriter(ser)
+
+class _PySerialWriter:
+    """Минимальный интерфейс StreamWriter поверх pyserial"""
+
+    def __init__(self, ser):
+        self._ser = ser
+
+    def write(self, data):
+        self._ser.write(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self._ser.close()
+
+    async def wait_closed(self):
+        pass
+
+# --- Клиент ---
+
+class SpdProgrammer:
+    """Клиент протокола SpdReaderWriter поверх пары asyncio потоков"""
+
+    def __init__(self, reader, writer, timeout=1.0, window=WINDOW, retries=3):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.window = window
+        self.retries = retries
+        self.alerts = asyncio.Queue()
+        self.resyncs = 0
+        # Порт закрыт другой стороной (эмулятор завершился, адаптер отключён)
+        self.lost = False
+        # Ответы (или ProtocolError) в порядке прихода; разбирает фоновая задача,
+        # чтобы события '@' принимались и когда команд нет
+        self._responses = asyncio.Queue()
+        self._last_rx = time.monotonic()
+        self._rx_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def open(cls, port, baudrate=BAUD_RATE, **kwargs):
+        reader, writer = await open_serial(port, baudrate)
+        self = cls(reader, writer, **kwargs)
+        await self.sync()
+        return self
+
+    async def close(self):
+        self._rx_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+    async def _send(self, data):
+        """Запись в порт; потеря порта - ProtocolError"""
+        if self.lost:
+            raise ProtocolError("порт закрыт")
+        try:
+            self.writer.write(data)
+            await self.writer.drain()
+        except OSError as e:
+            self._port_lost()
+            raise ProtocolError(f"порт закрыт: {e}") from None
+
+    def _port_lost(self):
+        self.lost = True
+        self._responses.put_nowait(ProtocolError("порт закрыт"))
+
+    async def _read_loop(self):
+        """Разбор входного потока: '&' - в очередь ответов, '@' - в alerts"""
+        read = self.reader.readexactly
+        while True:
+            try:
+                marker = (await read(1))[0]
+            except (asyncio.IncompleteReadError, OSError):
+                self._port_lost()
+                return
+            self._last_rx = time.monotonic()
+            try:
+                if marker == ALERT:
+                    self.alerts.put_nowait((await asyncio.wait_for(read(1), self.timeout))[0])
+                    continue
+                if marker != RESPONSE:
+                    self._responses.put_nowait(ProtocolError(f"неожиданный байт 0x{marker:02X}"))
+                    continue
+                length = (await asyncio.wait_for(read(1), self.timeout))[0]
+                payload = await asyncio.wait_for(read(length + 1), self.timeout)
+            except asyncio.TimeoutError:
+                # Оборванный кадр: продолжаем поиск маркера с того, что уже пришло
+                self._responses.put_nowait(ProtocolError("неполный ответ"))
+                continue
+            except (asyncio.IncompleteReadError, OSError):
+                self._port_lost()
+                return
+            self._last_rx = time.monotonic()
+            if sum(payload[:-1]) & 0xFF != payload[-1]:
+                self._responses.put_nowait(ProtocolError("неверная контрольная сумма"))
+            else:
+                self._responses.put_nowait(payload[:-1])
+
+    async def _response(self):
+        try:
+            item = await asyncio.wait_for(self._responses.get(), self.timeout)
+        except asyncio.TimeoutError:
+            if self.lost:
+                raise ProtocolError("порт закрыт") from None
+            raise ProtocolError("нет ответа") from None
+        if isinstance(item, ProtocolError):
+            raise item
+        return item
+
+    async def _resync(self, quiet=0.05):
+        """Ожидание паузы quiet секунд во входном потоке и сброс очереди ответов"""
+        while time.monotonic() - self._last_rx < quiet:
+            await asyncio.sleep(quiet)
+        while not self._responses.empty():
+            self._responses.get_nowait()
+
+    async def command(self, cmd, *args):
+        """Одна команда с ответом (с повторами)"""
+        frame = cmd + bytes(args)
+        for attempt in range(self.retries + 1):
+            await self._send(frame)
+            try:
+                return await self._response()
+            except ProtocolError:
+                if attempt == self.retries or self.lost:
+                    raise
+                self.resyncs += 1
+                await self._resync()
+
+    async def sync(self):
+        """Сброс приветствия/мусора после открытия порта и проверка связи"""
+        await asyncio.sleep(0.2)
+        await self._resync(0.2)
+        if await self.command(TEST) != b'\x01':
+            raise ProtocolError("программатор не ответил на тест")
+
+    async def version(self):
+        return int.from_bytes(await self.command(VERSION), 'little')
+
+    async def name(self):
+        return (await self.command(NAME, GET)).decode('ascii', 'replace')
+
+    async def scan(self):
+        """Адреса EEPROM на шине (80-87)"""
+        mask = (await self.command(SCANBUS))[0]
+        return [BASE_ADDRESS + i for i in range(8) if mask & (1 << i)]
+
+    async def size(self, address):
+        """Размер EEPROM в байтах (0 - неизвестен)"""
+        return SIZES.get((await self.command(SIZE, address))[0], 0)
+
+    async def rswp(self, address, blocks=DDR4_BLOCKS):
+        """Статус RSWP по блокам (True - защищён)"""
+        return [bool((await self.command(RSWP, address, block, GET))[0])
+                for block in range(blocks)]
+
+    async def read(self, address, offset, length):
+        """Чтение length байт с offset: блоки по BLOCK_SIZE, до window в полёте
+
+        Ответы приходят в порядке команд. При сбое входной поток сбрасывается,
+        а неподтверждённые блоки отправляются заново (не более retries раз).
+        """
+        out = bytearray(length)
+        pending = deque((off, min(BLOCK_SIZE, offset + length - off), 0)
+                        for off in range(offset, offset + length, BLOCK_SIZE))
+        inflight = deque()
+
+        while pending or inflight:
+            frames = []
+            while pending and len(inflight) < self.window:
+                off, n, attempt = pending.popleft()
+                frames.append(READBYTE + bytes((address, off >> 8, off & 0xFF, n)))
+                inflight.append((off, n, attempt))
+            if frames:
+                await self._send(b''.join(frames))
+
+            off, n, attempt = inflight[0]
+            try:
+                data = await self._response()
+                if len(data) != n:
+                    raise ProtocolError(f"блок {off}: {len(data)} байт вместо {n}")
+            except ProtocolError:
+                if attempt >= self.retries or self.lost:
+                    raise
+                self.resyncs += 1
+                await self._resync()
+                pending.extendleft(reversed([(o, k, a + 1) for o, k, a in inflight]))
+                inflight.clear()
+                continue
+            inflight.popleft()
+            out[off - offset:off - offset + n] = data
+        return bytes(out)
+
+    async def read_image(self, address, size=None):
+        """Полный образ EEPROM (по умолчанию размер по cmdSize, иначе 512)"""
+        if size is None:
+            size = await self.size(address) or 512
+        return await self.read(address, 0, size)
+
+# --- Конвейер чтение → анализ ---
+
+def verdict(results):
+    """Строка вердикта по модулю"""
+    from analyze_hpe_spd import crc_flags, speed_label
+
+    crc = crc_flags(results)
+    mark = "✅" if all(crc) else "❌"
+    return (f"{mark} {results['part_number']:<20} S/N {results['serial_number']} "
+            f"{speed_label(results)} {results['module_type']} "
+            f"CRC {'/'.join('ok' if ok else 'ERR' for ok in crc)}")
+
+def save_image(directory, results, data):
+    """Сохранение образа как <part number>_<serial>.bin"""
+    os.makedirs(directory, exist_ok=True)
+    stem = f"{results['part_number']}_{results['serial_number'][2:]}".replace(os.sep, '_')
+    path = os.path.join(directory, f"{stem}.bin")
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+async def analyze_worker(queue, args):
+    """Анализ прочитанных образов в пуле потоков, пока читается следующий модуль"""
+    from analyze_hpe_spd import analyze_spd, print_detailed_analysis
+
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        name, data, t_start, t_read = item
+        try:
+            results = await loop.run_in_executor(None, analyze_spd, data, name)
+        except Exception as e:
+            print(f"❌ {name}: ошибка анализа: {e}")
+            continue
+        t_done = time.perf_counter()
+        print(f"{verdict(results)}  чтение {1000 * (t_read - t_start):.0f} мс, "
+              f"итого {1000 * (t_done - t_start):.0f} мс")
+        if args.detail:
+            print_detailed_analysis(results)
+        if args.save:
+            await loop.run_in_executor(None, save_image, args.save, results, data)
+
+async def read_modules(prog, queue, args):
+    """Чтение модулей: один проход по шине или ожидание смены модулей (--watch)
+
+    Потеря порта (программатор отключён, эмулятор завершён) завершает чтение
+    сообщением; прочитанные до этого модули анализируются и входят в итог.
+    """
+    count = 0
+    present = set()
+    tag = os.path.basename(args.port)
+
+    while True:
+        try:
+            addresses = await prog.scan()
+            present &= set(addresses)
+            for address in addresses:
+                if address in present:
+                    continue
+                t_start = time.perf_counter()
+                data = await prog.read_image(address, args.size)
+                count += 1
+                await queue.put((f"{tag}_{address:02X}_{count:04d}.bin", data, t_start,
+                                 time.perf_counter()))
+                present.add(address)
+        except ProtocolError as e:
+            if not prog.lost:
+                raise
+            print(f"❌ {args.port}: связь с программатором потеряна ({e})")
+            return count
+        if not args.watch:
+            return count
+
+        # Ждём события '@+'/'@-' от прошивки; периодический скан - на случай потери
+        try:
+            alerts = [await asyncio.wait_for(prog.alerts.get(), args.poll)]
+        except asyncio.TimeoutError:
+            continue
+        while not prog.alerts.empty():
+            alerts.append(prog.alerts.get_nowait())
+        # Извлечение и вставка между сканами: адрес тот же, модуль другой
+        if SLAVEDEC in alerts:
+            present.clear()
+
+async def run_reader(args):
+    prog = await SpdProgrammer.open(args.port, args.baud, timeout=args.timeout,
+                                    window=args.window, retries=args.retries)
+    print(f"🔌 {args.port}: {await prog.name()} (прошивка {await prog.version()})")
+    queue = asyncio.Queue(maxsize=args.queue)
+    worker = asyncio.create_task(analyze_worker(queue, args))
+    t0 = time.perf_counter()
+    try:
+        count = await read_modules(prog, queue, args)
+    finally:
+        await queue.put(None)
+        await worker
+        await prog.close()
+    elapsed = time.perf_counter() - t0
+    print(f"\n📊 Модулей: {count} за {elapsed:.2f} с, повторов: {prog.resyncs}")
+
+# --- Эмулятор прошивки ---
+
+class FirmwareEmulator:
+    """Эмуляция SpdReaderWriter: модули по одному на адресе 0x50 из списка образов"""
+
+    # Длина аргументов команд (кроме 'g', у которой ещё и данные)
+    ARGS = {b'r': 4, b'w': 4, b'g': 4, b's': 0, b'a': 1, b'c': 1, b'p': 2, b'd': 0,
+            b'b': 3, b'l': 2, b'o': 3, b'v': 0, b't': 0, b'f': 0, b'4': 1, b'5': 1,
+            b'h': 3, b'z': 1, b'n': 1, b'-': 0}
+    FW_VER = 20251127
+
+    def __init__(self, images, realtime=False, baudrate=BAUD_RATE):
+        self.images = images
+        self.index = -1
+        self.present = False
+        self.realtime = realtime
+        self.byte_time = 10 / baudrate  # 8N1
+        self.buffer = bytearray()
+
+    @property
+    def image(self):
+        return self.images[self.index] if self.present else None
+
+    def insert_next(self, cycle=False):
+        """Вставка следующего модуля; False, если образы закончились"""
+        if self.index + 1 >= len(self.images):
+            if not cycle:
+                return False
+            self.index = -1
+        self.index += 1
+        self.present = True
+        return True
+
+    def respond(self, payload):
+        payload = bytes(payload)
+        return bytes((RESPONSE, len(payload))) + payload + bytes((sum(payload) & 0xFF,))
+
+    def handle(self, cmd, args):
+        """Ответ на одну команду (None - без ответа)"""
+        image = self.image
+        address = args[0] if args else 0
+        on_bus = image is not None and address == BASE_ADDRESS
+        if cmd == b'r':
+            offset, length = args[1] << 8 | args[2], args[3]
+            data = bytearray(length)
+            if on_bus:
+                chunk = image[offset:offset + length]
+                data[:len(chunk)] = chunk
+            return self.respond(data)
+        if cmd == b't':
+            return self.respond(b'\x01')
+        if cmd == b'v':
+            return self.respond(self.FW_VER.to_bytes(4, 'little'))
+        if cmd == b's':
+            return self.respond(bytes((1 if image is not None else 0,)))
+        if cmd == b'a':
+            return self.respond(bytes((on_bus,)))
+        if cmd == b'z':
+            size = len(image) if on_bus else 0
+            return self.respond(bytes((next((k for k, v in SIZES.items() if v == size), 0),)))
+        if cmd == b'4':
+            return self.respond(bytes((on_bus and len(image) == 512,)))
+        if cmd == b'5':
+            return self.respond(bytes((on_bus and len(image) == 1024,)))
+        if cmd == b'n':
+            return self.respond(b'SpdEmulator' if args[0] == GET else b'\x00')
+        if cmd == b'f':
+            return self.respond(b'\x00')
+        if cmd in self.ARGS:
+            # Запись, защита и управление пинами не эмулируются
+            return self.respond(b'\x00')
+        return None
+
+    def feed(self, data):
+        """Разбор входящих байт; возвращает ответы на полностью принятые команды"""
+        self.buffer += data
+        out = []
+        while self.buffer:
+            cmd = bytes(self.buffer[:1])
+            need = 1 + self.ARGS.get(cmd, 0)
+            if cmd == b'g' and len(self.buffer) >= 5:
+                need += self.buffer[4]
+            if len(self.buffer) < need:
+                break
+            args = bytes(self.buffer[1:1 + self.ARGS.get(cmd, 0)])
+            del self.buffer[:need]
+            reply = self.handle(cmd, args)
+            if reply:
+                out.append(reply)
+        return b''.join(out)
+
+    def serve(self, fd, interval, cycle=False):
+        """Обслуживание master-стороны pty: команды и смена модулей каждые interval с"""
+        import select
+
+        # None - событий больше нет (образы закончились), ждём только команд
+        next_event = time.monotonic() + interval
+        while True:
+            wait = None if next_event is None else max(0.0, next_event - time.monotonic())
+            ready, _, _ = select.select([fd], [], [], wait)
+            if ready:
+                try:
+                    data = os.read(fd, 4096)
+                except OSError:
+                    data = b''
+                reply = self.feed(data)
+                if reply:
+                    if self.realtime:
+                        time.sleep(len(reply) * self.byte_time)
+                    os.write(fd, reply)
+            if next_event is None or time.monotonic() < next_event:
+                continue
+            # Событие смены модуля - только между ответами, как в i2cMonitor()
+            if self.present:
+                self.present = False
+                os.write(fd, bytes((ALERT, SLAVEDEC)))
+            elif self.insert_next(cycle):
+                os.write(fd, bytes((ALERT, SLAVEINC)))
+            else:
+                print("📭 Все образы отданы", file=sys.stderr)
+                next_event = None
+                continue
+            next_event = time.monotonic() + interval
+
+def open_emulator_pty():
+    """Пара pty (master, путь slave) в raw режиме"""
+    import pty
+    import tty
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    return master, slave, path
+
+def run_emulator(args):
+    from spd_batch import collect_inputs, read_source
+
+    images = [bytes(read_source(src)) for src in collect_inputs(args.paths, args.recursive)]
+    if not images:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+    emulator = FirmwareEmulator(images, args.realtime)
+    emulator.insert_next()
+    master, slave, path = open_emulator_pty()
+    print(f"🔌 Эмулятор SpdReaderWriter: {path} ({len(images)} образов)", flush=True)
+    try:
+        emulator.serve(master, args.interval, args.cycle)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(slave)
+        os.close(master)
+
+def main():
+    """Главная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Чтение SPD через программатор SpdReaderWriter")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('read', help="прочитать модули и проанализировать")
+    p.add_argument('port', help="последовательный порт (/dev/ttyUSB0, COM3, pty эмулятора)")
+    p.add_argument('--baud', type=int, default=BAUD_RATE)
+    p.add_argument('--watch', action='store_true',
+                   help="ждать смены модулей и читать каждый новый (Ctrl+C - выход)")
+    p.add_argument('--poll', type=float, default=1.0,
+                   help="период опроса шины в режиме --watch, с")
+    p.add_argument('--size', type=int, help="размер образа (по умолчанию - по ответу прошивки)")
+    p.add_argument('--window', type=int, default=WINDOW, help="команд чтения в полёте")
+    p.add_argument('--retries', type=int, default=3, help="повторов на блок при сбое")
+    p.add_argument('--timeout', type=float, default=1.0, help="таймаут ответа, с")
+    p.add_argument('--queue', type=int, default=4, help="образов в очереди на анализ")
+    p.add_argument('--save', metavar='DIR', help="сохранять прочитанные образы в DIR")
+    p.add_argument('--detail', action='store_true', help="подробный отчёт по каждому модулю")
+
+    p = sub.add_parser('emulate', help="эмулятор прошивки на pty")
+    p.add_argument('paths', nargs='*', default=['.'],
+                   help="дампы .bin, директории или .spdpack для эмуляции модулей")
+    p.add_argument('-r', '--recursive', action='store_true')
+    p.add_argument('--interval', type=float, default=0.5,
+                   help="период смены модуля (извлечение/вставка), с")
+    p.add_argument('--cycle', action='store_true', help="после последнего образа начать сначала")
+    p.add_argument('--realtime', action='store_true',
+                   help="задержка ответов как на реальных 115200 бод")
+
+    args = parser.parse_args()
+    if args.command == 'emulate':
+        run_emulator(args)
+        return
+    try:
+        asyncio.run(run_reader(args))
+    except KeyboardInterrupt:
+        pass
+    except ProtocolError as e:
+        print(f"❌ Ошибка связи с программатором: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Анализ партии по частям (map-reduce): сводки частей и их объединение
+
+Корпус делится на непрерывные части (shards); каждая часть независимо
+сводится в FleetSummary - счётчики part number / частот / групп таймингов
+и серийные номера (ModuleStats), группы Secure Code (SecureCodeStats),
+гистограммы байт vendor области (spd_stats.ByteStats) и ошибки чтения.
+Сводки объединяются ассоциативным merge() в порядке частей, поэтому итог
+совпадает с отчётом compare_modules / compare_secure_codes по всей партии.
+
+Сводка части сохраняется в .npz (гистограммы + JSON остального) - части
+можно считать на разных машинах или в разных запусках:
+
+    python spd_shard.py map /data/fleet.spdpack --shard 3/8 -o part3.npz
+    python spd_shard.py reduce part*.npz
+    python spd_shard.py run /data/fleet.spdpack --shards 8 -j 8
+"""
+
+import json
+import sys
+import time
+
+import numpy as np
+
+from spd_layout import AREAS, SPD_SIZE
+
+class FleetSummary:
+    """Объединяемая сводка части партии"""
+
+    def __init__(self, start=AREAS['vendor'][0], end=AREAS['vendor'][1]):
+        from analyze_hpe_secure import SecureCodeStats
+        from analyze_hpe_spd import ModuleStats
+        from spd_stats import ByteStats
+
+        self.modules = ModuleStats()
+        self.secure = SecureCodeStats()
+        self.bytes = ByteStats(start, end)
+        # (источник, текст ошибки) в порядке поступления
+        self.errors = []
+
+    def __len__(self):
+        return self.bytes.count
+
+    def update(self, names, images):
+        """Учёт порции образов (имена и bytes/memoryview в одном порядке)"""
+        from analyze_hpe_secure import secure_summary
+        from analyze_hpe_spd import analyze_spd
+
+        arr = np.zeros((len(images), max(self.bytes.end, SPD_SIZE)), dtype=np.uint8)
+        for i, (name, data) in enumerate(zip(names, images)):
+            n = min(len(data), arr.shape[1])
+            arr[i, :n] = np.frombuffer(data, dtype=np.uint8, count=n)
+            try:
+                results, secure = analyze_spd(data, name), secure_summary(data)
+            except Exception as e:
+                self.errors.append((name, str(e)))
+                continue
+            self.modules.add(results)
+            self.secure.add(name, secure)
+        self.bytes.update(arr)
+        return self
+
+    def merge(self, other):
+        """Добавление сводки следующей части (ассоциативно, не коммутативно)"""
+        self.modules.merge(other.modules)
+        self.secure.merge(other.secure)
+        self.bytes.merge(other.bytes)
+        self.errors.extend(other.errors)
+        return self
+
+    __iadd__ = merge
+
+    def to_dict(self):
+        """Всё, кроме гистограмм, в JSON-совместимом виде"""
+        return {'modules': self.modules.to_dict(), 'secure': self.secure.to_dict(),
+                'errors': [list(e) for e in self.errors]}
+
+    def save(self, path):
+        """Сохранение в .npz; counts/meta - в формате ByteStats.save (читается spd_stats --merge)"""
+        summary = json.dumps(self.to_dict(), ensure_ascii=False).encode('utf-8')
+        np.savez_compressed(path, counts=self.bytes.counts,
+                            meta=np.array([self.bytes.start, self.bytes.end, self.bytes.count],
+                                          dtype=np.int64),
+                            summary=np.frombuffer(summary, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        from analyze_hpe_secure import SecureCodeStats
+        from analyze_hpe_spd import ModuleStats
+        from spd_stats import ByteStats
+
+        with np.load(path) as f:
+            d = json.loads(f['summary'].tobytes().decode('utf-8'))
+        summary = cls.__new__(cls)
+        summary.modules = ModuleStats.from_dict(d['modules'])
+        summary.secure = SecureCodeStats.from_dict(d['secure'])
+        summary.bytes = ByteStats.load(path)
+        summary.errors = [tuple(e) for e in d['errors']]
+        return summary
+
+    def print_report(self, show_stats=False):
+        """Отчёт по всей партии: ошибки, сравнение модулей, Secure Codes"""
+        for name, error in self.errors:
+            print(f"❌ Ошибка при обработке {name}: {error}")
+        if len(self.modules) >= 2:
+            self.modules.print_report()
+        self.secure.print_report()
+        if show_stats:
+            from spd_stats import print_report
+            print()
+            print_report(self.bytes)
+
+def shard_bounds(total, shards):
+    """Границы [start, end) непрерывных частей почти равного размера"""
+    shards = max(1, shards)
+    return [(i * total // shards, (i + 1) * total // shards) for i in range(shards)]
+
+def summarize(sources, chunk_size=65536):
+    """Сводка по источникам (.bin или PackRecord) порциями по chunk_size"""
+    from spd_batch import chunked, read_source, source_name
+
+    summary = FleetSummary()
+    for chunk in chunked(sources, chunk_size):
+        names, images = [], []
+        for src in chunk:
+            try:
+                images.append(read_source(src))
+                names.append(source_name(src))
+            except Exception as e:
+                summary.errors.append((source_name(src), str(e)))
+        summary.update(names, images)
+    return summary
+
+def _summarize_shard(sources, chunk_size, path=None):
+    """Рабочая функция узла: сводка части, при path - сразу в файл"""
+    summary = summarize(sources, chunk_size)
+    if path is None:
+        return summary
+    summary.save(path)
+    return path
+
+def run_shards(sources, shards, workers=None, chunk_size=65536, save_dir=None):
+    """Сводки частей в отдельных процессах (вместо узлов) и их объединение
+
+    Процессы обмениваются с родителем только сводками, поэтому память
+    родителя не зависит от размера партии. Члены архивов родитель читает
+    сам одним потоком и передаёт части байтами (spd_batch.load_archive_members);
+    в полёте не больше workers частей. save_dir - сохранить сводки частей
+    в .npz (затем их можно объединить командой reduce).
+    """
+    import os
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from spd_batch import load_archive_members
+
+    bounds = shard_bounds(len(sources), min(shards, len(sources)))
+    workers = workers or min(len(bounds), os.cpu_count() or 1)
+    paths = [None] * len(bounds)
+    if save_dir is not None:
+        os.makedirs(save_dir, exist_ok=True)
+        paths = [os.path.join(save_dir, f"shard_{i:04d}.npz") for i in range(len(bounds))]
+
+    total = None
+
+    def collect(future):
+        nonlocal total
+        part = future.result()
+        if isinstance(part, str):
+            part = FleetSummary.load(part)
+        total = part if total is None else total.merge(part)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for (a, b), path in zip(bounds, paths):
+            pending.append(pool.submit(_summarize_shard, load_archive_members(sources[a:b]),
+                                       chunk_size, path))
+            if len(pending) >= workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+    return total
+
+def parse_shard(text):
+    """'i/n' (i с 1) -> (i - 1, n)"""
+    i, n = (int(v) for v in text.split('/'))
+    if not 1 <= i <= n:
+        raise ValueError(f"номер части вне диапазона: {text}")
+    return i - 1, n
+
+def main():
+    """Главная функция"""
+    import argparse
+    from spd_batch import collect_inputs
+
+    parser = argparse.ArgumentParser(description="Анализ партии SPD по частям (map-reduce)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_inputs(p):
+        p.add_argument('paths', nargs='+', help="файлы .bin, контейнеры .spdpack, архивы, директории")
+        p.add_argument('-r', '--recursive', action='store_true')
+        p.add_argument('--chunk-size', type=int, default=65536, help="образов в одной порции")
+
+    p_run = sub.add_parser('run', help="разбить партию, посчитать части в процессах и объединить")
+    add_inputs(p_run)
+    p_run.add_argument('--shards', type=int, default=4, help="число частей")
+    p_run.add_argument('-j', '--workers', type=int, default=0, help="процессов (0 = по числу частей)")
+    p_run.add_argument('--save-dir', metavar='DIR', help="сохранить сводки частей в DIR")
+    p_run.add_argument('--stats', action='store_true', help="статистика байт vendor области")
+
+    p_map = sub.add_parser('map', help="сводка одной части партии в файл .npz")
+    add_inputs(p_map)
+    p_map.add_argument('--shard', default='1/1', metavar='I/N',
+                       help="взять I-ю из N частей отсортированного списка (по умолчанию 1/1)")
+    p_map.add_argument('-o', '--output', required=True, metavar='NPZ')
+
+    p_reduce = sub.add_parser('reduce', help="объединить сводки частей и вывести отчёт")
+    p_reduce.add_argument('parts', nargs='+', metavar='NPZ', help="сводки в порядке частей")
+    p_reduce.add_argument('--stats', action='store_true', help="статистика байт vendor области")
+    p_reduce.add_argument('--save', metavar='NPZ', help="сохранить объединённую сводку")
+
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+
+    if args.command == 'reduce':
+        total = FleetSummary.load(args.parts[0])
+        for path in args.parts[1:]:
+            total.merge(FleetSummary.load(path))
+        if args.save:
+            total.save(args.save)
+        print(f"🧩 Частей: {len(args.parts)}, модулей: {len(total)}")
+        total.print_report(args.stats)
+        return
+
+    sources = collect_inputs(args.paths, args.recursive)
+    if not sources:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'map':
+        try:
+            index, count = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        a, b = shard_bounds(len(sources), count)[index]
+        summarize(sources[a:b], args.chunk_size).save(args.output)
+        print(f"✅ Часть {args.shard}: модулей {b - a} ({time.perf_counter() - t0:.2f} с) → "
+              f"{args.output}")
+        return
+
+    total = run_shards(sources, args.shards, args.workers or None, args.chunk_size, args.save_dir)
+    print(f"🧩 Частей: {min(args.shards, len(sources))}, модулей: {len(total)} "
+          f"({time.perf_counter() - t0:.2f} с)")
+    total.print_report(args.stats)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Поиск клонированных и перепрошитых модулей по расстоянию Хэмминга
+
+Образы (с обнулёнными полями, уникальными для каждого модуля: S/N, CRC,
+HPE Secure ID) сначала группируются по точному совпадению. Затем из
+уникальных образов оставляются только биты, меняющиеся внутри партии, и
+упаковываются в слова uint64; расстояния считаются через XOR + popcount
+блоками (np.bitwise_count), без матрицы N x N в памяти.
+
+Кластеры строятся жадно (leader clustering): образ попадает в кластер первого
+лидера на расстоянии <= threshold бит, иначе сам становится лидером.
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from spd_layout import FIELD_BY_NAME, SPD_SIZE
+
+# Поля, которые по определению различаются у модулей одной партии
+DEFAULT_MASK = ('serial_number', 'hpe_secure_id', 'crc_page0', 'crc_page1', 'crc_mfg')
+
+BLOCK_ROWS = 1024
+
+def mask_fields(arr, fields=DEFAULT_MASK):
+    """Копия образов (N, L) с обнулёнными полями spd_layout"""
+    arr = np.array(arr, dtype=np.uint8, copy=True)
+    for name in fields:
+        f = FIELD_BY_NAME[name]
+        arr[:, f.offset:f.offset + f.width] = 0
+    return arr
+
+def unique_images(arr):
+    """Точные дубликаты: (уникальные образы, индекс группы для каждой строки, размеры групп)"""
+    rows = np.ascontiguousarray(arr).view(np.dtype((np.void, arr.shape[1]))).ravel()
+    _, first, inverse, counts = np.unique(rows, return_index=True, return_inverse=True,
+                                          return_counts=True)
+    return arr[first], inverse.ravel(), counts
+
+def pack_bits(arr):
+    """Упаковка только меняющихся битов образов в слова uint64: (N, W)
+
+    Постоянные по партии биты не влияют ни на одно расстояние и отбрасываются.
+    """
+    bits = np.unpackbits(arr, axis=1)
+    varying = np.flatnonzero(bits.min(axis=0) != bits.max(axis=0))
+    packed = np.packbits(bits[:, varying], axis=1)
+    width = -(-packed.shape[1] // 8) * 8 or 8
+    out = np.zeros((len(arr), width), dtype=np.uint8)
+    out[:, :packed.shape[1]] = packed
+    return out.view(np.uint64), varying
+
+def popcount(x):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x)
+    # NumPy < 2.0: таблица на 256 значений по байтам
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    return table[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+def hamming(a, b):
+    """Матрица расстояний (len(a), len(b)) для упакованных образов
+
+    Цикл по словам держит временные массивы двумерными (len(a) x len(b)).
+    """
+    dist = np.zeros((len(a), len(b)), dtype=np.uint16)
+    for w in range(a.shape[1]):
+        dist += popcount(a[:, w, None] ^ b[None, :, w])
+    return dist
+
+def knn(queries, corpus, k, block=BLOCK_ROWS):
+    """k ближайших образов корпуса для каждого запроса: (индексы, расстояния)"""
+    k = min(k, len(corpus))
+    best_d = np.full((len(queries), 0), 0, dtype=np.uint16)
+    best_i = np.zeros((len(queries), 0), dtype=np.intp)
+    for start in range(0, len(corpus), block):
+        d = hamming(queries, corpus[start:start + block])
+        cand_d = np.concatenate((best_d, d), axis=1)
+        cand_i = np.concatenate((best_i, np.broadcast_to(
+            np.arange(start, start + d.shape[1]), d.shape)), axis=1)
+        keep = np.argpartition(cand_d, k - 1, axis=1)[:, :k] if cand_d.shape[1] > k else \
+            np.argsort(cand_d, axis=1)
+        best_d = np.take_along_axis(cand_d, keep, axis=1)
+        best_i = np.take_along_axis(cand_i, keep, axis=1)
+    order = np.argsort(best_d, axis=1, kind='stable')
+    return np.take_along_axis(best_i, order, axis=1), np.take_along_axis(best_d, order, axis=1)
+
+def leader_clusters(packed, threshold, block=BLOCK_ROWS):
+    """Жадная кластеризация: (номер лидера для каждой строки, расстояние до лидера)
+
+    Строки обрабатываются порциями: сначала расстояния до всех текущих
+    лидеров одной матрицей, затем оставшиеся строки порции - между собой.
+    """
+    n = len(packed)
+    leader = np.full(n, -1, dtype=np.intp)
+    dist = np.zeros(n, dtype=np.uint16)
+    leaders = []
+
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        if leaders:
+            d = hamming(packed[rows], packed[leaders])
+            j = d.argmin(axis=1)
+            near = d[np.arange(len(rows)), j] <= threshold
+            leader[rows[near]] = np.asarray(leaders)[j[near]]
+            dist[rows[near]] = d[np.arange(len(rows)), j][near]
+            rows = rows[~near]
+        if not len(rows):
+            continue
+        # Новые лидеры внутри порции: расстояния строк порции между собой
+        d = hamming(packed[rows], packed[rows])
+        new = []
+        for i, row in enumerate(rows):
+            if new:
+                dj = d[i, new]
+                m = int(dj.argmin())
+                if dj[m] <= threshold:
+                    leader[row] = rows[new[m]]
+                    dist[row] = dj[m]
+                    continue
+            new.append(i)
+            leader[row] = row
+        leaders.extend(rows[new].tolist())
+    return leader, dist
+
+def find_clusters(arr, threshold=0, fields=DEFAULT_MASK, block=BLOCK_ROWS):
+    """Кластеры похожих образов партии (N, L)
+
+    Возвращает список кластеров по убыванию размера: словари с индексами
+    строк (members), лидером и максимальным расстоянием до лидера.
+    """
+    masked = mask_fields(arr, fields)
+    uniq, inverse, counts = unique_images(masked)
+    # Частые образы - первыми, чтобы они становились лидерами
+    order = np.argsort(-counts, kind='stable')
+    if threshold > 0:
+        packed, _ = pack_bits(uniq)
+        leader, dist = leader_clusters(packed[order], threshold, block)
+    else:
+        # Точные совпадения - уже готовые кластеры
+        leader = np.arange(len(uniq))
+        dist = np.zeros(len(uniq), dtype=np.uint16)
+
+    groups = {}
+    for pos, (u, lead) in enumerate(zip(order, leader)):
+        groups.setdefault(int(order[lead]), []).append((int(u), int(dist[pos])))
+
+    members_of = np.argsort(inverse, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(uniq)))))
+    clusters = []
+    for lead, items in groups.items():
+        members = np.concatenate([members_of[bounds[u]:bounds[u + 1]] for u, _ in items])
+        clusters.append({
+            'leader': int(members_of[bounds[lead]]),
+            'members': np.sort(members).tolist(),
+            'variants': len(items),
+            'max_distance': max(d for _, d in items),
+        })
+    clusters.sort(key=lambda c: (-len(c['members']), c['leader']))
+    return clusters
+
+def print_clusters(clusters, names, min_size=2, limit=20):
+    """Текстовый отчёт по кластерам"""
+    shown = [c for c in clusters if len(c['members']) >= min_size]
+    print(f"Кластеров: {len(clusters)}, из них с {min_size}+ модулями: {len(shown)}\n")
+    for i, c in enumerate(shown, 1):
+        print(f"  Кластер #{i}: модулей {len(c['members'])}, вариантов {c['variants']}, "
+              f"макс. расстояние {c['max_distance']} бит")
+        print(f"    лидер: {names[c['leader']]}")
+        others = [m for m in c['members'] if m != c['leader']]
+        for m in others[:limit]:
+            print(f"    - {names[m]}")
+        if len(others) > limit:
+            print(f"    ... и еще {len(others) - limit}")
+        print()
+
+def main():
+    """Главная функция"""
+    import argparse
+    import time
+    from spd_batch import collect_inputs, source_name
+    from spd_numpy import load_batch
+
+    parser = argparse.ArgumentParser(description="Поиск похожих/клонированных SPD образов")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="файлы .bin, контейнеры .spdpack и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('-t', '--threshold', type=int, default=0,
+                        help="макс. расстояние Хэмминга (бит) внутри кластера")
+    parser.add_argument('--mask', nargs='*', default=list(DEFAULT_MASK), metavar='FIELD',
+                        help="поля spd_layout, исключаемые из сравнения "
+                             f"(по умолчанию {' '.join(DEFAULT_MASK)}; пусто - без маски)")
+    parser.add_argument('--query', nargs='+', metavar='BIN',
+                        help="вместо кластеров: ближайшие соседи этих дампов в партии")
+    parser.add_argument('-k', '--knn', type=int, default=5, help="соседей для --query")
+    parser.add_argument('--min-size', type=int, default=2, help="мин. размер кластера в отчёте")
+    parser.add_argument('--limit', type=int, default=20, help="модулей в списке кластера")
+    parser.add_argument('--block', type=int, default=BLOCK_ROWS, help="строк в блоке расчёта")
+    parser.add_argument('--json', action='store_true', help="вывод JSON")
+    args = parser.parse_args()
+
+    unknown = [f for f in args.mask if f not in FIELD_BY_NAME]
+    if unknown:
+        parser.error(f"неизвестные поля: {', '.join(unknown)}")
+
+    sources = collect_inputs(args.paths, args.recursive)
+    if not sources:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+    names = [source_name(s) for s in sources]
+    t0 = time.perf_counter()
+    arr = load_batch(sources, SPD_SIZE)
+
+    if args.query:
+        queries = collect_inputs(args.query)
+        both = mask_fields(np.concatenate((load_batch(queries, SPD_SIZE), arr)), args.mask)
+        packed, _ = pack_bits(both)
+        idx, dist = knn(packed[:len(queries)], packed[len(queries):], args.knn, args.block)
+        result = [{'query': source_name(q),
+                   'neighbors': [{'name': names[i], 'distance': int(d)} for i, d in zip(ri, rd)]}
+                  for q, ri, rd in zip(queries, idx, dist)]
+        if args.json:
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+            return
+        for r in result:
+            print(f"🔎 {r['query']}")
+            for n in r['neighbors']:
+                print(f"    {n['distance']:5d} бит  {n['name']}")
+        return
+
+    clusters = find_clusters(arr, args.threshold, args.mask, args.block)
+    elapsed = time.perf_counter() - t0
+    if args.json:
+        print(json.dumps([{**c, 'leader': names[c['leader']],
+                           'members': [names[m] for m in c['members']]}
+                          for c in clusters if len(c['members']) >= args.min_size],
+                         indent=2, ensure_ascii=False))
+        return
+    print(f"🔍 Модулей: {len(sources)}, порог: {args.threshold} бит, "
+          f"маска: {', '.join(args.mask) or '-'} ({elapsed:.2f} с)\n")
+    print_clusters(clusters, names, args.min_size, args.limit)
+
+if __name__ == '__main__':
+    main()
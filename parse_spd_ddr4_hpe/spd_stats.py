@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Потоковая статистика байт SPD по всей партии (гистограммы по смещениям)
+
+Для каждого смещения диапазона копится гистограмма из 256 счётчиков
+(np.bincount по порциям образов), поэтому память не зависит от числа дампов.
+Частичные результаты сохраняются в .npz и складываются между собой:
+партии можно считать на разных машинах и объединять.
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from spd_layout import AREAS, REGIONS, SPD_SIZE
+
+class ByteStats:
+    """Гистограммы значений байт по смещениям [start, end)"""
+
+    def __init__(self, start=AREAS['vendor'][0], end=AREAS['vendor'][1]):
+        self.start = start
+        self.end = end
+        self.count = 0
+        self.counts = np.zeros((end - start, 256), dtype=np.int64)
+        # Смещение каждого столбца в плоской гистограмме: offset * 256 + value
+        self._base = np.arange(end - start, dtype=np.intp) * 256
+
+    @property
+    def width(self):
+        return self.end - self.start
+
+    def update(self, arr):
+        """Учёт порции образов (N, L), L >= end"""
+        cols = np.asarray(arr)[:, self.start:self.end]
+        if not len(cols):
+            return self
+        flat = (cols.astype(np.intp) + self._base).ravel()
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        self.count += len(cols)
+        return self
+
+    def merge(self, other):
+        """Сложение с частичным результатом того же диапазона"""
+        if (other.start, other.end) != (self.start, self.end):
+            raise ValueError(f"разные диапазоны: {self.start}-{self.end - 1} "
+                             f"и {other.start}-{other.end - 1}")
+        self.counts += other.counts
+        self.count += other.count
+        return self
+
+    __iadd__ = merge
+
+    def save(self, path):
+        """Сохранение частичного результата (.npz)"""
+        np.savez_compressed(path, counts=self.counts,
+                            meta=np.array([self.start, self.end, self.count], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            start, end, count = (int(v) for v in f['meta'])
+            stats = cls(start, end)
+            stats.counts[:] = f['counts']
+        stats.count = count
+        return stats
+
+    def entropy(self):
+        """Энтропия Шеннона (бит) для каждого смещения"""
+        return _entropy(self.counts)
+
+    def modes(self):
+        """Самое частое значение и его доля для каждого смещения"""
+        values = self.counts.argmax(axis=1)
+        share = self.counts.max(axis=1) / max(self.count, 1)
+        return values, share
+
+    def distinct(self):
+        """Число различных значений на каждом смещении"""
+        return (self.counts > 0).sum(axis=1)
+
+    def constant_mask(self):
+        """Смещения с одним и тем же значением во всех образах"""
+        return self.distinct() <= 1
+
+    def region_stats(self, regions=REGIONS):
+        """Статистика по регионам spd_layout, попадающим в диапазон
+
+        bits - сумма энтропий смещений (верхняя оценка информации в регионе),
+        pooled - энтропия объединённой гистограммы байт региона.
+        """
+        ent = self.entropy()
+        constant = self.constant_mask()
+        out = []
+        for name, offset, size in regions:
+            lo, hi = max(offset, self.start), min(offset + size, self.end)
+            if lo >= hi:
+                continue
+            rows = slice(lo - self.start, hi - self.start)
+            out.append({
+                'region': name,
+                'start': lo,
+                'end': hi,
+                'bits': float(ent[rows].sum()),
+                'max_bits': float(ent[rows].max()),
+                'pooled_bits': float(_entropy(self.counts[rows].sum(axis=0))),
+                'variable': int((~constant[rows]).sum()),
+            })
+        return out
+
+    def to_dict(self):
+        """Сводка в виде JSON-совместимого словаря"""
+        ent = self.entropy()
+        values, share = self.modes()
+        return {
+            'modules': self.count,
+            'start': self.start,
+            'end': self.end,
+            'offsets': [
+                {'offset': self.start + i, 'entropy': round(float(ent[i]), 4),
+                 'distinct': int(d), 'mode': int(values[i]), 'mode_share': round(float(share[i]), 4)}
+                for i, d in enumerate(self.distinct())
+            ],
+            'regions': self.region_stats(),
+        }
+
+def _entropy(counts):
+    """Энтропия Шеннона по последней оси гистограммы"""
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum(axis=-1, keepdims=True)
+    p = np.divide(counts, total, out=np.zeros_like(counts), where=total > 0)
+    logs = np.log2(p, out=np.zeros_like(p), where=p > 0)
+    return 0.0 - (p * logs).sum(axis=-1)
+
+def collect(sources, start, end, chunk_size=65536, dram_type=None):
+    """Статистика по источникам (.bin или PackRecord) порциями по chunk_size
+
+    dram_type - учитывать только образы с этим байтом 2 (например, DDR4).
+    """
+    from spd_batch import chunked
+    from spd_numpy import load_batch
+
+    stats = ByteStats(start, end)
+    for chunk in chunked(sources, chunk_size):
+        arr = load_batch(chunk, size=max(end, SPD_SIZE))
+        if dram_type is not None:
+            arr = arr[arr[:, 2] == dram_type]
+        stats.update(arr)
+    return stats
+
+def offset_ranges(mask, start):
+    """Сжатие маски смещений в список диапазонов 'a-b'"""
+    idx = np.flatnonzero(mask) + start
+    if not len(idx):
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > 1)
+    firsts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    lasts = np.concatenate((idx[breaks], [idx[-1]]))
+    return [f"{a}" if a == b else f"{a}-{b}" for a, b in zip(firsts, lasts)]
+
+def print_report(stats, limit=32):
+    """Текстовый отчёт по статистике"""
+    print(f"{'='*80}")
+    print(f"📊 СТАТИСТИКА БАЙТ {stats.start}-{stats.end - 1} ПО ПАРТИИ ({stats.count} модулей)")
+    print(f"{'='*80}\n")
+
+    constant = stats.constant_mask()
+    print(f"Постоянных смещений: {int(constant.sum())}/{stats.width}")
+    print(f"  {', '.join(offset_ranges(constant, stats.start)) or '-'}")
+    print(f"Переменных смещений: {int((~constant).sum())}/{stats.width}")
+    print(f"  {', '.join(offset_ranges(~constant, stats.start)) or '-'}\n")
+
+    print(f"  {'Регион':<18} {'Диапазон':>9} {'Перем.':>7} {'Бит':>8} {'Макс':>6} {'Общая':>6}")
+    for r in stats.region_stats():
+        span = f"{r['start']}-{r['end'] - 1}"
+        print(f"  {r['region']:<18} {span:>9} {r['variable']:7d} {r['bits']:8.2f} "
+              f"{r['max_bits']:6.2f} {r['pooled_bits']:6.2f}")
+
+    ent = stats.entropy()
+    values, share = stats.modes()
+    order = np.argsort(-ent, kind='stable')[:limit]
+    order = order[ent[order] > 0]
+    if len(order):
+        print(f"\n  Смещения с наибольшей энтропией:")
+        print(f"  {'Offset':<14} {'Бит':>6} {'Значений':>9} {'Мода':>6} {'Доля':>7}")
+        distinct = stats.distinct()
+        for i in order:
+            pos = stats.start + i
+            print(f"  {pos:3d} (0x{pos:03X})    {ent[i]:6.3f} {distinct[i]:9d}   0x{values[i]:02X} "
+                  f"{100 * share[i]:6.1f}%")
+
+def main():
+    """Главная функция"""
+    import argparse
+    from spd_batch import collect_inputs
+
+    parser = argparse.ArgumentParser(description="Статистика байт SPD по всей партии")
+    parser.add_argument('paths', nargs='*', default=[],
+                        help="файлы .bin, контейнеры .spdpack и/или директории")
+    parser.add_argument('-r', '--recursive', action='store_true')
+    parser.add_argument('--full', action='store_true',
+                        help="все 512 байт вместо vendor области 384-511")
+    parser.add_argument('--merge', nargs='+', default=[], metavar='NPZ',
+                        help="добавить сохранённые частичные результаты")
+    parser.add_argument('--save', metavar='NPZ', help="сохранить частичный результат")
+    parser.add_argument('--chunk-size', type=int, default=65536,
+                        help="образов в одной порции")
+    parser.add_argument('--json', action='store_true', help="вывод JSON вместо текста")
+    parser.add_argument('--limit', type=int, default=32,
+                        help="строк в списке смещений с наибольшей энтропией")
+    args = parser.parse_args()
+
+    start, end = (0, SPD_SIZE) if args.full else AREAS['vendor']
+    if not args.paths and not args.merge:
+        args.paths = ['.']
+
+    stats = collect(collect_inputs(args.paths, args.recursive), start, end, args.chunk_size)
+    for path in args.merge:
+        part = ByteStats.load(path)
+        if not stats.count and (part.start, part.end) != (start, end):
+            stats = ByteStats(part.start, part.end)
+        stats.merge(part)
+
+    if not stats.count:
+        print("❌ Не найдено .bin файлов", file=sys.stderr)
+        sys.exit(1)
+    if args.save:
+        stats.save(args.save)
+
+    if args.json:
+        print(json.dumps(stats.to_dict(), indent=2, ensure_ascii=False))
+    else:
+        print_report(stats, args.limit)
+
+if __name__ == '__main__':
+    main()
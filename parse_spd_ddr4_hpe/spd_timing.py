@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Точные тайминги DDR4 SPD в целых пикосекундах и таблицы тактов
+
+Каждый параметр = MTB (125 пс) * значение + FTB (знаковый байт, 1 пс).
+Пересчёт в такты - по правилу округления JEDEC (целочисленно, с допуском
+2.5%), без ошибок float. Таблицы тактов строятся один раз на модуль для
+всех стандартных скоростей не выше его tCKmin; для партий те же расчёты
+выполняются по столбцам numpy (timings_ps_batch / cycles_batch).
+"""
+
+from typing import NamedTuple, Tuple
+
+MTB_PS = 125
+
+# Параметр: поле FTB в spd_layout (None - у параметра нет поправки FTB)
+PARAMS = (
+    ('tck_min', 'tck_min_ftb'),
+    ('tck_max', 'tck_max_ftb'),
+    ('taa_min', 'taa_ftb'),
+    ('trcd_min', 'trcd_ftb'),
+    ('trp_min', 'trp_ftb'),
+    ('tras_min', None),
+    ('trc_min', 'trc_ftb'),
+    ('trfc1_min', None),
+    ('trfc2_min', None),
+    ('trfc4_min', None),
+    ('tfaw_min', None),
+    ('trrd_s_min', 'trrd_s_ftb'),
+    ('trrd_l_min', 'trrd_l_ftb'),
+    ('tccd_l_min', 'tccd_l_ftb'),
+    ('twr_min', None),
+    ('twtr_s_min', None),
+    ('twtr_l_min', None),
+)
+
+PARAM_NAMES = tuple(name for name, _ in PARAMS)
+
+# Стандартные скорости DDR4: MT/s, tCK (пс) в кодировке SPD (MTB + FTB)
+SPEED_BINS = (
+    (3200, 625),
+    (2933, 682),
+    (2666, 750),
+    (2400, 833),
+    (2133, 938),
+    (1866, 1071),
+    (1600, 1250),
+)
+
+# Допуск сравнения tCK модуля со стандартной скоростью: округление FTB до 1 пс
+# у производителей расходится (DDR4-2133: 937.5 пс записывают как 937 или 938)
+SPEED_TOLERANCE_PS = 2
+
+# Столбцы строки таблицы тактов (после скорости)
+CYCLE_COLUMNS = ('cl', 'trcd', 'trp', 'tras', 'trc')
+_CYCLE_PARAMS = ('trcd_min', 'trp_min', 'tras_min', 'trc_min')
+
+# Маска CAS (байты 20-23): бит 31 - диапазон CL 23-52 вместо 7-36, бит 30 - резерв
+_CAS_HIGH = 1 << 31
+_CAS_BITS = 30
+
+class ModuleTiming(NamedTuple):
+    """Тайминги одного модуля
+
+    ps - параметры PARAMS в пс; cycles - (CL, tRCD, tRP, tRAS) на tCKmin;
+    table - строки (MT/s, CL, tRCD, tRP, tRAS, tRC) по SPEED_BINS.
+    """
+    ps: dict
+    speed: int
+    cas_latencies: Tuple[int, ...]
+    cycles: Tuple[int, ...]
+    table: Tuple[Tuple[int, ...], ...]
+
+def signed8(value):
+    """Байт FTB как знаковое число (работает и для массивов numpy)"""
+    return (value ^ 0x80) - 0x80
+
+def timings_ps(fields):
+    """Все параметры PARAMS в пс из полей spd_layout.decode_image"""
+    return {name: fields[name] * MTB_PS + (signed8(fields[ftb]) if ftb else 0)
+            for name, ftb in PARAMS}
+
+def nck(t_ps, tck_ps):
+    """Параметр в тактах по округлению JEDEC: допуск 2.5% вниз, иначе вверх"""
+    return (t_ps * 1000 // tck_ps + 974) // 1000
+
+def cas_base(mask):
+    return 23 if mask & _CAS_HIGH else 7
+
+def cas_latencies(mask):
+    """Поддерживаемые CL из маски байтов 20-23"""
+    base = cas_base(mask)
+    return tuple(base + i for i in range(_CAS_BITS) if mask >> i & 1)
+
+def speed_grade(tck_ps, bins=SPEED_BINS):
+    """Скорость (MT/s): стандартная по tCK (с допуском SPEED_TOLERANCE_PS),
+    иначе 2 000 000 / tCK"""
+    for rate, bin_tck in bins:
+        if abs(tck_ps - bin_tck) <= SPEED_TOLERANCE_PS:
+            return rate
+    return 2_000_000 // tck_ps if tck_ps > 0 else 0
+
+def select_cl(cls, taa_ps, tck_ps):
+    """Минимальный поддерживаемый CL, покрывающий tAAmin; 0 - такого нет"""
+    need = nck(taa_ps, tck_ps)
+    return next((cl for cl in cls if cl >= need), 0)
+
+def cycles_at(ps, cls, tck_ps):
+    """(CL, tRCD, tRP, tRAS, tRC) на заданном tCK"""
+    return (select_cl(cls, ps['taa_min'], tck_ps),) + \
+        tuple(nck(ps[name], tck_ps) for name in _CYCLE_PARAMS)
+
+def cycle_table(ps, cls):
+    """Строки (MT/s, CL, tRCD, tRP, tRAS, tRC) для скоростей, доступных модулю
+
+    Скорость в пределах допуска от tCKmin модуля считается его собственной
+    и пересчитывается на tCKmin.
+    """
+    rows = []
+    for rate, bin_tck in SPEED_BINS:
+        if bin_tck + SPEED_TOLERANCE_PS < ps['tck_min']:
+            continue
+        row = cycles_at(ps, cls, max(bin_tck, ps['tck_min']))
+        if row[0]:
+            rows.append((rate,) + row)
+    return tuple(rows)
+
+def module_timing(fields):
+    """Тайминги модуля из полей spd_layout.decode_image"""
+    ps = timings_ps(fields)
+    tck = ps['tck_min']
+    if tck <= 0:
+        raise ValueError(f"некорректный tCKmin: {tck} пс")
+    cls = cas_latencies(fields['cas_mask'])
+    return ModuleTiming(ps, speed_grade(tck), cls, cycles_at(ps, cls, tck)[:4],
+                        cycle_table(ps, cls))
+
+# --- Векторные версии для партий (N, 512) ---
+
+def timings_ps_batch(arr):
+    """Параметры PARAMS в пс для всех строк: словарь имя -> int32 (N,)"""
+    import numpy as np
+    from spd_layout import FIELD_BY_NAME
+    from spd_numpy import column
+
+    out = {}
+    for name, ftb in PARAMS:
+        value = column(arr, FIELD_BY_NAME[name]).astype(np.int32) * MTB_PS
+        if ftb:
+            value += signed8(column(arr, FIELD_BY_NAME[ftb]).astype(np.int32))
+        out[name] = value
+    return out
+
+def nck_batch(t_ps, tck_ps):
+    """nck() по столбцам; строки с tCK <= 0 дают 0"""
+    import numpy as np
+
+    t = np.asarray(t_ps, dtype=np.int64)
+    tck = np.asarray(tck_ps, dtype=np.int64)
+    valid = tck > 0
+    return np.where(valid, (t * 1000 // np.where(valid, tck, 1) + 974) // 1000, 0)
+
+def select_cl_batch(mask, taa_ps, tck_ps):
+    """select_cl() по столбцам: младший бит маски не ниже нужного CL (0 при tCK <= 0)"""
+    import numpy as np
+
+    mask = np.asarray(mask, dtype=np.uint64)
+    base = np.where(mask & _CAS_HIGH, 23, 7)
+    low = np.clip(nck_batch(taa_ps, tck_ps) - base, 0, 63).astype(np.uint64)
+    bits = (mask & ((1 << _CAS_BITS) - 1)) >> low << low
+    lowest = bits & (~bits + np.uint64(1))
+    index = np.log2(np.maximum(lowest, 1).astype(np.float64)).astype(np.int64)
+    return np.where((lowest > 0) & (np.asarray(tck_ps) > 0), base + index, 0)
+
+def cycles_batch(ps, mask, tck_ps):
+    """(N, 5): CL, tRCD, tRP, tRAS, tRC на tck_ps (скаляр или (N,))"""
+    import numpy as np
+
+    cols = [select_cl_batch(mask, ps['taa_min'], tck_ps)]
+    cols += [nck_batch(ps[name], tck_ps) for name in _CYCLE_PARAMS]
+    return np.stack(cols, axis=1)
+
+def cycle_table_batch(ps, mask):
+    """(N, len(SPEED_BINS), 5): таблица тактов; недоступные скорости - нули"""
+    import numpy as np
+
+    tck = np.asarray(ps['tck_min'])
+    out = np.zeros((len(tck), len(SPEED_BINS), len(CYCLE_COLUMNS)), dtype=np.int64)
+    for i, (_, bin_tck) in enumerate(SPEED_BINS):
+        rows = cycles_batch(ps, mask, np.maximum(tck, bin_tck))
+        ok = (tck <= bin_tck + SPEED_TOLERANCE_PS) & (rows[:, 0] > 0)
+        out[:, i] = np.where(ok[:, None], rows, 0)
+    return out
+
+def speed_grade_batch(tck_ps):
+    """speed_grade() по столбцам"""
+    import numpy as np
+
+    tck = np.asarray(tck_ps, dtype=np.int64)
+    out = np.where(tck > 0, 2_000_000 // np.maximum(tck, 1), 0)
+    for rate, bin_tck in SPEED_BINS:
+        out = np.where(np.abs(tck - bin_tck) <= SPEED_TOLERANCE_PS, rate, out)
+    return out
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Наблюдение за директориями партий: анализ новых дампов по мере появления
+
+События файловой системы берутся из inotify (Linux, через ctypes), иначе -
+периодический опрос директорий. С inotify файл готов к анализу по
+IN_CLOSE_WRITE / IN_MOVED_TO (запись закрыта или файл переименован на
+место); при опросе и для файлов, найденных при запуске, - когда его размер
+и mtime не менялись в течение окна debounce. Декодируются только образы
+полного размера SPD (512 / 1024 байта): недописанный файл ждёт следующего
+события без сообщения об ошибке. Каждый файл декодируется один раз;
+статистика сравнения модулей (ModuleStats) обновляется инкрементально, в
+том числе при перезаписи и удалении файлов.
+"""
+
+import fnmatch
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+
+from spd_ddr5 import DDR5_SIZE
+from spd_layout import SPD_SIZE
+
+# Маски событий inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+REMOVED = IN_DELETE | IN_MOVED_FROM
+# Запись завершена: файл закрыт после записи или переименован на место
+COMPLETED = IN_CLOSE_WRITE | IN_MOVED_TO
+
+# Виды событий read(): файл изменён / запись завершена / файл удалён
+CHANGED = 'changed'
+CLOSED = 'closed'
+DELETED = 'deleted'
+
+# Размеры полного образа: DDR4 и DDR5
+VALID_SIZES = (SPD_SIZE, DDR5_SIZE)
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+def file_signature(path):
+    """(размер, mtime_ns) файла или None, если файла нет"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+class InotifyWatcher:
+    """Источник событий на inotify; fileno() пригоден для select()"""
+
+    def __init__(self, roots, recursive=False):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.recursive = recursive
+        self._dirs = {}
+        for root in roots:
+            self.add_dir(root)
+
+    def fileno(self):
+        return self._fd
+
+    def add_dir(self, path):
+        """Наблюдение за директорией (и поддиректориями при recursive)"""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            return
+        self._dirs[wd] = path
+        if self.recursive:
+            for entry in os.scandir(path):
+                if entry.is_dir(follow_symlinks=False):
+                    self.add_dir(entry.path)
+
+    def read(self):
+        """События: список (путь, CHANGED / CLOSED / DELETED); None - переполнение очереди"""
+        try:
+            buf = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return []
+        out = []
+        pos = 0
+        while pos < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, pos)
+            pos += _EVENT.size
+            name = buf[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self._dirs[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_dir(path)
+                    # Файлы, успевшие появиться до установки наблюдения
+                    out.extend((p, CHANGED) for p in scan_files([path], True))
+                continue
+            if mask & REMOVED:
+                out.append((path, DELETED))
+            elif mask & COMPLETED:
+                out.append((path, CLOSED))
+            else:
+                out.append((path, CHANGED))
+        return out
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Запасной источник событий: сравнение снимков директорий"""
+
+    def __init__(self, roots, recursive=False, pattern='*.bin'):
+        self.roots = roots
+        self.recursive = recursive
+        self.pattern = pattern
+        self._snapshot = self._scan()
+
+    def fileno(self):
+        return None
+
+    def _scan(self):
+        return {path: file_signature(path) for path in scan_files(self.roots, self.recursive,
+                                                                  self.pattern)}
+
+    def read(self):
+        snapshot = self._scan()
+        out = [(path, CHANGED) for path, sig in snapshot.items() if self._snapshot.get(path) != sig]
+        out += [(path, DELETED) for path in self._snapshot if path not in snapshot]
+        self._snapshot = snapshot
+        return out
+
+    def close(self):
+        pass
+
+def scan_files(roots, recursive=False, pattern='*.bin'):
+    """Файлы по шаблону в директориях roots"""
+    out = []
+    for root in roots:
+        if recursive:
+            for dirpath, _, names in os.walk(root):
+                out.extend(os.path.join(dirpath, n) for n in names if fnmatch.fnmatch(n, pattern))
+        else:
+            with os.scandir(root) as it:
+                out.extend(e.path for e in it if e.is_file() and fnmatch.fnmatch(e.name, pattern))
+    return sorted(out)
+
+class Debouncer:
+    """Файлы, ожидающие завершения записи
+
+    Файл готов, когда его (размер, mtime) не менялись delay секунд, либо
+    сразу после complete() (событие закрытия записи). Файл, отмеченный
+    touch(wait_close=True), тишиной не завершается - только complete().
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        # путь -> (срок или None - ждать закрытия, сигнатура или None - без сверки,
+        #          время первого события)
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def touch(self, path, now, wait_close=False):
+        first = self._pending.get(path, (0, None, now))[2]
+        deadline = None if wait_close else now + self.delay
+        self._pending[path] = (deadline, file_signature(path), first)
+
+    def complete(self, path, now):
+        """Запись файла завершена - готов без ожидания тишины"""
+        first = self._pending.get(path, (0, None, now))[2]
+        self._pending[path] = (now, None, first)
+
+    def discard(self, path):
+        self._pending.pop(path, None)
+
+    def next_deadline(self):
+        return min((d for d, _, _ in self._pending.values() if d is not None), default=None)
+
+    def ready(self, now):
+        """Готовые файлы: список (путь, время первого события)"""
+        out = []
+        for path, (deadline, sig, first) in list(self._pending.items()):
+            if deadline is None or deadline > now:
+                continue
+            current = file_signature(path)
+            if current is None:
+                del self._pending[path]
+            elif sig is not None and (current != sig or current[0] == 0):
+                self._pending[path] = (now + self.delay, current, first)
+            else:
+                del self._pending[path]
+                out.append((path, first))
+        return out
+
+class LotWatcher:
+    """Инкрементальный анализ партии: результаты по файлам + ModuleStats"""
+
+    def __init__(self, fmt='text', cache=None, out=sys.stdout):
+        from analyze_hpe_spd import ModuleStats
+
+        self.fmt = fmt
+        self.cache = cache
+        self.out = out
+        self.stats = ModuleStats()
+        self._seen = {}   # путь -> (сигнатура, результаты или None при ошибке)
+        # Файлы неполного размера, ждущие дозаписи
+        self.incomplete = set()
+        self.changed = False
+
+    def process(self, path, first_event):
+        """Анализ готового файла, если его содержимое ещё не учтено"""
+        from analyze_hpe_spd import analyze_spd, read_spd
+
+        sig = file_signature(path)
+        old = self._seen.get(path)
+        if sig is None or (old is not None and old[0] == sig):
+            return
+        if sig[0] not in VALID_SIZES:
+            # Недописанный образ: прежнее содержимое уже недействительно, ошибки нет
+            self.forget(path)
+            self.incomplete.add(path)
+            return
+        self.incomplete.discard(path)
+        results = self.cache.get(path, 'spd', read_spd) if self.cache is not None else None
+        error = None
+        if results is None:
+            try:
+                data = read_spd(path)
+                results = analyze_spd(data, path)
+            except Exception as e:
+                error = e
+            else:
+                if self.cache is not None:
+                    self.cache.put(path, 'spd', data, results)
+                    self.cache.flush()
+
+        self.forget(path)
+        self._seen[path] = (sig, results)
+        latency = time.monotonic() - first_event
+        if error is not None:
+            print(f"❌ {path}: {error}", file=sys.stderr)
+            return
+        self.stats.add(results, path)
+        self.changed = True
+        self.emit(path, results, latency)
+
+    def forget(self, path):
+        """Исключение файла из статистики (удалён или перезаписан)"""
+        self.incomplete.discard(path)
+        old = self._seen.pop(path, None)
+        if old is not None and old[1] is not None:
+            self.stats.remove(old[1], path)
+            self.changed = True
+
+    def emit(self, path, results, latency):
+        if self.fmt == 'jsonl':
+            self.out.write(json.dumps(dict(results), ensure_ascii=False) + '\n')
+        else:
+            from analyze_hpe_spd import crc_flags, speed_label
+
+            mark = "✅" if all(crc_flags(results)) else "❌"
+            self.out.write(f"{mark} {results['filename']}: {results['part_number']} "
+                           f"S/N {results['serial_number']} {speed_label(results)} "
+                           f"[{1000 * latency:.0f} мс]\n")
+        self.out.flush()
+
+    def report(self, file=None):
+        """Текущая сводка сравнения модулей"""
+        stdout = sys.stdout
+        sys.stdout = file or (sys.stderr if self.fmt == 'jsonl' else sys.stdout)
+        try:
+            if len(self.stats) >= 2:
+                self.stats.print_report()
+            if self.incomplete:
+                print(f"⏳ Ожидают дозаписи (размер не {'/'.join(map(str, VALID_SIZES))} байт): "
+                      f"{len(self.incomplete)}")
+            sys.stdout.flush()
+        finally:
+            sys.stdout = stdout
+        self.changed = False
+
+def make_watcher(roots, recursive, pattern, polling=False):
+    """inotify, если доступен, иначе опрос директорий"""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots, recursive)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, recursive, pattern)
+
+def watch(args, lot):
+    """Основной цикл: события → debounce → анализ → периодическая сводка"""
+    watcher = make_watcher(args.paths, args.recursive, args.pattern, args.poll)
+    kind = "inotify" if isinstance(watcher, InotifyWatcher) else f"опрос каждые {args.interval} с"
+    print(f"👀 Наблюдение ({kind}): {', '.join(args.paths)}", file=sys.stderr)
+
+    debouncer = Debouncer(args.debounce)
+    # С inotify запись считается завершённой по событию закрытия, а не по тишине
+    wait_close = isinstance(watcher, InotifyWatcher)
+    now = time.monotonic()
+    for path in scan_files(args.paths, args.recursive, args.pattern):
+        debouncer.touch(path, now)
+
+    report_requested = []
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda *_: report_requested.append(True))
+    next_report = now + args.report if args.report else None
+
+    try:
+        while True:
+            now = time.monotonic()
+            deadlines = [d for d in (debouncer.next_deadline(), next_report) if d is not None]
+            if watcher.fileno() is None:
+                deadlines.append(now + args.interval)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+
+            if watcher.fileno() is not None:
+                try:
+                    select.select([watcher], [], [], timeout)
+                except InterruptedError:
+                    pass
+            elif timeout:
+                time.sleep(timeout)
+
+            events = watcher.read()
+            now = time.monotonic()
+            if events is None:
+                # Переполнение очереди inotify - пересканируем всё
+                # (события закрытия потеряны - готовность по тишине)
+                events = [(p, None) for p in scan_files(args.paths, args.recursive, args.pattern)]
+            for path, event in events:
+                if not fnmatch.fnmatch(os.path.basename(path), args.pattern):
+                    continue
+                if event == DELETED:
+                    debouncer.discard(path)
+                    lot.forget(path)
+                elif event == CLOSED:
+                    debouncer.complete(path, now)
+                else:
+                    debouncer.touch(path, now, wait_close and event == CHANGED)
+
+            for path, first in debouncer.ready(now):
+                lot.process(path, first)
+
+            if report_requested or (next_report is not None and now >= next_report):
+                if lot.changed or report_requested:
+                    lot.report()
+                report_requested.clear()
+                if next_report is not None:
+                    next_report = now + args.report
+    finally:
+        watcher.close()
+
+def main():
+    """Главная функция"""
+    import argparse
+    from spd_cache import add_cache_args
+
+    parser = argparse.ArgumentParser(description="Инкрементальный анализ новых SPD дампов")
+    parser.add_argument('paths', nargs='*', default=['.'], help="директории партий")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="включая поддиректории (и новые поддиректории)")
+    parser.add_argument('--pattern', default='*.bin', help="шаблон имени дампа")
+    parser.add_argument('--debounce', type=float, default=0.1,
+                        help="файл считается записанным, если не менялся столько секунд "
+                             "(при опросе и для файлов, найденных при запуске; с inotify - "
+                             "по закрытию записи)")
+    parser.add_argument('--poll', action='store_true', help="опрос вместо inotify")
+    parser.add_argument('--interval', type=float, default=0.5, help="период опроса, с")
+    parser.add_argument('--report', type=float, default=10.0,
+                        help="период вывода сводки, с (0 - только по SIGUSR1 и при выходе)")
+    parser.add_argument('-f', '--format', choices=('text', 'jsonl'), default='text',
+                        help="вывод результатов по файлам")
+    add_cache_args(parser)
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache:
+        from spd_cache import AnalysisCache
+        cache = AnalysisCache(args.cache)
+
+    lot = LotWatcher(args.format, cache)
+    # Остановка демона по SIGTERM - с итоговой сводкой, как по Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        watch(args, lot)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lot.report()
+        if cache is not None:
+            cache.evict(args.cache_max_age, args.cache_max_entries)
+            cache.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Проверка определения скорости DDR4 по tCKmin (python -m pytest test_spd_timing.py)"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analyze_hpe_spd import analyze_spd
+from spd_crc import fix_image
+from spd_layout import FIELD_BY_NAME, decode_image
+from spd_numpy import decode_batch
+from spd_timing import SPEED_BINS, module_timing, speed_grade
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+def ddr4_image(mtb, ftb):
+    """Реальный DDR4 дамп из репозитория с заданным tCKmin (MTB + FTB)"""
+    data = bytearray((sorted(SCRIPT_DIR.glob('*.bin'))[0]).read_bytes()[:512])
+    data[FIELD_BY_NAME['tck_min'].offset] = mtb
+    data[FIELD_BY_NAME['tck_min_ftb'].offset] = ftb & 0xFF
+    return bytes(fix_image(data))
+
+@pytest.mark.parametrize('rate, tck', SPEED_BINS)
+def test_speed_grade_bins(rate, tck):
+    for delta in (-2, -1, 0, 1, 2):
+        assert speed_grade(tck + delta) == rate
+
+def test_ddr4_2133_image():
+    # DDR4-2133 в SPD: 8 MTB + FTB -62 = 938 пс
+    data = ddr4_image(8, -62)
+
+    timing = module_timing(decode_image(data))
+    assert timing.ps['tck_min'] == 938
+    assert timing.speed == 2133
+    assert timing.table[0][0] == 2133
+    assert [row[0] for row in timing.table] == [2133, 1866, 1600]
+
+    assert analyze_spd(data, '2133.bin')['freq_mhz'] == 2133
+
+    out = decode_batch(np.frombuffer(data, dtype=np.uint8).reshape(1, -1))
+    assert out['freq_mhz'][0] == 2133
+    row = [rate for rate, _ in SPEED_BINS].index(2133)
+    assert tuple(out['cycle_table'][0, row]) == timing.table[0][1:]